@@ -1,6 +1,12 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
+from core.allocators import account_numbers
 from core.models import BankAccount
 
+# Statuses an account can be opened with, closing goes through the close action which schedules the purge
+OPENING_STATUS_CHOICES = [choice for choice in BankAccount.ACCOUNT_STATUS_CHOICES if choice[0] != 'closed']
+
 
 class BankAccountSerializer(serializers.ModelSerializer):
     """Serializer for the BankAccount model."""
@@ -8,13 +14,20 @@ class BankAccountSerializer(serializers.ModelSerializer):
     class Meta:
         model = BankAccount
         fields = ('id', 'account_number', 'balance', 'status', 'created_at')
-        read_only_fields = ('id', 'created_at', 'balance')
+        # Account numbers are always allocated, a client chosen one could collide with the allocator's range
+        read_only_fields = ('id', 'account_number', 'created_at', 'balance')
 
     def create(self, validated_data):
-        """Create a new bank account."""
+        """Create a new bank account with a server allocated account number."""
         validated_data['user'] = self.context['request'].user
+        validated_data['account_number'] = account_numbers.allocate(1)[0]
         return BankAccount.objects.create(**validated_data)
 
+    def validate_status(self, value):
+        if self.instance is None and value == 'closed':
+            raise serializers.ValidationError("Accounts cannot be opened closed.")
+        return value
+
     def update(self, instance, validated_data):
         """Update a bank account, only status can be updated."""
         # Only allow updating the status (e.g., suspend or close)
@@ -24,5 +37,21 @@ class BankAccountSerializer(serializers.ModelSerializer):
         if instance.status == 'closed' and instance.balance < 0:
             raise serializers.ValidationError("Account cannot be closed with a negative balance.")
 
-        instance.save()
-        return instance
\ No newline at end of file
+        instance.save(update_fields=['status'])  # Never writes back a stale balance
+        return instance
+
+
+class BulkBankAccountSerializer(serializers.Serializer):
+    """Serializer for creating many bank accounts with server allocated account numbers."""
+    count = serializers.IntegerField(min_value=1, max_value=settings.BULK_ACCOUNT_CREATE_MAX)
+    status = serializers.ChoiceField(choices=OPENING_STATUS_CHOICES, default='active')
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Create the accounts in batched INSERTs."""
+        user = self.context['request'].user
+        accounts = [
+            BankAccount(user=user, account_number=account_number, status=validated_data['status'])
+            for account_number in account_numbers.allocate(validated_data['count'])
+        ]
+        return BankAccount.objects.bulk_create(accounts, batch_size=1000)
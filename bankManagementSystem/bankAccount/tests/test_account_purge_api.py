@@ -0,0 +1,113 @@
+from decimal import Decimal
+from io import StringIO
+from datetime import date, timedelta
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.jobs import run_pending
+from core.models import BankAccount, Transaction, ArchivedTransaction, Loan, Job
+
+
+def bankaccount_close_url(account_id):
+    """Return the URL for closing a bank account"""
+    return reverse('bankaccount:bankaccount-close', args=[account_id])
+
+
+class AccountPurgeTests(TestCase):
+    """Test closing accounts and deleting users are purged in the background"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        self.account = BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                  balance=Decimal('100.00'))
+        for _ in range(5):
+            Transaction.objects.create(account=self.account, transaction_type='deposit', amount=Decimal('20.00'))
+        Loan.objects.create(account=self.account, loan_amount=Decimal('500.00'), interest_rate=Decimal('5.0'),
+                            due_date=date.today() + timedelta(days=365))
+
+    def test_close_marks_account(self):
+        """Test closing an account marks it closed without deleting any rows"""
+        res = self.client.delete(bankaccount_close_url(self.account.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.status, 'closed')
+        self.assertIsNotNone(self.account.closed_at)
+        self.assertEqual(Transaction.objects.filter(account=self.account).count(), 5)
+
+    def test_purge_closed_account(self):
+        """Test the purge archives the transactions and deletes the account in chunks"""
+        self.client.delete(bankaccount_close_url(self.account.id))
+
+        call_command('purge_closed_accounts', batch_size=2, stdout=StringIO())
+
+        self.assertFalse(BankAccount.objects.filter(id=self.account.id).exists())
+        self.assertFalse(Loan.objects.exists())
+        self.assertEqual(ArchivedTransaction.objects.filter(account_id=self.account.id).count(), 5)
+
+    def test_delete_user_then_purge(self):
+        """Test deleting a user deactivates them and the purge removes them"""
+        res = self.client.delete(reverse('user:me'))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(BankAccount.objects.get(id=self.account.id).status, 'closed')
+
+        call_command('purge_closed_accounts', stdout=StringIO())
+
+        self.assertFalse(get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertFalse(BankAccount.objects.exists())
+
+    def test_close_enqueues_purge_job(self):
+        """Test closing an account queues a job that purges it"""
+        self.client.delete(bankaccount_close_url(self.account.id))
+
+        job = Job.objects.get(name='purge_account')
+        self.assertEqual(job.payload, {'account_id': self.account.id})
+
+        run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertFalse(BankAccount.objects.filter(id=self.account.id).exists())
+        self.assertEqual(ArchivedTransaction.objects.filter(account_id=self.account.id).count(), 5)
+
+    def test_delete_user_enqueues_purge_job(self):
+        """Test deleting a user queues a job that purges them once the deletion commits"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('user:me'))
+
+        job = Job.objects.get(name='purge_user')
+        self.assertEqual(job.payload, {'user_id': self.user.id})
+
+        run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertFalse(get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertFalse(BankAccount.objects.exists())
+
+    @override_settings(VELOCITY_RULES={})
+    def test_transfer_to_closed_account_refused(self):
+        """Test a closed account, left for the purge, cannot be credited by a transfer"""
+        self.client.delete(bankaccount_close_url(self.account.id))
+        sender = get_user_model().objects.create_user(email='sender@example.com', password='password123')
+        source = BankAccount.objects.create(user=sender, account_number='0987654321', balance=Decimal('500.00'))
+        self.client.force_authenticate(sender)
+
+        res = self.client.post(reverse('bankAccountOperations:bankaccounts-transfer'),
+                               {'source_account_id': source.id, 'target_account_id': self.account.id,
+                                'amount': '100.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('100.00'))
@@ -76,7 +76,7 @@ class PrivateBankAccountAPITests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         bank_account = BankAccount.objects.get(id=res.data['id'])
-        self.assertEqual(bank_account.account_number, payload['account_number'])
+        self.assertNotEqual(bank_account.account_number, payload['account_number'])  # Always allocated
         self.assertEqual(bank_account.user, self.user)
 
     def test_suspend_bank_account(self):
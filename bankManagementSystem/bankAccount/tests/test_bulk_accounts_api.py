@@ -0,0 +1,91 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.allocators import AccountNumberAllocator, luhn_check_digit, is_valid_account_number
+from core.models import BankAccount
+
+BULK_CREATE_URL = reverse('bankaccount:bankaccount-bulk-create')
+CREATE_URL = reverse('bankaccount:bankaccount-list')
+
+
+class AccountNumberAllocatorTests(TestCase):
+    """Test the hi-lo account number allocator"""
+
+    def test_luhn_check_digit(self):
+        """Test the check digit of a known number"""
+        self.assertEqual(luhn_check_digit('7992739871'), '3')
+
+    def test_numbers_unique_and_valid(self):
+        """Test allocated numbers are unique and carry a valid check digit"""
+        allocator = AccountNumberAllocator(name='test')
+
+        numbers = allocator.allocate(1500) + allocator.allocate(10)
+
+        self.assertEqual(len(set(numbers)), 1510)
+        self.assertTrue(all(is_valid_account_number(number) for number in numbers))
+
+    def test_committed_leftovers_allocated_without_queries(self):
+        """Test numbers left in a committed block are handed out from memory"""
+        allocator = AccountNumberAllocator(name='test')
+        with self.captureOnCommitCallbacks(execute=True):
+            first = allocator.allocate(1)
+
+        with self.assertNumQueries(0):
+            second = allocator.allocate(5)
+
+        self.assertNotIn(first[0], second)
+
+
+class BulkBankAccountAPITests(TestCase):
+    """Test the bulk account creation endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_accounts(self):
+        """Test creating many accounts in a few statements"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(BULK_CREATE_URL, {'count': 1000}, format='json')
+
+        # Batched INSERTs, sized by the backend's parameter limit
+        self.assertLess(len(queries), 25)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['count'], 1000)
+        self.assertEqual(BankAccount.objects.filter(user=self.user).count(), 1000)
+
+    def test_bulk_create_limit(self):
+        """Test the number of accounts per request is capped"""
+        res = self.client.post(BULK_CREATE_URL, {'count': 10001}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_account_number_not_client_settable(self):
+        """Test a single account gets an allocated number whatever the client sends"""
+        res = self.client.post(CREATE_URL, {'account_number': '1234567890', 'status': 'active'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        account = BankAccount.objects.get(id=res.data['id'])
+        self.assertNotEqual(account.account_number, '1234567890')
+        self.assertTrue(is_valid_account_number(account.account_number))
+        self.assertEqual(res.data['account_number'], account.account_number)
+
+    def test_accounts_cannot_be_opened_closed(self):
+        """Test new accounts are refused the closed status, which only the close action sets"""
+        res = self.client.post(BULK_CREATE_URL, {'count': 2, 'status': 'closed'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(CREATE_URL, {'status': 'closed'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(BULK_CREATE_URL, {'count': 2, 'status': 'suspended'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(BankAccount.objects.filter(user=self.user).exclude(status='suspended').exists())
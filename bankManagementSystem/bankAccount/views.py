@@ -1,11 +1,14 @@
 from django.db import transaction
+from django.utils import timezone
 from rest_framework import viewsets, status, mixins
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from core import account_summary, jobs
+from core.concurrency import compare_and_swap, ConcurrentUpdateError
 from core.models import BankAccount
-from .serializers import BankAccountSerializer
+from .serializers import BankAccountSerializer, BulkBankAccountSerializer
 
 
 class BankAccountViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
@@ -20,6 +23,22 @@ class BankAccountViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
         """Limit the queryset to the authenticated user's accounts."""
         return self.queryset.filter(user=self.request.user)
 
+    def get_serializer_class(self):
+        if self.action == 'bulk_create':
+            return BulkBankAccountSerializer
+        return self.serializer_class
+
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk_create(self, request):
+        """Create many bank accounts with server allocated account numbers"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        accounts = serializer.save()
+        return Response({
+            'count': len(accounts),
+            'accounts': [{'id': account.id, 'account_number': account.account_number} for account in accounts],
+        }, status=status.HTTP_201_CREATED)
+
     @action(methods=['PATCH'], detail=True, url_path='suspend')
     def suspend(self, request, pk=None):
         """Suspend a bank account"""
@@ -31,7 +50,7 @@ class BankAccountViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
             return Response({'detail': 'Account is already suspended.'}, status=status.HTTP_400_BAD_REQUEST)
 
         bank_account.status = 'suspended'
-        bank_account.save()
+        bank_account.save(update_fields=['status'])
         return Response(self.get_serializer(bank_account).data, status=status.HTTP_200_OK)
 
     @action(methods=['PATCH'], detail=True, url_path='activate')
@@ -47,13 +66,13 @@ class BankAccountViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
             return Response({'detail': 'Only suspended accounts can be activated.'}, status=status.HTTP_400_BAD_REQUEST)
 
         bank_account.status = 'active'
-        bank_account.save()
+        bank_account.save(update_fields=['status'])
         return Response(self.get_serializer(bank_account).data, status=status.HTTP_200_OK)
 
     @action(methods=['DELETE'], detail=True, url_path='close')
     @transaction.atomic
     def close(self, request, pk=None):
-        """Close a bank account"""
+        """Close a bank account, its rows are deleted by a background purge job"""
         bank_account = self.get_object()
 
         if bank_account.status == 'closed':
@@ -63,5 +82,9 @@ class BankAccountViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
             return Response({'detail': 'Account cannot be closed with a negative balance.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        bank_account.delete()
-        return Response({'detail': 'Account successfully closed and deleted.'}, status=status.HTTP_204_NO_CONTENT)
+        # Compare-and-swap: the checks above held for the version closed, and credits in flight re-read the status
+        if not compare_and_swap(bank_account, status='closed', closed_at=timezone.now()):
+            raise ConcurrentUpdateError()
+        account_summary.invalidate_account_summaries([bank_account.id])
+        jobs.enqueue('purge_account', {'account_id': bank_account.id})
+        return Response({'detail': 'Account successfully closed.'}, status=status.HTTP_204_NO_CONTENT)
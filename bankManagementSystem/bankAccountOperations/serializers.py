@@ -1,9 +1,21 @@
 
 from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
 from rest_framework import serializers
-from core.models import BankAccount, Transaction ,Loan ,ForeignCurrency,Bank
+from core import fees, identity, velocity
+from core.autopay import add_month
+from core.concurrency import adjust_balance, adjust_bank_balance, InsufficientFunds
+from core.models import BankAccount, Transaction ,Loan ,ForeignCurrency,Bank, MonthlyAccountSummary, DailyDebitTotal
 from core.utils import convert_to_base_currency
 
+def daily_limit(account_limit, default):
+    """The account's own daily limit, the settings default when it has none"""
+    return Decimal(default) if account_limit is None else account_limit
+
+
 class DepositSerializer(serializers.ModelSerializer):
     account_id = serializers.IntegerField()
     currency = serializers.CharField(max_length=10, default='NIS')
@@ -18,7 +30,7 @@ class DepositSerializer(serializers.ModelSerializer):
     def validate(self, data):
         """Validates the deposit data"""
         try:
-            account = BankAccount.objects.get(pk=data['account_id'], user=self.context['request'].user)
+            account = identity.get(BankAccount, pk=data['account_id'], user=self.context['request'].user)
         except BankAccount.DoesNotExist:
             raise serializers.ValidationError({"account": "Account does not exist or does not belong to you."})
 
@@ -27,15 +39,13 @@ class DepositSerializer(serializers.ModelSerializer):
 
         currency_code = data['currency']
         if currency_code != 'NIS':  # If it's not the base currency, check if it's supported
-            if not ForeignCurrency.objects.filter(currency_code=currency_code).exists():
+            if not identity.exists(ForeignCurrency, currency_code=currency_code):
                 raise serializers.ValidationError({"currency": f"Unsupported currency: {currency_code}"})
 
-        data['account'] = BankAccount.objects.get(
-            pk=data['account_id'],
-            user=self.context['request'].user
-        )
+        data['account'] = account
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         """Creates a deposit transaction, applies the fee, and updates the account balance"""
         account = validated_data['account']
@@ -48,21 +58,18 @@ class DepositSerializer(serializers.ModelSerializer):
             except ValueError as e:
                 raise serializers.ValidationError({"currency": str(e)})
 
-        bank = Bank.objects.first()
+        bank = identity.first(Bank)
         if not bank:
             raise serializers.ValidationError({"bank": "Bank instance not found."})
 
-        # Retrieve the fee percentage from the bank settings
-        fee_percentage = bank.transaction_fee_percentage
-        fee = amount * (fee_percentage / 100)
+        # Fee from the fee schedule, the bank's percentage where it has no band
+        fee = fees.compute_fee('deposit', currency, amount, bank)
         net_amount = amount - fee
 
-        account.balance += net_amount
-        account.save()
+        adjust_balance(account, net_amount)
 
         # Add fee to bank balance
-        bank.balance += fee
-        bank.save()
+        adjust_bank_balance(bank, fee)
 
         transaction = Transaction.objects.create(
             account=account,
@@ -88,7 +95,7 @@ class WithdrawalSerializer(serializers.ModelSerializer):
     def validate(self, data):
         """Validates the withdrawal data"""
         try:
-            account = BankAccount.objects.get(pk=data['account_id'], user=self.context['request'].user)
+            account = identity.get(BankAccount, pk=data['account_id'], user=self.context['request'].user)
         except BankAccount.DoesNotExist:
             raise serializers.ValidationError({"account": "Account does not exist or does not belong to you."})
 
@@ -97,41 +104,57 @@ class WithdrawalSerializer(serializers.ModelSerializer):
 
         currency_code = data['currency']
         if currency_code != 'NIS':
-            if not ForeignCurrency.objects.filter(currency_code=currency_code).exists():
+            if not identity.exists(ForeignCurrency, currency_code=currency_code):
                 raise serializers.ValidationError({"currency": f"Unsupported currency: {currency_code}"})
 
+        amount = data['amount']
+        if currency_code != 'NIS':
+            try:
+                amount = convert_to_base_currency(amount, currency_code)
+            except ValueError as e:
+                raise serializers.ValidationError({"currency": str(e)})
+        try:
+            data['velocity'] = velocity.reserve(account.id, 'withdrawal', amount)
+        except velocity.VelocityLimitExceeded:
+            raise serializers.ValidationError({"account": "Too many withdrawals in a short time, try again later."})
+
         data['account'] = account
+        data['base_amount'] = amount  # Amount in NIS
         return data
 
     def create(self, validated_data):
+        """Creates the withdrawal, giving its velocity reservation back when it fails"""
+        with velocity.held(validated_data['velocity']):
+            return self.withdraw(validated_data)
+
+    @transaction.atomic
+    def withdraw(self, validated_data):
         """Creates a withdrawal transaction, applies the fee, and updates the account balance"""
         account = validated_data['account']
-        amount = validated_data['amount']
+        amount = validated_data['base_amount']
         currency = validated_data.get('currency', 'NIS')
 
-        if currency != 'NIS':
-            try:
-                amount = convert_to_base_currency(amount, currency)
-            except ValueError as e:
-                raise serializers.ValidationError({"currency": str(e)})
-
-        bank = Bank.objects.first()
+        bank = identity.first(Bank)
         if not bank:
             raise serializers.ValidationError({"bank": "Bank instance not found."})
 
-        fee_percentage = bank.transaction_fee_percentage
-        fee = amount * (fee_percentage / 100)
+        fee = fees.compute_fee('withdrawal', currency, amount, bank)
         total_amount = amount + fee
 
         if account.balance < total_amount:
             raise serializers.ValidationError("Insufficient funds.")
 
-        account.balance -= total_amount
-        account.save()
+        limit = daily_limit(account.daily_withdrawal_limit, settings.DAILY_WITHDRAWAL_LIMIT)
+        if not DailyDebitTotal.objects.debit(account, 'withdrawn', amount, limit):
+            raise serializers.ValidationError({"account": "Daily withdrawal limit exceeded."})
+
+        try:
+            adjust_balance(account, -total_amount, floor=0)
+        except InsufficientFunds:
+            raise serializers.ValidationError("Insufficient funds.")
 
         # Add fee to the bank's balance
-        bank.balance += fee
-        bank.save()
+        adjust_bank_balance(bank, fee)
 
         transaction = Transaction.objects.create(
             account=account,
@@ -150,7 +173,7 @@ class BalanceSerializer(serializers.Serializer):
     def validate(self, data):
         """Validates the account data."""
         try:
-            account = BankAccount.objects.get(pk=data['account_id'])
+            account = identity.get(BankAccount, pk=data['account_id'])
         except BankAccount.DoesNotExist:
             raise serializers.ValidationError("Account does not exist.")
 
@@ -182,7 +205,7 @@ class TransferSerializer(serializers.ModelSerializer):
 
         # Validate source account with user constraint
         try:
-            source_account = BankAccount.objects.get(id=source_account_id, user=user)
+            source_account = identity.get(BankAccount, pk=source_account_id, user=user)
             if source_account.balance < amount:
                 raise serializers.ValidationError("Insufficient funds in source account.")
         except BankAccount.DoesNotExist:
@@ -190,16 +213,17 @@ class TransferSerializer(serializers.ModelSerializer):
 
         # Validate target account without user constraint
         try:
-            target_account = BankAccount.objects.get(id=target_account_id)
+            target_account = identity.get(BankAccount, pk=target_account_id)
         except BankAccount.DoesNotExist:
             raise serializers.ValidationError("Target account not found.")
+        if target_account.status != 'active':
+            raise serializers.ValidationError("Target account is not active.")
 
         # Fee Calculation
-        bank = Bank.objects.first()
+        bank = identity.first(Bank)
         if not bank:
             raise serializers.ValidationError("Bank instance not found.")
-        fee_percentage = bank.transaction_fee_percentage
-        fee = amount * (fee_percentage / 100)
+        fee = fees.compute_fee('transfer', data['currency'], amount, bank)
         total_amount = amount + fee
 
         if source_account.balance < total_amount:
@@ -208,9 +232,14 @@ class TransferSerializer(serializers.ModelSerializer):
         # Verify currency
         currency_code = data['currency']
         if currency_code != 'NIS':
-            if not ForeignCurrency.objects.filter(currency_code=currency_code).exists():
+            if not identity.exists(ForeignCurrency, currency_code=currency_code):
                 raise serializers.ValidationError(f"Unsupported currency: {currency_code}")
 
+        try:
+            data['velocity'] = velocity.reserve(source_account.id, 'transfer_out', amount)
+        except velocity.VelocityLimitExceeded:
+            raise serializers.ValidationError("Too many transfers in a short time, try again later.")
+
         # Add validated accounts for transfer
         data['source_account'] = source_account
         data['target_account'] = target_account
@@ -219,6 +248,12 @@ class TransferSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
+        """Performs the transfer, giving its velocity reservation back when it fails"""
+        with velocity.held(validated_data['velocity']):
+            return self.transfer(validated_data)
+
+    @transaction.atomic
+    def transfer(self, validated_data):
         """Perform the transfer, apply the fee, and update balances"""
         source_account = validated_data['source_account']
         target_account = validated_data['target_account']
@@ -226,16 +261,19 @@ class TransferSerializer(serializers.ModelSerializer):
         fee = validated_data['fee']
         currency = validated_data.get('currency', 'NIS')
 
-        # Update account balances
-        source_account.balance -= (amount + fee)
-        target_account.balance += amount
-        source_account.save()
-        target_account.save()
+        limit = daily_limit(source_account.daily_transfer_limit, settings.DAILY_TRANSFER_LIMIT)
+        if not DailyDebitTotal.objects.debit(source_account, 'transferred_out', amount, limit):
+            raise serializers.ValidationError("Daily transfer limit exceeded.")
+
+        # Update account balances, the source balance is checked again against its latest version
+        try:
+            adjust_balance(source_account, -(amount + fee), floor=0)
+        except InsufficientFunds:
+            raise serializers.ValidationError("Insufficient funds for transfer and fee.")
+        adjust_balance(target_account, amount)
 
         # Update bank balance with fee income
-        bank = Bank.objects.first()
-        bank.balance += fee
-        bank.save()
+        adjust_bank_balance(identity.first(Bank), fee)
 
         # Log transactions
         transaction_out = Transaction.objects.create(
@@ -262,15 +300,19 @@ class TransferSerializer(serializers.ModelSerializer):
 class LoanSerializer(serializers.ModelSerializer):
     class Meta:
         model = Loan
-        fields = ('id', 'account', 'loan_amount', 'interest_rate', 'status', 'created_at', 'due_date')
-        read_only_fields = ('id', 'created_at', 'interest_rate', 'status')
+        fields = ('id', 'account', 'loan_amount', 'interest_rate', 'status', 'created_at', 'due_date',
+                  'autopay', 'installment_amount', 'next_payment_date')
+        read_only_fields = ('id', 'created_at', 'interest_rate', 'status', 'next_payment_date')
+        extra_kwargs = {
+            'installment_amount': {'min_value': Decimal('0.01')},
+        }
 
     def validate(self, data):
         account = data.get('account')
         if not account:
             raise serializers.ValidationError({"account": "This field is required."})
 
-        bank = Bank.objects.first()
+        bank = identity.first(Bank)
         if not bank:
             raise serializers.ValidationError({"bank": "Bank instance not found."})
 
@@ -287,18 +329,23 @@ class LoanSerializer(serializers.ModelSerializer):
         if account.status != 'active':
             raise serializers.ValidationError({"account": "Loan can only be granted to active accounts."})
 
+        if data.get('autopay') and not data.get('installment_amount'):
+            raise serializers.ValidationError({"installment_amount": "Required for autopay loans."})
+
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
-        bank = Bank.objects.first()
+        bank = identity.first(Bank)
         loan_amount = validated_data.get('loan_amount')
 
         interest_rate = bank.interest_rate
 
-        bank.balance -= loan_amount
-        bank.save()
+        adjust_bank_balance(bank, -loan_amount)
 
         validated_data['interest_rate'] = interest_rate
+        if validated_data.get('autopay'):
+            validated_data['next_payment_date'] = add_month(timezone.localdate())
 
         return super().create(validated_data)
 
@@ -331,6 +378,7 @@ class TransactionSerializer(serializers.ModelSerializer):
 
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         source_account = validated_data['source_account']
         target_account = validated_data['target_account']
@@ -338,15 +386,12 @@ class TransactionSerializer(serializers.ModelSerializer):
         currency = validated_data.get('currency', 'NIS')
 
 
-        bank = Bank.objects.first()
-        fee_percentage = bank.transaction_fee_percentage
-        fee = amount * (fee_percentage / 100)
+        bank = identity.first(Bank)
+        fee = fees.compute_fee('transfer', currency, amount, bank)
         total_amount = amount + fee
 
-        source_account.balance -= total_amount
-        target_account.balance += amount
-        source_account.save()
-        target_account.save()
+        adjust_balance(source_account, -total_amount)
+        adjust_balance(target_account, amount)
 
         transaction_out = Transaction.objects.create(
             account=source_account,
@@ -366,3 +411,119 @@ class TransactionSerializer(serializers.ModelSerializer):
         )
 
         return transaction_out
+
+
+
+class LoanSummarySerializer(serializers.Serializer):
+    """Totals of all the loans matching the listing's filters"""
+    outstanding_principal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    next_due_date = serializers.DateField(allow_null=True)
+    next_payment_date = serializers.DateField(allow_null=True)
+    count_by_status = serializers.DictField(child=serializers.IntegerField())
+
+
+class LoanPageSerializer(serializers.Serializer):
+    """A page of the customer's loans listing"""
+    next = serializers.URLField(allow_null=True)
+    previous = serializers.URLField(allow_null=True)
+    results = LoanSerializer(many=True)
+    summary = LoanSummarySerializer()
+
+
+# Read-only fast path for the listings: `.values()` rows are formatted directly,
+# skipping the per row serializer, field and relation machinery.
+TRANSACTION_LIST_FIELDS = (
+    'id', 'account_id', 'transaction_type', 'amount', 'fee', 'currency',
+    'created_at', 'source_account_id', 'target_account_id',
+)
+LOAN_LIST_FIELDS = ('id', 'account_id', 'loan_amount', 'interest_rate', 'status', 'created_at', 'due_date',
+                    'autopay', 'installment_amount', 'next_payment_date')
+
+
+def _format_datetime(value, tz):
+    """Same output as DRF's DateTimeField for the default ISO 8601 format"""
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def transaction_rows_data(rows):
+    """Formats `TRANSACTION_LIST_FIELDS` rows exactly like TransactionSerializer"""
+    tz = timezone.get_current_timezone()
+    return [
+        {
+            'id': row['id'],
+            'account': row['account_id'],
+            'transaction_type': row['transaction_type'],
+            'amount': format(row['amount'], '.2f'),
+            'fee': format(row['fee'], '.2f'),
+            'currency': row['currency'],
+            'created_at': _format_datetime(row['created_at'], tz),
+            'source_account': row['source_account_id'],
+            'target_account': row['target_account_id'],
+        }
+        for row in rows
+    ]
+
+
+def loan_rows_data(rows):
+    """Formats `LOAN_LIST_FIELDS` rows exactly like LoanSerializer"""
+    tz = timezone.get_current_timezone()
+    return [
+        {
+            'id': row['id'],
+            'account': row['account_id'],
+            'loan_amount': format(row['loan_amount'], '.2f'),
+            'interest_rate': format(row['interest_rate'], '.2f'),
+            'status': row['status'],
+            'created_at': _format_datetime(row['created_at'], tz),
+            'due_date': row['due_date'].isoformat(),
+            'autopay': row['autopay'],
+            'installment_amount': None if row['installment_amount'] is None else format(row['installment_amount'], '.2f'),
+            'next_payment_date': row['next_payment_date'] and row['next_payment_date'].isoformat(),
+        }
+        for row in rows
+    ]
+
+
+def loan_summary_data(loans):
+    """Totals of the `loans` queryset, aggregated in a single query"""
+    active = Q(status='active')
+    totals = loans.aggregate(
+        outstanding_principal=Sum('loan_amount', filter=active, default=Decimal('0')),
+        next_due_date=Min('due_date', filter=active),
+        next_payment_date=Min('next_payment_date', filter=active),
+        **{f'count_{choice}': Count('id', filter=Q(status=choice)) for choice, _ in Loan.LOAN_STATUS_CHOICES},
+    )
+    return {
+        'outstanding_principal': format(totals['outstanding_principal'], '.2f'),
+        'next_due_date': totals['next_due_date'] and totals['next_due_date'].isoformat(),
+        'next_payment_date': totals['next_payment_date'] and totals['next_payment_date'].isoformat(),
+        'count_by_status': {choice: totals[f'count_{choice}'] for choice, _ in Loan.LOAN_STATUS_CHOICES},
+    }
+
+
+def event_rows_data(rows):
+    """Formats `core.outbox.EVENT_FIELDS` rows of the change feed"""
+    tz = timezone.get_current_timezone()
+    return [
+        {
+            'id': row['id'],
+            'event_type': row['event_type'],
+            'account': row['account_id'],
+            'user': row['user_id'],
+            'payload': row['payload'],
+            'created_at': _format_datetime(row['created_at'], tz),
+        }
+        for row in rows
+    ]
+
+
+class MonthlyAccountSummarySerializer(serializers.ModelSerializer):
+    month = serializers.DateField(format='%Y-%m')
+
+    class Meta:
+        model = MonthlyAccountSummary
+        fields = ('month', 'transaction_type', 'total_amount', 'total_fee', 'count')
+        read_only_fields = fields
@@ -0,0 +1,89 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from core import account_summary
+from core.models import BankAccount
+
+SUMMARY_URL = reverse('bankAccountOperations:bankaccounts-summary')
+DEPOSIT_URL = reverse('bankAccountOperations:bankaccounts-deposit')
+
+
+def create_bank_account(user, **params):
+    """Helper function to create a bank account"""
+    defaults = {
+        'account_number': '1234567890',
+        'balance': Decimal('1000.00'),
+        'status': 'active'
+    }
+    defaults.update(params)
+    return BankAccount.objects.create(user=user, **defaults)
+
+
+class AccountSummaryTest(APITestCase):
+    """Test the cached account summary endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.account = create_bank_account(user=self.user)
+
+    def test_summary_served_from_cache(self):
+        """Test a second summary request needs no account or transaction query"""
+        self.client.get(SUMMARY_URL, {'account_id': self.account.id})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(SUMMARY_URL, {'account_id': self.account.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['balance'], '1000.00')
+        self.assertEqual(res.data['status'], 'active')
+
+    def test_deposit_invalidates_summary(self):
+        """Test a deposit drops the cached summary and the next request rebuilds it"""
+        self.client.get(SUMMARY_URL, {'account_id': self.account.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(DEPOSIT_URL, {'account_id': self.account.id, 'amount': '100.00'}, format='json')
+
+        self.account.refresh_from_db()
+        res = self.client.get(SUMMARY_URL, {'account_id': self.account.id})
+        self.assertEqual(res.data['balance'], str(self.account.balance))
+        self.assertEqual(len(res.data['recent_transactions']), 1)
+        self.assertEqual(res.data['recent_transactions'][0]['transaction_type'], 'deposit')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(SUMMARY_URL, {'account_id': self.account.id})
+        self.assertEqual(cached.data, res.data)
+
+    def test_summary_built_before_write_not_served(self):
+        """Test a summary stored after a concurrent write committed is never served"""
+        version = account_summary.summary_version(self.account.id)
+        stale = account_summary.build_account_summary(self.account)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BankAccount.objects.filter(id=self.account.id).update(balance=Decimal('50.00'))
+            account_summary.invalidate_account_summaries([self.account.id])
+        account_summary.store_account_summary(stale, version)
+
+        res = self.client.get(SUMMARY_URL, {'account_id': self.account.id})
+        self.assertEqual(res.data['balance'], '50.00')
+
+    def test_summary_limited_to_user(self):
+        """Test a cached summary of another user's account is not served"""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        other_account = create_bank_account(user=other_user, account_number='5555555555')
+        self.client.force_authenticate(user=other_user)
+        self.client.get(SUMMARY_URL, {'account_id': other_account.id})
+
+        self.client.force_authenticate(user=self.user)
+        res = self.client.get(SUMMARY_URL, {'account_id': other_account.id})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,106 @@
+import asyncio
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+from core import outbox
+from core.models import BankAccount, Transaction
+from core.streaming import EventHub
+
+BALANCE_STREAM_URL = reverse('bankAccountOperations:balance-stream')
+
+
+@override_settings(OUTBOX_SETTLE_DELAY=0, STREAM_POLL_INTERVAL=0.01, STREAM_HEARTBEAT_INTERVAL=5)
+class BalanceStreamTests(TestCase):
+    """Test the Server-Sent Events balance stream"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.account = BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                  balance=Decimal('100.00'))
+
+    def deposit(self, amount):
+        self.account.balance += amount
+        self.account.save()
+        Transaction.objects.create(account=self.account, transaction_type='deposit', amount=amount)
+
+    async def test_stream_requires_token(self):
+        """Test the stream rejects requests without a valid token"""
+        res = await self.async_client.get(BALANCE_STREAM_URL)
+        self.assertEqual(res.status_code, 401)
+
+        res = await self.async_client.get(BALANCE_STREAM_URL, headers={'Authorization': 'Token invalid'})
+        self.assertEqual(res.status_code, 401)
+
+    async def test_stream_pushes_snapshot_and_events(self):
+        """Test the stream opens with a snapshot and pushes new transactions"""
+        res = await self.async_client.get(BALANCE_STREAM_URL, headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(res['Content-Type'], 'text/event-stream')
+        stream = aiter(res.streaming_content)
+
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        snapshot = await anext(stream)
+        self.assertIn(b'event: snapshot', snapshot)
+        self.assertIn(b'"balance": "100.00"', snapshot)
+
+        await sync_to_async(self.deposit)(Decimal('25.00'))
+        event = await asyncio.wait_for(anext(stream), timeout=5)
+
+        self.assertIn(b'event: deposit', event)
+        self.assertIn(b'"balance": "125.00"', event)
+        await stream.aclose()
+
+    async def test_stream_replays_missed_events(self):
+        """Test a reconnecting client receives the events after its Last-Event-ID"""
+        await sync_to_async(self.deposit)(Decimal('10.00'))
+        await sync_to_async(self.deposit)(Decimal('20.00'))
+        first_id = (await sync_to_async(outbox.events_after)(0, 1))[0]['id']
+
+        res = await self.async_client.get(BALANCE_STREAM_URL, headers={
+            'Authorization': f'Token {self.token.key}',
+            'Last-Event-ID': str(first_id),
+        })
+        stream = aiter(res.streaming_content)
+        await anext(stream)
+        await anext(stream)
+        replayed = await anext(stream)
+
+        self.assertIn(f'id: {first_id + 1}'.encode(), replayed)
+        self.assertIn(b'"amount": "20.00"', replayed)
+        await stream.aclose()
+
+
+class EventHubTests(TestCase):
+    """Test the in-process fan-out hub"""
+
+    async def test_publish_to_own_user(self):
+        """Test events only reach the queues of their user"""
+        hub = EventHub()
+        hub.cursor = 0
+        hub.poller = asyncio.get_running_loop().create_future()  # Keeps subscribe from starting the poller
+        mine = await hub.subscribe(1)
+        other = await hub.subscribe(2)
+
+        hub.publish([{'id': 1, 'user_id': 1}])
+
+        self.assertEqual(mine.get_nowait(), {'id': 1, 'user_id': 1})
+        self.assertTrue(other.empty())
+
+    @override_settings(STREAM_QUEUE_SIZE=2)
+    async def test_slow_subscriber_dropped(self):
+        """Test a subscriber with a full queue is told to reconnect"""
+        hub = EventHub()
+        hub.cursor = 0
+        hub.poller = asyncio.get_running_loop().create_future()
+        queue = await hub.subscribe(1)
+
+        hub.publish([{'id': event_id, 'user_id': 1} for event_id in range(3)])
+
+        self.assertIsNone(queue.get_nowait())
+        self.assertTrue(queue.empty())
@@ -0,0 +1,130 @@
+from decimal import Decimal
+from datetime import date, timedelta
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from core.models import BankAccount, Bank, OutboxEvent
+
+CHANGE_FEED_URL = reverse('bankAccountOperations:change-feed')
+
+
+@override_settings(OUTBOX_SETTLE_DELAY=0)
+class ChangeFeedAPITests(APITestCase):
+    """Test the balance outbox and its change feed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.staff = get_user_model().objects.create_user(
+            email='staff@example.com',
+            password='password123',
+            is_staff=True
+        )
+        self.client.force_authenticate(user=self.user)
+        Bank.objects.create(balance=Decimal('100000.00'), transaction_fee_percentage=Decimal('1.0'),
+                            interest_rate=Decimal('5.0'))
+        self.account1 = BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                   balance=Decimal('1000.00'))
+        self.account2 = BankAccount.objects.create(user=self.user, account_number='0987654321',
+                                                   balance=Decimal('500.00'))
+
+    def test_operations_write_events(self):
+        """Test every balance change writes an outbox event"""
+        self.client.post(reverse('bankAccountOperations:bankaccounts-deposit'),
+                         {'account_id': self.account1.id, 'amount': '100.00'})
+        self.client.post(reverse('bankAccountOperations:bankaccounts-transfer'),
+                         {'source_account_id': self.account1.id, 'target_account_id': self.account2.id,
+                          'amount': '50.00'})
+        res = self.client.post(reverse('bankAccountOperations:loans-grant-loan'),
+                               {'account': self.account2.id, 'loan_amount': '1000.00',
+                                'due_date': date.today() + timedelta(days=365)})
+        self.client.post(reverse('bankAccountOperations:loans-repay-loan'),
+                         {'loan_id': res.data['id'], 'repayment_amount': '100.00'})
+
+        self.assertEqual(
+            list(OutboxEvent.objects.order_by('id').values_list('event_type', 'account_id')),
+            [('deposit', self.account1.id), ('transfer_out', self.account1.id), ('transfer_in', self.account2.id),
+             ('loan_disbursement', self.account2.id), ('loan_repayment', self.account2.id)]
+        )
+        deposit = OutboxEvent.objects.get(event_type='deposit')
+        self.assertEqual(deposit.payload['balance'], '1099.00')
+        self.assertEqual(deposit.user_id, self.user.id)
+
+    def test_failed_operation_writes_no_event(self):
+        """Test a rejected withdrawal leaves no event behind"""
+        self.client.post(reverse('bankAccountOperations:bankaccounts-withdraw'),
+                         {'account_id': self.account1.id, 'amount': '5000.00'})
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_feed_requires_staff(self):
+        """Test customers cannot read the change feed"""
+        res = self.client.get(CHANGE_FEED_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_feed_pages_by_cursor(self):
+        """Test the feed returns the events after the cursor in id order"""
+        for amount in ('10.00', '20.00', '30.00'):
+            self.client.post(reverse('bankAccountOperations:bankaccounts-deposit'),
+                             {'account_id': self.account1.id, 'amount': amount})
+        self.client.force_authenticate(user=self.staff)
+
+        res = self.client.get(CHANGE_FEED_URL, {'limit': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['events']), 2)
+
+        res = self.client.get(CHANGE_FEED_URL, {'after': res.data['next_cursor']})
+        self.assertEqual([event['payload']['amount'] for event in res.data['events']], ['29.70'])
+
+        res = self.client.get(CHANGE_FEED_URL, {'after': res.data['next_cursor']})
+        self.assertEqual(res.data['events'], [])
+
+    @override_settings(OUTBOX_SETTLE_DELAY=60)
+    def test_feed_holds_back_unsettled_events(self):
+        """Test events younger than the settle delay are not returned yet"""
+        self.client.post(reverse('bankAccountOperations:bankaccounts-deposit'),
+                         {'account_id': self.account1.id, 'amount': '10.00'})
+        self.client.force_authenticate(user=self.staff)
+
+        res = self.client.get(CHANGE_FEED_URL)
+
+        self.assertEqual(res.data, {'events': [], 'next_cursor': 0})
+
+    @override_settings(OUTBOX_SETTLE_DELAY=60)
+    def test_feed_stops_at_lower_unsettled_event(self):
+        """Test a settled event is not returned past a lower id that has not settled"""
+        self.client.post(reverse('bankAccountOperations:bankaccounts-deposit'),
+                         {'account_id': self.account1.id, 'amount': '10.00'})
+        self.client.post(reverse('bankAccountOperations:bankaccounts-deposit'),
+                         {'account_id': self.account1.id, 'amount': '20.00'})
+        first, second = OutboxEvent.objects.order_by('id')
+        OutboxEvent.objects.filter(id=second.id).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.client.force_authenticate(user=self.staff)
+
+        res = self.client.get(CHANGE_FEED_URL)
+
+        self.assertEqual(res.data, {'events': [], 'next_cursor': 0})
+
+    @override_settings(OUTBOX_GAP_TIMEOUT=60)
+    def test_feed_waits_for_missing_lower_id(self):
+        """Test a missing id holds the feed back until the gap timeout, since its transaction may still commit"""
+        for amount in ('10.00', '20.00', '30.00'):
+            self.client.post(reverse('bankAccountOperations:bankaccounts-deposit'),
+                             {'account_id': self.account1.id, 'amount': amount})
+        first, second, third = OutboxEvent.objects.order_by('id')
+        second.delete()  # Like an id taken by a transaction that has not committed yet
+        self.client.force_authenticate(user=self.staff)
+
+        res = self.client.get(CHANGE_FEED_URL)
+        self.assertEqual([event['id'] for event in res.data['events']], [first.id])
+
+        OutboxEvent.objects.filter(id=third.id).update(created_at=timezone.now() - timedelta(minutes=5))
+        res = self.client.get(CHANGE_FEED_URL, {'after': res.data['next_cursor']})
+        self.assertEqual([event['id'] for event in res.data['events']], [third.id])
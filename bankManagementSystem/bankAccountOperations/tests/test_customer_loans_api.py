@@ -0,0 +1,111 @@
+from decimal import Decimal
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import BankAccount, Loan
+
+CUSTOMER_LOANS_URL = reverse('bankAccountOperations:loans-get-customer-loans')
+
+
+class CustomerLoansAPITests(TestCase):
+    """Test the filtered, paginated customer loans listing"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        self.account = BankAccount.objects.create(user=self.user, account_number='1234567890')
+        self.today = date.today()
+        self.loans = [
+            self.create_loan('1000.00', 'active', 30),
+            self.create_loan('500.00', 'active', 90),
+            self.create_loan('0.00', 'paid', 10),
+            self.create_loan('200.00', 'defaulted', 60),
+        ]
+
+        other = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        other_account = BankAccount.objects.create(user=other, account_number='0987654321')
+        Loan.objects.create(account=other_account, loan_amount=Decimal('4000.00'), interest_rate=Decimal('5.0'),
+                            due_date=self.today + timedelta(days=5))
+
+    def create_loan(self, loan_amount, loan_status, due_in_days):
+        return Loan.objects.create(account=self.account, loan_amount=Decimal(loan_amount),
+                                   interest_rate=Decimal('5.0'), status=loan_status,
+                                   due_date=self.today + timedelta(days=due_in_days))
+
+    def test_summary(self):
+        """Test the summary totals the customer's loans"""
+        res = self.client.get(CUSTOMER_LOANS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['summary'], {
+            'outstanding_principal': '1500.00',
+            'next_due_date': (self.today + timedelta(days=30)).isoformat(),
+            'next_payment_date': None,
+            'count_by_status': {'active': 2, 'paid': 1, 'defaulted': 1},
+        })
+
+    def test_newest_first(self):
+        """Test loans are listed newest first"""
+        res = self.client.get(CUSTOMER_LOANS_URL)
+
+        self.assertEqual([loan['id'] for loan in res.data['results']], [loan.id for loan in reversed(self.loans)])
+
+    def test_filter_status(self):
+        """Test filtering by status narrows the page and the summary"""
+        res = self.client.get(CUSTOMER_LOANS_URL, {'status': 'active'})
+
+        self.assertEqual({loan['id'] for loan in res.data['results']}, {self.loans[0].id, self.loans[1].id})
+        self.assertEqual(res.data['summary']['count_by_status'], {'active': 2, 'paid': 0, 'defaulted': 0})
+
+    def test_filter_due_range(self):
+        """Test filtering by due date range"""
+        res = self.client.get(CUSTOMER_LOANS_URL, {'due_from': (self.today + timedelta(days=20)).isoformat(),
+                                                   'due_to': (self.today + timedelta(days=70)).isoformat()})
+
+        self.assertEqual({loan['id'] for loan in res.data['results']}, {self.loans[0].id, self.loans[3].id})
+        self.assertEqual(res.data['summary']['outstanding_principal'], '1000.00')
+
+    def test_invalid_filters(self):
+        """Test unknown statuses and malformed dates are rejected"""
+        res = self.client.get(CUSTOMER_LOANS_URL, {'status': 'late'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', res.data)
+
+        res = self.client.get(CUSTOMER_LOANS_URL, {'due_from': '01/02/2025'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('due_from', res.data)
+
+    def test_cursor_pages(self):
+        """Test following the cursor walks every loan once"""
+        seen = []
+        res = self.client.get(CUSTOMER_LOANS_URL, {'page_size': 3})
+        seen += [loan['id'] for loan in res.data['results']]
+        self.assertEqual(len(seen), 3)
+        self.assertIsNotNone(res.data['next'])
+
+        res = self.client.get(res.data['next'])
+        seen += [loan['id'] for loan in res.data['results']]
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(seen, [loan.id for loan in reversed(self.loans)])
+        self.assertEqual(res.data['summary']['count_by_status']['active'], 2)
+
+    def test_query_count_independent_of_history(self):
+        """Test a page costs the same queries for a long loan history"""
+        Loan.objects.bulk_create([
+            Loan(account=self.account, loan_amount=Decimal('10.00'), interest_rate=Decimal('5.0'),
+                 due_date=self.today + timedelta(days=days))
+            for days in range(200)
+        ])
+
+        with self.assertNumQueries(2):
+            res = self.client.get(CUSTOMER_LOANS_URL)
+        self.assertEqual(len(res.data['results']), 50)
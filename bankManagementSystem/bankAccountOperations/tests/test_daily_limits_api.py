@@ -0,0 +1,74 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import BankAccount, Bank, DailyDebitTotal
+
+WITHDRAW_URL = reverse('bankAccountOperations:bankaccounts-withdraw')
+TRANSFER_URL = reverse('bankAccountOperations:bankaccounts-transfer')
+
+
+@override_settings(DAILY_WITHDRAWAL_LIMIT='300.00', DAILY_TRANSFER_LIMIT='500.00', VELOCITY_RULES={})
+class DailyLimitAPITests(TestCase):
+    """Test the daily withdrawal and transfer limits"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        Bank.objects.create(balance=Decimal('100000.00'), transaction_fee_percentage=Decimal('0.0'))
+        self.account = BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                  balance=Decimal('10000.00'))
+        self.other = BankAccount.objects.create(user=self.user, account_number='0987654321')
+
+    def withdraw(self, amount):
+        return self.client.post(WITHDRAW_URL, {'account_id': self.account.id, 'amount': amount})
+
+    def transfer(self, amount):
+        return self.client.post(TRANSFER_URL, {'source_account_id': self.account.id,
+                                               'target_account_id': self.other.id, 'amount': amount})
+
+    def test_withdrawal_limit(self):
+        """Test withdrawals stop at the daily limit and the rejected one changes nothing"""
+        self.assertEqual(self.withdraw('200.00').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.withdraw('100.00').status_code, status.HTTP_200_OK)
+
+        res = self.withdraw('0.01')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        total = DailyDebitTotal.objects.get(account=self.account, day=timezone.localdate())
+        self.assertEqual(total.withdrawn, Decimal('300.00'))
+        self.account.refresh_from_db()
+        self.assertLess(self.account.balance, Decimal('10000.00'))
+        self.assertGreater(self.account.balance, Decimal('9690.00'))
+
+    def test_transfer_limit_separate(self):
+        """Test outgoing transfers have their own daily total"""
+        self.withdraw('300.00')
+
+        self.assertEqual(self.transfer('500.00').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.transfer('1.00').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_account_limit_overrides_default(self):
+        """Test an account's own limit replaces the settings default"""
+        self.account.daily_withdrawal_limit = Decimal('1000.00')
+        self.account.save()
+
+        self.assertEqual(self.withdraw('900.00').status_code, status.HTTP_200_OK)
+
+    def test_limit_checked_in_one_update(self):
+        """Test once the day's row exists a debit is a single conditional UPDATE"""
+        self.withdraw('10.00')
+
+        with self.assertNumQueries(1):
+            debited = DailyDebitTotal.objects.debit(self.account, 'withdrawn', Decimal('10.00'), Decimal('300.00'))
+
+        self.assertTrue(debited)
@@ -0,0 +1,64 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+from core import fees
+from core.models import BankAccount, Bank, FeeRule, Transaction
+
+
+@override_settings(VELOCITY_RULES={})
+class FeeScheduleAPITests(TestCase):
+    """Test the operations charge the fees of the fee schedule"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        Bank.objects.update(transaction_fee_percentage=Decimal('1.0'))
+        self.account = BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                  balance=Decimal('10000.00'))
+        self.other = BankAccount.objects.create(user=self.user, account_number='0987654321')
+        with self.captureOnCommitCallbacks(execute=True):
+            FeeRule.objects.create(operation='deposit', min_amount=Decimal('0'), percentage=Decimal('0.0'))
+            FeeRule.objects.create(operation='transfer', min_amount=Decimal('0'), percentage=Decimal('0.5'),
+                                   flat_fee=Decimal('1.00'), maximum_fee=Decimal('10.00'))
+
+    def tearDown(self):
+        # The compiled schedule of this process outlives the rules rolled back with the test
+        with self.captureOnCommitCallbacks(execute=True):
+            fees.invalidate_schedule()
+
+    def post(self, name, payload):
+        res = self.client.post(reverse(f'bankAccountOperations:{name}'), payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK, res.data)
+        return res
+
+    def test_deposit_band(self):
+        """Test a deposit pays its band's fee instead of the bank percentage"""
+        self.post('bankaccounts-deposit', {'account_id': self.account.id, 'amount': '500.00'})
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('10500.00'))
+
+    def test_transfer_band_capped(self):
+        """Test a transfer pays the percentage plus flat fee up to the cap"""
+        res = self.post('bankaccounts-transfer', {'source_account_id': self.account.id,
+                                                  'target_account_id': self.other.id, 'amount': '200.00'})
+        self.assertEqual(res.data['fee'], '2.00')
+
+        res = self.post('bankaccounts-transfer', {'source_account_id': self.account.id,
+                                                  'target_account_id': self.other.id, 'amount': '5000.00'})
+        self.assertEqual(res.data['fee'], '10.00')
+
+    def test_withdrawal_without_rules(self):
+        """Test an operation without rules still pays the bank percentage"""
+        self.post('bankaccounts-withdraw', {'account_id': self.account.id, 'amount': '100.00'})
+
+        self.assertEqual(Transaction.objects.get(transaction_type='withdrawal').fee, Decimal('1.00'))
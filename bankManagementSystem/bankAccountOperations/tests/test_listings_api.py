@@ -0,0 +1,60 @@
+from decimal import Decimal
+from datetime import date, timedelta
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from core.models import BankAccount, Transaction, Loan
+from bankAccountOperations.serializers import TransactionSerializer, LoanSerializer, TRANSACTION_LIST_FIELDS, \
+    LOAN_LIST_FIELDS, transaction_rows_data, loan_rows_data
+
+
+class ListingFastPathTest(APITestCase):
+    """Test the `.values()` fast path matches the serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.account1 = BankAccount.objects.create(user=self.user, account_number='1234567890')
+        self.account2 = BankAccount.objects.create(user=self.user, account_number='0987654321')
+        Transaction.objects.create(account=self.account1, transaction_type='deposit', amount=Decimal('10.5'))
+        Transaction.objects.create(account=self.account1, transaction_type='transfer_out', amount=Decimal('3.00'),
+                                   fee=Decimal('0.03'), target_account=self.account2)
+        Transaction.objects.create(account=self.account2, transaction_type='transfer_in', amount=Decimal('3.00'),
+                                   source_account=self.account1)
+        Loan.objects.create(account=self.account1, loan_amount=Decimal('1000'), interest_rate=Decimal('5.0'),
+                            due_date=date.today() + timedelta(days=365))
+
+    def test_transaction_rows_match_serializer(self):
+        """Test transaction rows render exactly like TransactionSerializer"""
+        transactions = Transaction.objects.order_by('id')
+
+        self.assertEqual(
+            transaction_rows_data(transactions.values(*TRANSACTION_LIST_FIELDS)),
+            [dict(row) for row in TransactionSerializer(transactions, many=True).data]
+        )
+
+    def test_loan_rows_match_serializer(self):
+        """Test loan rows render exactly like LoanSerializer"""
+        loans = Loan.objects.order_by('id')
+
+        self.assertEqual(
+            loan_rows_data(loans.values(*LOAN_LIST_FIELDS)),
+            [dict(row) for row in LoanSerializer(loans, many=True).data]
+        )
+
+    def test_listings_query_once(self):
+        """Test the listings need one query per table"""
+        with self.assertNumQueries(2):  # Hot and archived transactions
+            res = self.client.get(reverse('bankAccountOperations:bankaccounts-get-all-transactions'))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 3)
+
+        with self.assertNumQueries(2):  # Page and summary
+            res = self.client.get(reverse('bankAccountOperations:loans-get-customer-loans'))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
@@ -0,0 +1,108 @@
+import tempfile
+import unittest
+from decimal import Decimal
+from datetime import date, timedelta
+from io import StringIO
+from pathlib import Path
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+from core import analytics
+from core.models import BankAccount, Bank, Loan
+
+LOAN_BOOK_URL = reverse('bankAccountOperations:loan-book-analytics')
+
+
+@unittest.skipIf(analytics.numpy is None, "NumPy is not installed")
+class LoanBookAnalyticsAPITests(TestCase):
+    """Test the staff loan book analytics"""
+
+    def setUp(self):
+        cache.clear()
+        self.extract_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            ANALYTICS_EXTRACT_PATH=Path(self.extract_dir.name) / 'loan_book.npz',
+            ANALYTICS_DUE_BUCKETS=(0, 30, 90),
+        )
+        self.settings_override.enable()
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.staff = get_user_model().objects.create_user(email='staff@example.com', password='password123',
+                                                          is_staff=True)
+        self.client.force_authenticate(self.staff)
+        Bank.objects.update(balance=Decimal('50000.00'))
+        account = BankAccount.objects.create(user=self.user, account_number='1234567890', balance=Decimal('20000.00'))
+        BankAccount.objects.create(user=self.user, account_number='0987654321', balance=Decimal('-100.00'))
+
+        today = date.today()
+        for amount, rate, loan_status, due_in_days in (
+            ('1000.00', '5.0', 'active', 10),
+            ('2000.00', '5.0', 'active', 60),
+            ('500.00', '7.5', 'active', -5),
+            ('3000.00', '7.5', 'active', 400),
+            ('400.00', '5.0', 'defaulted', -30),
+            ('0.00', '5.0', 'paid', 20),
+        ):
+            Loan.objects.create(account=account, loan_amount=Decimal(amount), interest_rate=Decimal(rate),
+                                status=loan_status, due_date=today + timedelta(days=due_in_days))
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.extract_dir.cleanup()
+
+    def refresh(self):
+        call_command('refresh_loan_analytics', stdout=StringIO())
+
+    def test_analytics(self):
+        """Test exposure, default rates and liquidity are computed from the extract"""
+        self.refresh()
+        res = self.client.get(LOAN_BOOK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['loan_count'], 6)
+        self.assertEqual(res.data['outstanding_principal'], '6500.00')
+        self.assertEqual(res.data['exposure_by_interest_rate'], [
+            {'interest_rate': '5.00', 'count': 2, 'outstanding_principal': '3000.00'},
+            {'interest_rate': '7.50', 'count': 2, 'outstanding_principal': '3500.00'},
+        ])
+        self.assertEqual(res.data['exposure_by_due_date'], [
+            {'bucket': 'due or overdue', 'count': 1, 'outstanding_principal': '500.00'},
+            {'bucket': '1-30 days', 'count': 1, 'outstanding_principal': '1000.00'},
+            {'bucket': '31-90 days', 'count': 1, 'outstanding_principal': '2000.00'},
+            {'bucket': 'over 90 days', 'count': 1, 'outstanding_principal': '3000.00'},
+        ])
+        self.assertEqual(res.data['default_rate'], {'by_count': round(1 / 6, 4), 'by_amount': round(400 / 6900, 4)})
+        self.assertEqual(res.data['liquidity'], {'bank_balance': '50000.00', 'customer_deposits': '20000.00',
+                                                 'ratio': 2.5})
+
+    def test_cached_until_refresh(self):
+        """Test the analytics are served from the cache without reading the database until the next refresh"""
+        self.refresh()
+        self.client.get(LOAN_BOOK_URL)
+        Loan.objects.update(status='defaulted')
+
+        with self.assertNumQueries(0):
+            res = self.client.get(LOAN_BOOK_URL)
+        self.assertEqual(res.data['outstanding_principal'], '6500.00')
+
+        self.refresh()
+        res = self.client.get(LOAN_BOOK_URL)
+        self.assertEqual(res.data['outstanding_principal'], '0.00')
+
+    def test_not_built(self):
+        """Test a missing extract returns 404"""
+        res = self.client.get(LOAN_BOOK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_staff_only(self):
+        """Test customers cannot read the analytics"""
+        self.client.force_authenticate(self.user)
+        res = self.client.get(LOAN_BOOK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
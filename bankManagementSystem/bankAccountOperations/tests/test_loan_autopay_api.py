@@ -0,0 +1,135 @@
+from collections import Counter
+from decimal import Decimal
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.autopay import add_month, sweep_autopay
+from core.models import BankAccount, Bank, Loan, Transaction, OutboxEvent, MonthlyAccountSummary
+
+GRANT_LOAN_URL = reverse('bankAccountOperations:loans-grant-loan')
+
+
+class LoanAutopayTests(TestCase):
+    """Test the autopay sweep of loan installments"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        Bank.objects.update(balance=Decimal('100000.00'), interest_rate=Decimal('5.0'))
+        self.account = BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                  balance=Decimal('1000.00'))
+        self.today = timezone.localdate()
+
+    def create_loan(self, account=None, loan_amount='1000.00', installment_amount='200.00'):
+        return Loan.objects.create(account=account or self.account, loan_amount=Decimal(loan_amount),
+                                   interest_rate=Decimal('5.0'), due_date=self.today + timedelta(days=365),
+                                   autopay=True, installment_amount=Decimal(installment_amount),
+                                   next_payment_date=self.today)
+
+    def test_grant_autopay_loan(self):
+        """Test an autopay loan is scheduled a month after it is granted"""
+        res = self.client.post(GRANT_LOAN_URL, {'account': self.account.id, 'loan_amount': '1000.00',
+                                                'due_date': self.today + timedelta(days=365),
+                                                'autopay': True, 'installment_amount': '100.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['next_payment_date'], add_month(self.today).isoformat())
+        self.assertEqual(res.data['installment_amount'], '100.00')
+
+    def test_grant_autopay_requires_installment(self):
+        """Test an autopay loan without an installment amount is refused"""
+        res = self.client.post(GRANT_LOAN_URL, {'account': self.account.id, 'loan_amount': '1000.00',
+                                                'due_date': self.today + timedelta(days=365), 'autopay': True})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('installment_amount', res.data)
+
+    def test_installment_collected(self):
+        """Test a due installment debits the account, reduces the loan and credits the bank"""
+        loan = self.create_loan()
+        bank_before = Bank.objects.get().balance
+
+        self.assertEqual(sweep_autopay(self.today), (1, 0))
+
+        self.account.refresh_from_db()
+        loan.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('790.00'))
+        self.assertEqual(self.account.version, 1)
+        self.assertEqual(loan.loan_amount, Decimal('800.00'))
+        self.assertEqual(loan.next_payment_date, add_month(self.today))
+        self.assertEqual(Bank.objects.get().balance, bank_before + Decimal('210.00'))
+
+        txn = Transaction.objects.get(account=self.account, transaction_type='loan_repayment')
+        self.assertEqual((txn.amount, txn.fee), (Decimal('200.00'), Decimal('10.00')))
+        event = OutboxEvent.objects.get(account_id=self.account.id, event_type='loan_repayment')
+        self.assertEqual(event.payload['balance'], '790.00')
+        rollup = MonthlyAccountSummary.objects.get(account=self.account, transaction_type='loan_repayment')
+        self.assertEqual((rollup.total_amount, rollup.count), (Decimal('200.00'), 1))
+
+    def test_not_collected_twice(self):
+        """Test a second sweep on the same day collects nothing"""
+        self.create_loan()
+        sweep_autopay(self.today)
+
+        self.assertEqual(sweep_autopay(self.today), (0, 0))
+
+    def test_last_installment_pays_off(self):
+        """Test the last installment is capped at the remaining principal and closes the loan"""
+        loan = self.create_loan(loan_amount='150.00')
+        sweep_autopay(self.today)
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.loan_amount, Decimal('0.00'))
+        self.assertEqual(loan.status, 'paid')
+
+    def test_insufficient_funds_skipped(self):
+        """Test a loan the account cannot cover stays due and changes nothing"""
+        poor = BankAccount.objects.create(user=self.user, account_number='0987654321', balance=Decimal('100.00'))
+        skipped = self.create_loan(account=poor)
+        self.create_loan()
+
+        self.assertEqual(sweep_autopay(self.today), (1, 1))
+
+        poor.refresh_from_db()
+        skipped.refresh_from_db()
+        self.assertEqual(poor.balance, Decimal('100.00'))
+        self.assertEqual(skipped.next_payment_date, self.today)
+
+    def test_batch_set_based(self):
+        """Test a batch of loans updates the accounts, loans and bank in one statement each"""
+        for number in range(20):
+            account = BankAccount.objects.create(user=self.user, account_number=f'55{number:08d}',
+                                                 balance=Decimal('1000.00'))
+            self.create_loan(account=account)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(sweep_autopay(self.today), (20, 0))
+
+        updates = Counter(query['sql'].split('"')[1] for query in queries.captured_queries
+                          if query['sql'].startswith('UPDATE'))
+        self.assertEqual(updates['core_bankaccount'], 1)
+        self.assertEqual(updates['core_loan'], 1)
+        self.assertEqual(updates['core_bank'], 1)
+
+    def test_command(self):
+        """Test the sweep_autopay command collects the due installments"""
+        self.create_loan()
+        out = StringIO()
+
+        call_command('sweep_autopay', date=self.today.isoformat(), stdout=out)
+
+        self.assertIn('Collected 1 installment(s)', out.getvalue())
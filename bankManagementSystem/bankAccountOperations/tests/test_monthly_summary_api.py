@@ -0,0 +1,84 @@
+from decimal import Decimal
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from core.models import BankAccount, MonthlyAccountSummary
+
+MONTHLY_SUMMARY_URL = reverse('bankAccountOperations:bankaccounts-monthly-summary')
+
+
+def create_bank_account(user, **params):
+    """Helper function to create a bank account"""
+    defaults = {
+        'account_number': '1234567890',
+        'balance': Decimal('1000.00'),
+        'status': 'active'
+    }
+    defaults.update(params)
+    return BankAccount.objects.create(user=user, **defaults)
+
+
+class MonthlySummaryTest(APITestCase):
+    """Test the monthly summary rollups and endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.account1 = create_bank_account(user=self.user, account_number='1234567890')
+        self.account2 = create_bank_account(user=self.user, account_number='0987654321')
+
+    def test_rollup_updated_on_each_operation(self):
+        """Test deposits are folded into a single rollup row"""
+        deposit_url = reverse('bankAccountOperations:bankaccounts-deposit')
+        self.client.post(deposit_url, {'account_id': self.account1.id, 'amount': '100.00'}, format='json')
+        self.client.post(deposit_url, {'account_id': self.account1.id, 'amount': '50.00'}, format='json')
+
+        summary = MonthlyAccountSummary.objects.get(account=self.account1, transaction_type='deposit')
+        self.assertEqual(summary.count, 2)
+        self.assertEqual(summary.total_amount + summary.total_fee, Decimal('150.00'))
+
+    def test_transfer_rolls_up_both_sides(self):
+        """Test a transfer creates transfer_out and transfer_in rollups"""
+        transfer_url = reverse('bankAccountOperations:bankaccounts-transfer')
+        payload = {
+            'source_account_id': self.account1.id,
+            'target_account_id': self.account2.id,
+            'amount': '100.00'
+        }
+        self.client.post(transfer_url, payload, format='json')
+
+        res = self.client.get(MONTHLY_SUMMARY_URL, {'account_id': self.account2.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['transaction_type'], 'transfer_in')
+        self.assertEqual(res.data[0]['total_amount'], '100.00')
+        self.assertEqual(res.data[0]['count'], 1)
+
+    def test_summary_limited_to_user(self):
+        """Test the summary of another user's account is not returned"""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        other_account = create_bank_account(user=other_user, account_number='5555555555')
+        MonthlyAccountSummary.objects.create(
+            account=other_account,
+            month='2024-10-01',
+            transaction_type='deposit',
+            total_amount=Decimal('10.00'),
+            count=1
+        )
+
+        res = self.client.get(MONTHLY_SUMMARY_URL, {'account_id': other_account.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_invalid_month_rejected(self):
+        """Test a badly formatted month is a bad request"""
+        res = self.client.get(MONTHLY_SUMMARY_URL, {'account_id': self.account1.id, 'month': 'October'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
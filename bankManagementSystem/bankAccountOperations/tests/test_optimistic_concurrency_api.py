@@ -0,0 +1,109 @@
+from decimal import Decimal
+from datetime import date, timedelta
+from unittest.mock import patch
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+from core import concurrency
+from core.models import BankAccount, Bank, Loan, Transaction
+
+WITHDRAW_URL = reverse('bankAccountOperations:bankaccounts-withdraw')
+REPAY_URL = reverse('bankAccountOperations:loans-repay-loan')
+TRANSFER_URL = reverse('bankAccountOperations:bankaccounts-transfer')
+
+compare_and_swap = concurrency.compare_and_swap
+
+
+def racing_compare_and_swap(model, **changes):
+    """compare_and_swap losing its first race against a concurrent write of the same row"""
+    raced = set()
+
+    def cas(instance, **kwargs):
+        if type(instance) is model and instance.pk not in raced:
+            raced.add(instance.pk)
+            model.objects.filter(pk=instance.pk).update(version=F('version') + 1, **changes)
+        return compare_and_swap(instance, **kwargs)
+    return cas
+
+
+@override_settings(VELOCITY_RULES={})
+class OptimisticConcurrencyAPITests(TestCase):
+    """Test the balance and loan writes under concurrent updates"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        Bank.objects.update(transaction_fee_percentage=Decimal('0.0'))
+        self.account = BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                  balance=Decimal('1000.00'))
+
+    def test_withdrawal_keeps_concurrent_deposit(self):
+        """Test a withdrawal racing a deposit is retried instead of overwriting it"""
+        race = racing_compare_and_swap(BankAccount, balance=F('balance') + Decimal('50.00'))
+        with patch.object(concurrency, 'compare_and_swap', side_effect=race):
+            res = self.client.post(WITHDRAW_URL, {'account_id': self.account.id, 'amount': '100.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('950.00'))
+
+    def test_transfer_racing_close_refused(self):
+        """Test a transfer validated before its target was closed does not credit the closed account"""
+        target = BankAccount.objects.create(user=self.user, account_number='0987654321')
+        race = racing_compare_and_swap(BankAccount, status='closed')
+
+        def close_target(instance, **kwargs):
+            return (race if instance.pk == target.pk else compare_and_swap)(instance, **kwargs)
+
+        with patch.object(concurrency, 'compare_and_swap', side_effect=close_target):
+            res = self.client.post(TRANSFER_URL, {'source_account_id': self.account.id,
+                                                  'target_account_id': target.id, 'amount': '100.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.account.refresh_from_db()
+        target.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('1000.00'))
+        self.assertEqual(target.balance, Decimal('0.00'))
+
+    def test_withdrawal_rechecks_funds_after_conflict(self):
+        """Test a withdrawal racing another debit is refused when the funds are gone"""
+        race = racing_compare_and_swap(BankAccount, balance=Decimal('20.00'))
+        with patch.object(concurrency, 'compare_and_swap', side_effect=race):
+            res = self.client.post(WITHDRAW_URL, {'account_id': self.account.id, 'amount': '100.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Transaction.objects.filter(account=self.account, transaction_type='withdrawal').exists())
+
+    def test_repayment_keeps_concurrent_loan_change(self):
+        """Test a repayment racing another repayment of the same loan deducts both"""
+        Bank.objects.update(interest_rate=Decimal('0.0'))
+        loan = Loan.objects.create(account=self.account, loan_amount=Decimal('500.00'),
+                                   interest_rate=Decimal('0.0'), due_date=date.today() + timedelta(days=30))
+        race = racing_compare_and_swap(Loan, loan_amount=F('loan_amount') - Decimal('200.00'))
+        with patch.object(concurrency, 'compare_and_swap', side_effect=race):
+            res = self.client.post(REPAY_URL, {'loan_id': loan.id, 'repayment_amount': '300.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        loan.refresh_from_db()
+        self.assertEqual(loan.loan_amount, Decimal('0.00'))
+        self.assertEqual(loan.status, 'paid')
+
+    @override_settings(OPTIMISTIC_RETRY_ATTEMPTS=2)
+    def test_persistent_conflict_returns_409(self):
+        """Test a write that keeps losing its race is answered with 409 and changes nothing"""
+        with patch.object(concurrency, 'compare_and_swap', return_value=False):
+            res = self.client.post(WITHDRAW_URL, {'account_id': self.account.id, 'amount': '100.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('1000.00'))
+        self.assertFalse(Transaction.objects.filter(account=self.account).exists())
@@ -0,0 +1,146 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from importlib import import_module
+from decimal import Decimal
+from datetime import date, timedelta
+from io import StringIO
+from pathlib import Path
+from django.core.cache import cache
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, SimpleTestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.archive import archive_transactions
+from core.models import BankAccount, Bank, LedgerBaseline
+
+
+class LedgerReconciliationTests(TestCase):
+    """Test the ledger reconciliation command"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        Bank.objects.update(transaction_fee_percentage=Decimal('1.0'), interest_rate=Decimal('5.0'))
+        self.account1 = BankAccount.objects.create(user=self.user, account_number='1234567890')
+        self.account2 = BankAccount.objects.create(user=self.user, account_number='0987654321')
+
+        self.post('bankaccounts-deposit', {'account_id': self.account1.id, 'amount': '1000.00'})
+        self.post('bankaccounts-withdraw', {'account_id': self.account1.id, 'amount': '100.00'})
+        self.post('bankaccounts-transfer', {'source_account_id': self.account1.id,
+                                            'target_account_id': self.account2.id, 'amount': '200.00'})
+        loan = self.post('loans-grant-loan', {'account': self.account2.id, 'loan_amount': '1000.00',
+                                              'due_date': date.today() + timedelta(days=365)})
+        self.post('loans-repay-loan', {'loan_id': loan.data['id'], 'repayment_amount': '400.00'})
+
+        self.report_dir = tempfile.TemporaryDirectory()
+        self.report_path = Path(self.report_dir.name) / 'report.json'
+
+    def tearDown(self):
+        self.report_dir.cleanup()
+
+    def post(self, name, payload):
+        res = self.client.post(reverse(f'bankAccountOperations:{name}'), payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK, res.data)
+        return res
+
+    def reconcile(self):
+        call_command('reconcile_ledger', workers=0, range_size=1, output=self.report_path, stdout=StringIO())
+        return json.loads(self.report_path.read_text())
+
+    def test_ledger_balanced(self):
+        """Test balances written by the API reconcile with the transactions"""
+        report = self.reconcile()
+
+        self.assertEqual(report['accounts_checked'], 2)
+        self.assertEqual(report['account_discrepancies'], [])
+        self.assertTrue(report['bank']['balanced'], report['bank'])
+
+    def test_archived_transactions_counted(self):
+        """Test archived history is part of the expected balances"""
+        archive_transactions(timezone.now() + timedelta(seconds=1), account_id=self.account1.id)
+
+        report = self.reconcile()
+
+        self.assertEqual(report['account_discrepancies'], [])
+        self.assertTrue(report['bank']['balanced'])
+
+    def test_drift_reported(self):
+        """Test balances changed outside the ledger are reported"""
+        BankAccount.objects.filter(id=self.account2.id).update(balance=Decimal('0.00'))
+        Bank.objects.update(balance=Decimal('1.00'))
+
+        report = self.reconcile()
+
+        self.assertEqual([row['account'] for row in report['account_discrepancies']], [self.account2.id])
+        self.assertFalse(report['bank']['balanced'])
+
+    def test_cutover_baseline_absorbs_unrecorded_loans(self):
+        """Test the baselines recorded by migration 0022 cover loan flows that left no transactions"""
+        # A loan granted before loan flows were recorded as transactions
+        BankAccount.objects.filter(id=self.account1.id).update(balance=F('balance') + Decimal('500.00'))
+        Bank.objects.update(balance=F('balance') - Decimal('500.00'))
+        self.assertEqual(len(self.reconcile()['account_discrepancies']), 1)
+
+        import_module('core.migrations.0022_ledger_baseline').record_ledger_baselines(apps, None)
+        report = self.reconcile()
+
+        self.assertEqual(LedgerBaseline.objects.get(account=self.account1).amount, Decimal('500.00'))
+        self.assertEqual(LedgerBaseline.objects.get(account__isnull=True).amount, Decimal('-500.00'))
+        self.assertEqual(report['account_discrepancies'], [])
+        self.assertTrue(report['bank']['balanced'], report['bank'])
+
+
+SEED = """
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from core.models import BankAccount, Transaction
+user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+for number in ('1111111111', '2222222222', '3333333333'):
+    account = BankAccount.objects.create(user=user, account_number=number)
+    Transaction.objects.create(account=account, transaction_type='deposit', amount=Decimal('100.00'))
+    BankAccount.objects.filter(id=account.id).update(balance=Decimal('100.00'))
+BankAccount.objects.filter(account_number='3333333333').update(balance=Decimal('90.00'))
+"""
+
+
+class ParallelReconciliationTests(SimpleTestCase):
+    """Test the reconciliation on a process pool, against a database file the workers can open"""
+
+    def manage(self, directory, *args):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'reconcile_settings',
+               'PYTHONPATH': os.pathsep.join([directory, str(settings.BASE_DIR)])}
+        return subprocess.run([sys.executable, str(settings.BASE_DIR / 'manage.py'), *args], env=env, check=True,
+                              capture_output=True, text=True, timeout=300)
+
+    def test_workers_reconcile_ranges(self):
+        """Test the worker processes reconcile every range and their results are merged"""
+        with tempfile.TemporaryDirectory() as directory:
+            Path(directory, 'reconcile_settings.py').write_text(
+                "from bankManagementSystem.settings import *\n"
+                f"DATABASES = {{'default': {{'ENGINE': 'django.db.backends.sqlite3', "
+                f"'NAME': {str(Path(directory, 'db.sqlite3'))!r}}}}}\n"
+            )
+            report_path = Path(directory, 'report.json')
+            self.manage(directory, 'migrate', '-v', '0')
+            self.manage(directory, 'shell', '-c', SEED)
+
+            self.manage(directory, 'reconcile_ledger', '--workers', '2', '--range-size', '1', '--output', str(report_path))
+            report = json.loads(report_path.read_text())
+
+        self.assertEqual(report['accounts_checked'], 3)
+        self.assertEqual([row['difference'] for row in report['account_discrepancies']], ['-10.00'])
+        self.assertTrue(report['bank']['balanced'], report['bank'])
@@ -0,0 +1,89 @@
+from decimal import Decimal
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from core.models import BankAccount
+from core.throttling import SlidingWindowThrottle
+
+DEPOSIT_URL = reverse('bankAccountOperations:bankaccounts-deposit')
+WITHDRAW_URL = reverse('bankAccountOperations:bankaccounts-withdraw')
+
+
+@override_settings(ACTION_THROTTLE_RATES={'bankaccounts.deposit': '2/min'})
+class SlidingWindowThrottleTest(APITestCase):
+    """Test the per user, per action sliding window throttles"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.account = BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                  balance=Decimal('1000.00'))
+        self.payload = {'account_id': self.account.id, 'amount': '10.00'}
+
+    def test_empty_bucket_returns_429(self):
+        """Test requests beyond the burst are rejected with Retry-After before any query"""
+        with patch.object(SlidingWindowThrottle, 'timer', return_value=600.0):
+            for _ in range(2):
+                res = self.client.post(DEPOSIT_URL, self.payload, format='json')
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+            with self.assertNumQueries(0):
+                res = self.client.post(DEPOSIT_URL, self.payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '90')
+
+    def test_previous_window_slides_out(self):
+        """Test the previous window counts by its share still inside the period"""
+        with patch.object(SlidingWindowThrottle, 'timer', return_value=600.0):
+            for _ in range(3):
+                self.client.post(DEPOSIT_URL, self.payload, format='json')
+
+        # Half way through the next window the two earlier requests weigh as one
+        with patch.object(SlidingWindowThrottle, 'timer', return_value=690.0):
+            allowed = self.client.post(DEPOSIT_URL, self.payload, format='json')
+            rejected = self.client.post(DEPOSIT_URL, self.payload, format='json')
+
+        self.assertEqual(allowed.status_code, status.HTTP_200_OK)
+        self.assertEqual(rejected.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(rejected['Retry-After'], '30')
+
+    def test_rejected_after_eviction(self):
+        """Test a rejected request whose window key was evicted is still answered with 429"""
+        with patch.object(SlidingWindowThrottle, 'timer', return_value=600.0):
+            for _ in range(2):
+                self.client.post(DEPOSIT_URL, self.payload, format='json')
+            with patch.object(SlidingWindowThrottle.cache, 'decr', side_effect=ValueError):
+                res = self.client.post(DEPOSIT_URL, self.payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_buckets_are_per_action(self):
+        """Test an empty deposit bucket does not limit withdrawals"""
+        for _ in range(3):
+            self.client.post(DEPOSIT_URL, self.payload, format='json')
+
+        res = self.client.post(WITHDRAW_URL, self.payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_buckets_are_per_user(self):
+        """Test one user emptying a bucket does not limit another user"""
+        for _ in range(3):
+            self.client.post(DEPOSIT_URL, self.payload, format='json')
+
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        other_account = BankAccount.objects.create(user=other_user, account_number='5555555555')
+        self.client.force_authenticate(user=other_user)
+        res = self.client.post(DEPOSIT_URL, {'account_id': other_account.id, 'amount': '10.00'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,82 @@
+from decimal import Decimal
+from io import StringIO
+from datetime import timedelta
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from core.models import BankAccount, Transaction, ArchivedTransaction
+
+TRANSACTIONS_URL = reverse('bankAccountOperations:bankaccounts-get-all-transactions')
+
+
+class TransactionArchiveTest(APITestCase):
+    """Test archiving old transactions and reading them back"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.account = BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                  balance=Decimal('1000.00'))
+        self.old = Transaction.objects.create(account=self.account, transaction_type='deposit',
+                                              amount=Decimal('10.00'))
+        Transaction.objects.filter(id=self.old.id).update(created_at=timezone.now() - timedelta(days=400))
+        self.recent = Transaction.objects.create(account=self.account, transaction_type='withdrawal',
+                                                 amount=Decimal('5.00'))
+
+    def test_archive_moves_old_transactions(self):
+        """Test only transactions past the horizon leave the hot table"""
+        call_command('archive_transactions', older_than_days=365, stdout=StringIO())
+
+        self.assertFalse(Transaction.objects.filter(id=self.old.id).exists())
+        self.assertTrue(Transaction.objects.filter(id=self.recent.id).exists())
+        archived = ArchivedTransaction.objects.get(id=self.old.id)
+        self.assertEqual(archived.account_id, self.account.id)
+        self.assertEqual(archived.amount, Decimal('10.00'))
+
+    def test_transactions_include_archived_history(self):
+        """Test the transactions listing reads hot and archived rows, newest first"""
+        call_command('archive_transactions', older_than_days=365, stdout=StringIO())
+
+        res = self.client.get(TRANSACTIONS_URL, {'account_id': self.account.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in res.data], [self.recent.id, self.old.id])
+        self.assertEqual(res.data[1]['account'], self.account.id)
+        self.assertEqual(res.data[1]['amount'], '10.00')
+
+    def test_transactions_unpaged_by_default(self):
+        """Test the listing returns every transaction as a list unless a page is asked for"""
+        Transaction.objects.bulk_create([
+            Transaction(account=self.account, transaction_type='deposit', amount=Decimal('1.00')) for _ in range(60)
+        ])
+        call_command('archive_transactions', older_than_days=365, stdout=StringIO())
+
+        res = self.client.get(TRANSACTIONS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 62)
+        self.assertEqual(res.data[-1]['id'], self.old.id)
+
+    def test_transactions_paged_across_tables(self):
+        """Test the cursor walks from the hot rows into the archived ones"""
+        call_command('archive_transactions', older_than_days=365, stdout=StringIO())
+
+        first = self.client.get(TRANSACTIONS_URL, {'account_id': self.account.id, 'page_size': 1})
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual([row['id'] for row in first.data['results']], [self.recent.id])
+        self.assertEqual([row['id'] for row in second.data['results']], [self.old.id])
+        self.assertIsNone(second.data['next'])
+
+    def test_invalid_cursor_returns_404(self):
+        """Test a malformed cursor is rejected"""
+        res = self.client.get(TRANSACTIONS_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
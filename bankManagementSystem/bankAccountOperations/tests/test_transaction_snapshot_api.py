@@ -0,0 +1,127 @@
+import json
+import tempfile
+from array import array
+from decimal import Decimal
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from core.archive import archive_transactions
+from core.models import BankAccount, Transaction
+from core.snapshots import EPOCH, TYPE_CODES, export_snapshot
+
+
+@override_settings(SNAPSHOT_SETTLE_DELAY=0)
+class TransactionSnapshotTests(TestCase):
+    """Test the incremental columnar export of the transaction ledger"""
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.snapshot_dir.name)
+        user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.account = BankAccount.objects.create(user=user, account_number='1234567890')
+
+    def tearDown(self):
+        self.snapshot_dir.cleanup()
+
+    def create_transaction(self, transaction_type, amount, fee='0.00'):
+        return Transaction.objects.create(account=self.account, transaction_type=transaction_type,
+                                          amount=Decimal(amount), fee=Decimal(fee))
+
+    def read_column(self, manifest, segment, column):
+        values = array('b' if manifest['columns'][column] == '<i1' else 'q')
+        values.frombytes((self.directory / segment['files'][column]).read_bytes())
+        return values.tolist()
+
+    def manifest(self):
+        return json.loads((self.directory / 'manifest.json').read_text())
+
+    def test_export_columns(self):
+        """Test each column file holds the typed values of the exported rows"""
+        deposit = self.create_transaction('deposit', '100.25', '1.01')
+        withdrawal = self.create_transaction('withdrawal', '40.00', '0.40')
+
+        segment = export_snapshot(self.directory)
+
+        manifest = self.manifest()
+        self.assertEqual(manifest['watermark'], withdrawal.id)
+        self.assertEqual(segment['row_count'], 2)
+        self.assertEqual(self.read_column(manifest, segment, 'id'), [deposit.id, withdrawal.id])
+        self.assertEqual(self.read_column(manifest, segment, 'account_id'), [self.account.id] * 2)
+        self.assertEqual(self.read_column(manifest, segment, 'type_code'),
+                         [TYPE_CODES['deposit'], TYPE_CODES['withdrawal']])
+        self.assertEqual(self.read_column(manifest, segment, 'amount_minor'), [10025, 4000])
+        self.assertEqual(self.read_column(manifest, segment, 'fee_minor'), [101, 40])
+        self.assertEqual(self.read_column(manifest, segment, 'created_at_us')[0],
+                         (deposit.created_at - EPOCH) // timedelta(microseconds=1))
+
+    def test_incremental(self):
+        """Test a second export only appends the rows above the watermark"""
+        self.create_transaction('deposit', '10.00')
+        export_snapshot(self.directory)
+        later = self.create_transaction('deposit', '20.00')
+
+        segment = export_snapshot(self.directory)
+
+        self.assertEqual(self.read_column(self.manifest(), segment, 'id'), [later.id])
+        self.assertEqual(self.manifest()['row_count'], 2)
+        self.assertEqual(len(self.manifest()['segments']), 2)
+        self.assertIsNone(export_snapshot(self.directory))
+
+    def test_archived_rows_exported(self):
+        """Test rows archived before their first export are read from the archive, in id order"""
+        archived = self.create_transaction('deposit', '10.00')
+        archive_transactions(timezone.now() + timedelta(seconds=1))
+        hot = self.create_transaction('deposit', '20.00')
+
+        segment = export_snapshot(self.directory, flush_rows=1)
+
+        self.assertEqual(self.read_column(self.manifest(), segment, 'id'), [archived.id, hot.id])
+
+    def test_stops_before_unsettled_rows(self):
+        """Test the segment ends before a recent gap in the ids, which a later commit may still fill"""
+        first = self.create_transaction('deposit', '10.00')
+        self.create_transaction('deposit', '20.00').delete()  # Stands in for an id whose transaction is open
+        after_gap = self.create_transaction('deposit', '30.00')
+
+        segment = export_snapshot(self.directory)
+
+        self.assertEqual(self.read_column(self.manifest(), segment, 'id'), [first.id])
+        self.assertEqual(self.manifest()['watermark'], first.id)
+
+        with override_settings(SNAPSHOT_GAP_TIMEOUT=0):  # The gap is now taken for a rolled back id
+            segment = export_snapshot(self.directory)
+        self.assertEqual(self.read_column(self.manifest(), segment, 'id'), [after_gap.id])
+
+    @override_settings(SNAPSHOT_SETTLE_DELAY=60)
+    def test_young_rows_held_back(self):
+        """Test rows younger than the settle delay are left for the next export"""
+        self.create_transaction('deposit', '10.00')
+
+        self.assertIsNone(export_snapshot(self.directory))
+        self.assertFalse((self.directory / 'manifest.json').exists())
+
+    def test_type_code_mismatch_refused(self):
+        """Test a snapshot written with other type codes is not appended to"""
+        self.create_transaction('deposit', '10.00')
+        export_snapshot(self.directory)
+        manifest = self.manifest()
+        manifest['type_codes']['deposit'] += 1
+        (self.directory / 'manifest.json').write_text(json.dumps(manifest))
+        self.create_transaction('deposit', '20.00')
+
+        with self.assertRaises(CommandError):
+            call_command('export_transaction_snapshot', output=str(self.directory), stdout=StringIO())
+        self.assertEqual(self.manifest()['row_count'], 1)
+
+    def test_command(self):
+        """Test the command reports the exported segment"""
+        self.create_transaction('deposit', '10.00')
+        out = StringIO()
+
+        call_command('export_transaction_snapshot', output=str(self.directory), stdout=out)
+
+        self.assertIn('Exported 1 transaction(s)', out.getvalue())
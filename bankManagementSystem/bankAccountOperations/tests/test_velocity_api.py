@@ -0,0 +1,117 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+from core import velocity
+from core.models import BankAccount, Bank, Transaction
+
+WITHDRAW_URL = reverse('bankAccountOperations:bankaccounts-withdraw')
+TRANSFER_URL = reverse('bankAccountOperations:bankaccounts-transfer')
+
+VELOCITY_RULES = {
+    'debits_per_minute': {
+        'transaction_types': ('withdrawal', 'transfer_out'),
+        'metric': 'count',
+        'limit': 2,
+        'window': 60,
+        'buckets': 6,
+    },
+    'debited_amount_per_hour': {
+        'transaction_types': ('withdrawal',),
+        'metric': 'amount',
+        'limit': 500,
+        'window': 3600,
+        'buckets': 12,
+    },
+}
+
+
+@override_settings(VELOCITY_RULES=VELOCITY_RULES)
+class ReservationTests(TestCase):
+    """Test reserving debits in the windows of time buckets"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_buckets_slide_out_of_window(self):
+        """Test debits stop counting once their bucket slides out of the window"""
+        velocity.reserve(1, 'transfer_out', Decimal('1.00'), now=0)
+        velocity.reserve(1, 'transfer_out', Decimal('1.00'), now=30)
+
+        with self.assertRaises(velocity.VelocityLimitExceeded):
+            velocity.reserve(1, 'transfer_out', Decimal('1.00'), now=55)
+        velocity.reserve(1, 'transfer_out', Decimal('1.00'), now=65)
+
+    def test_rejected_debit_takes_nothing(self):
+        """Test a debit over one rule leaves the counters of every rule as they were"""
+        velocity.reserve(1, 'withdrawal', Decimal('400.00'), now=0)
+
+        with self.assertRaises(velocity.VelocityLimitExceeded) as raised:
+            velocity.reserve(1, 'withdrawal', Decimal('150.00'), now=10)
+
+        self.assertEqual(raised.exception.args, ('debited_amount_per_hour',))
+        velocity.reserve(1, 'withdrawal', Decimal('100.00'), now=20)  # Second debit of the minute still fits
+
+    def test_released_debit_frees_its_place(self):
+        """Test a released reservation no longer counts"""
+        reservation = velocity.reserve(1, 'withdrawal', Decimal('400.00'), now=0)
+        velocity.release(reservation)
+
+        velocity.reserve(1, 'withdrawal', Decimal('500.00'), now=10)
+
+
+@override_settings(VELOCITY_RULES=VELOCITY_RULES)
+class VelocityAPITests(TestCase):
+    """Test withdrawals and transfers are screened by the velocity rules"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        Bank.objects.create(balance=Decimal('100000.00'), transaction_fee_percentage=Decimal('0.0'))
+        self.account = BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                  balance=Decimal('10000.00'))
+        self.other = BankAccount.objects.create(user=self.user, account_number='0987654321')
+
+    def withdraw(self, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(WITHDRAW_URL, {'account_id': self.account.id, 'amount': amount})
+
+    def test_debit_count_limit(self):
+        """Test a burst of debits over the count limit is blocked"""
+        self.assertEqual(self.withdraw('10.00').status_code, status.HTTP_200_OK)
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(TRANSFER_URL, {'source_account_id': self.account.id,
+                                                  'target_account_id': self.other.id, 'amount': '10.00'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.withdraw('10.00')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Transaction.objects.filter(account=self.account, transaction_type='withdrawal').count(), 1)
+
+    def test_debit_amount_limit(self):
+        """Test a withdrawal taking the hourly amount over the limit is blocked"""
+        self.assertEqual(self.withdraw('400.00').status_code, status.HTTP_200_OK)
+
+        res = self.withdraw('150.00')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('account', res.data)
+
+    def test_failed_debit_not_counted(self):
+        """Test a debit failing after validation gives its reservation back"""
+        BankAccount.objects.filter(id=self.account.id).update(balance=Decimal('100.00'))
+        self.assertEqual(self.withdraw('400.00').status_code, status.HTTP_400_BAD_REQUEST)  # Insufficient funds
+
+        BankAccount.objects.filter(id=self.account.id).update(balance=Decimal('10000.00'))
+        res = self.withdraw('450.00')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
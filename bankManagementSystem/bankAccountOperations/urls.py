@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from bankAccountOperations.views import BankAccountViewSet, LoanViewSet
+from bankAccountOperations.views import BankAccountViewSet, LoanViewSet, ChangeFeedView, LoanBookAnalyticsView, balance_stream
 
 # Create a router and register the BankAccountViewSet and LoanViewSet
 router = DefaultRouter()
@@ -12,4 +12,7 @@ app_name = 'bankAccountOperations'
 # Include the router URLs
 urlpatterns = [
     path('', include(router.urls)),
+    path('changes/', ChangeFeedView.as_view(), name='change-feed'),
+    path('stream/', balance_stream, name='balance-stream'),
+    path('analytics/loan-book/', LoanBookAnalyticsView.as_view(), name='loan-book-analytics'),
 ]
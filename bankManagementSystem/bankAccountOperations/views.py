@@ -1,12 +1,30 @@
+import asyncio
+import json
 from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter, OpenApiTypes
 from rest_framework import viewsets, status
 from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from core.models import BankAccount, Loan, Transaction ,Bank
-from .serializers import DepositSerializer, WithdrawalSerializer, BalanceSerializer, TransferSerializer, LoanSerializer,TransactionSerializer
+from rest_framework.views import APIView
+from datetime import datetime
+from core import account_summary, identity, outbox
+from core.archive import transaction_history
+from core.authentication import authenticate_token
+from core.concurrency import adjust_balance, adjust_bank_balance, update_with_retry, InsufficientFunds
+from core.streaming import hub
+from core.pagination import LoanCursorPagination, TransactionHistoryPagination
+from core.throttling import SlidingWindowThrottle
+from core.models import BankAccount, Loan, Transaction ,Bank, MonthlyAccountSummary
+from .serializers import DepositSerializer, WithdrawalSerializer, BalanceSerializer, TransferSerializer, LoanSerializer, \
+    MonthlyAccountSummarySerializer, TRANSACTION_LIST_FIELDS, LOAN_LIST_FIELDS, transaction_rows_data, loan_rows_data, \
+    event_rows_data, loan_summary_data, TransactionSerializer, LoanPageSerializer
 
 
 class BankAccountViewSet(viewsets.GenericViewSet):
@@ -15,6 +33,7 @@ class BankAccountViewSet(viewsets.GenericViewSet):
     """
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (SlidingWindowThrottle,)
     queryset = BankAccount.objects.all()
 
     def get_queryset(self):
@@ -90,7 +109,7 @@ class BankAccountViewSet(viewsets.GenericViewSet):
             return Response({"account_id": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            account = BankAccount.objects.get(pk=account_id, user=request.user)
+            account = identity.get(BankAccount, pk=account_id, user=request.user)
         except BankAccount.DoesNotExist:
             return Response({"detail": "Account not found or does not belong to you."},
                             status=status.HTTP_404_NOT_FOUND)
@@ -101,6 +120,43 @@ class BankAccountViewSet(viewsets.GenericViewSet):
 
         return Response({"balance": account.balance}, status=status.HTTP_200_OK)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='account_id',
+                description='ID of the bank account to summarize',
+                required=True,
+                type=OpenApiTypes.INT
+            )
+        ],
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: OpenApiTypes.OBJECT,
+            404: OpenApiTypes.OBJECT,
+        }
+    )
+    @action(methods=['GET'], detail=False, url_path='summary')
+    def summary(self, request):
+        """Retrieve the balance, status and recent transactions of an account, served from the cache"""
+        account_id = request.query_params.get('account_id')
+        if not account_id:
+            return Response({"account_id": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        version = account_summary.summary_version(account_id)
+        summary = account_summary.get_account_summary(account_id, version)
+        if summary is not None and summary['user_id'] == request.user.id:
+            return Response(summary, status=status.HTTP_200_OK)
+
+        try:
+            account = identity.get(BankAccount, pk=account_id, user=request.user)
+        except (BankAccount.DoesNotExist, ValueError):
+            return Response({"detail": "Account not found or does not belong to you."},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        summary = account_summary.build_account_summary(account)
+        account_summary.store_account_summary(summary, version)
+        return Response(summary, status=status.HTTP_200_OK)
+
     @action(methods=['POST'], detail=False, url_path='transfer')
     def transfer(self, request):
         """Transfer funds between accounts using account IDs."""
@@ -125,6 +181,19 @@ class BankAccountViewSet(viewsets.GenericViewSet):
                 description='ID of the bank account to filter transactions',
                 required=False,
                 type=OpenApiTypes.INT
+            ),
+            OpenApiParameter(
+                name='cursor',
+                description='Position returned as `next` by the previous page, the response is then a page',
+                required=False,
+                type=OpenApiTypes.STR
+            ),
+            OpenApiParameter(
+                name='page_size',
+                description='Transactions per page, the response is then a page `{next, results}` '
+                            'instead of the full list',
+                required=False,
+                type=OpenApiTypes.INT
             )
         ],
         responses={200: TransactionSerializer(many=True)},
@@ -135,21 +204,56 @@ class BankAccountViewSet(viewsets.GenericViewSet):
         user = request.user
         account_id = request.query_params.get('account_id')
 
-        # Filter transactions by the user and optionally by account_id if provided
+        # Filter transactions by the user and optionally by account_id if provided,
+        # reading the archived history alongside the hot table
+        filters = {'account__user': user}
         if account_id:
-            transactions = Transaction.objects.filter(account__user=user, account__id=account_id).order_by(
-                '-created_at')
-        else:
-            transactions = Transaction.objects.filter(account__user=user).order_by('-created_at')
-
-        # Support pagination if enabled
-        page = self.paginate_queryset(transactions)
-        if page is not None:
-            serializer = TransactionSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        # Return the full list of transactions if pagination is not applied
-        serializer = TransactionSerializer(transactions, many=True)
+            filters['account__id'] = account_id
+
+        paginator = TransactionHistoryPagination()
+        if paginator.is_requested(request):
+            page = paginator.paginate_history(request, TRANSACTION_LIST_FIELDS, **filters)
+            return paginator.get_paginated_response(transaction_rows_data(page))
+
+        # The full list, the two tables merged as they are read
+        rows = transaction_history(TRANSACTION_LIST_FIELDS, **filters)
+        return Response(transaction_rows_data(rows), status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='account_id',
+                description='ID of the bank account to summarize',
+                required=True,
+                type=OpenApiTypes.INT
+            ),
+            OpenApiParameter(
+                name='month',
+                description='Restrict the summary to one month, formatted YYYY-MM',
+                required=False,
+                type=OpenApiTypes.STR
+            )
+        ],
+        responses={200: MonthlyAccountSummarySerializer(many=True)},
+    )
+    @action(methods=['GET'], detail=False, url_path='monthly-summary')
+    def monthly_summary(self, request):
+        """Retrieve the monthly totals per transaction type from the rollup table."""
+        account_id = request.query_params.get('account_id')
+        if not account_id:
+            return Response({"account_id": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        summaries = MonthlyAccountSummary.objects.filter(account__id=account_id, account__user=request.user)
+
+        month = request.query_params.get('month')
+        if month:
+            try:
+                month = datetime.strptime(month, '%Y-%m').date()
+            except ValueError:
+                return Response({"month": ["Month must be formatted YYYY-MM."]}, status=status.HTTP_400_BAD_REQUEST)
+            summaries = summaries.filter(month=month)
+
+        serializer = MonthlyAccountSummarySerializer(summaries.order_by('-month', 'transaction_type'), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -159,12 +263,15 @@ class LoanViewSet(viewsets.GenericViewSet):
     """
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (SlidingWindowThrottle,)
+    pagination_class = LoanCursorPagination
     queryset = Loan.objects.all()
 
     def get_serializer_class(self):
         return LoanSerializer
 
     @action(methods=['POST'], detail=False, url_path='grant')
+    @transaction.atomic
     def grant_loan(self, request):
         """Grant a loan to a bank account"""
         serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -172,7 +279,7 @@ class LoanViewSet(viewsets.GenericViewSet):
             loan = serializer.save()
 
             # Set interest rate and fee based on the bank's current values
-            bank = Bank.objects.first()
+            bank = identity.first(Bank)
             if not bank:
                 return Response({"detail": "Bank instance not found."},
                                 status=status.HTTP_400_BAD_REQUEST)
@@ -180,8 +287,13 @@ class LoanViewSet(viewsets.GenericViewSet):
             loan.save()
 
             # Add loan amount to the user's account balance
-            loan.account.balance += loan.loan_amount
-            loan.account.save()
+            adjust_balance(loan.account, loan.loan_amount)
+            Transaction.objects.create(
+                account=loan.account,
+                transaction_type='loan_disbursement',
+                amount=loan.loan_amount,
+                description=f'Loan {loan.id}'
+            )
 
             return Response({
                 "id": loan.id,
@@ -190,7 +302,10 @@ class LoanViewSet(viewsets.GenericViewSet):
                 "interest_rate": str(loan.interest_rate),
                 "status": loan.status,
                 "created_at": loan.created_at.isoformat(),
-                "due_date": loan.due_date.isoformat()
+                "due_date": loan.due_date.isoformat(),
+                "autopay": loan.autopay,
+                "installment_amount": None if loan.installment_amount is None else str(loan.installment_amount),
+                "next_payment_date": loan.next_payment_date and loan.next_payment_date.isoformat()
             }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -208,6 +323,7 @@ class LoanViewSet(viewsets.GenericViewSet):
         responses={200: 'Loan repayment successful.', 400: 'Bad request', 404: 'Loan not found'}
     )
     @action(methods=['POST'], detail=False, url_path='repay')
+    @transaction.atomic
     def repay_loan(self, request):
         """Repay a loan for a bank account"""
         loan_id = request.data.get('loan_id')
@@ -218,7 +334,7 @@ class LoanViewSet(viewsets.GenericViewSet):
                             status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            loan = Loan.objects.get(id=loan_id, account__user=request.user)
+            loan = identity.get(Loan, pk=loan_id, account__user=request.user)
         except Loan.DoesNotExist:
             return Response({"detail": "Loan not found or does not belong to you."},
                             status=status.HTTP_404_NOT_FOUND)
@@ -237,29 +353,35 @@ class LoanViewSet(viewsets.GenericViewSet):
         interest = repayment_amount * (loan.interest_rate / 100)
         total_repayment = repayment_amount + interest
 
-        # Ensure the account has enough funds for the repayment
-        if loan.account.balance < total_repayment:
+        # Deduct from the borrower's account balance, ensuring it has enough funds for the repayment
+        try:
+            adjust_balance(loan.account, -total_repayment, floor=0)
+        except InsufficientFunds:
             return Response({"detail": "Insufficient funds in the account for repayment."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # Deduct from the borrower's account balance
-        loan.account.balance -= total_repayment
-        loan.account.save()
-
         # Deduct repayment from the loan amount
-        loan.loan_amount -= repayment_amount
-        if loan.loan_amount <= 0:
-            loan.status = 'paid'
-        loan.save()
+        def repaid(loan):
+            loan_amount = loan.loan_amount - repayment_amount
+            return {'loan_amount': loan_amount, 'status': 'paid' if loan_amount <= 0 else loan.status}
+
+        update_with_retry(loan, repaid, fields=['loan_amount', 'status'])
 
         # Add the total repayment to the bank’s balance
-        bank = Bank.objects.first()
+        bank = identity.first(Bank)
         if not bank:
             return Response({"detail": "Bank instance not found."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        bank.balance += total_repayment
-        bank.save()
+        adjust_bank_balance(bank, total_repayment)
+
+        Transaction.objects.create(
+            account=loan.account,
+            transaction_type='loan_repayment',
+            amount=repayment_amount,
+            fee=interest,
+            description=f'Loan {loan.id}'
+        )
 
         return Response({
             "message": "Loan repayment successful.",
@@ -267,10 +389,194 @@ class LoanViewSet(viewsets.GenericViewSet):
             "interest": interest,
             "total_deducted": total_repayment
         }, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='status',
+                description='Only loans with this status (active, paid or defaulted)',
+                required=False,
+                type=OpenApiTypes.STR
+            ),
+            OpenApiParameter(
+                name='due_from',
+                description='Only loans due on or after this day, formatted YYYY-MM-DD',
+                required=False,
+                type=OpenApiTypes.DATE
+            ),
+            OpenApiParameter(
+                name='due_to',
+                description='Only loans due on or before this day, formatted YYYY-MM-DD',
+                required=False,
+                type=OpenApiTypes.DATE
+            )
+        ],
+        responses={200: LoanPageSerializer},
+    )
     @action(methods=['GET'], detail=False, url_path='customer-loans')
     def get_customer_loans(self, request):
-        """Retrieve all loans for the authenticated customer"""
+        """
+        Retrieve the loans of the authenticated customer, newest first in cursor pages,
+        with a summary of all the loans matching the filters aggregated by the database.
+        """
         customer_loans = self.queryset.filter(account__user=request.user)
-        serializer = self.get_serializer(customer_loans, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        loan_status = request.query_params.get('status')
+        if loan_status:
+            if loan_status not in dict(Loan.LOAN_STATUS_CHOICES):
+                return Response({"status": [f"Unknown loan status: {loan_status}"]}, status=status.HTTP_400_BAD_REQUEST)
+            customer_loans = customer_loans.filter(status=loan_status)
+
+        for param, lookup in (('due_from', 'due_date__gte'), ('due_to', 'due_date__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    customer_loans = customer_loans.filter(**{lookup: datetime.strptime(value, '%Y-%m-%d').date()})
+                except ValueError:
+                    return Response({param: ["Date must be formatted YYYY-MM-DD."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = self.paginate_queryset(customer_loans.values(*LOAN_LIST_FIELDS))
+        response = self.get_paginated_response(loan_rows_data(page))
+        response.data['summary'] = loan_summary_data(customer_loans)
+        return response
+
+
+class ChangeFeedView(APIView):
+    """
+    Staff change feed of the balance outbox. Consumers read the events after their cursor
+    in id order and pass back `next_cursor`.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='after',
+                description='Cursor, the id of the last event already read',
+                required=False,
+                type=OpenApiTypes.INT
+            ),
+            OpenApiParameter(
+                name='limit',
+                description='Maximum number of events to return',
+                required=False,
+                type=OpenApiTypes.INT
+            )
+        ],
+        responses={200: OpenApiTypes.OBJECT, 400: OpenApiTypes.OBJECT}
+    )
+    def get(self, request):
+        """Retrieve the balance events after a cursor"""
+        try:
+            cursor = int(request.query_params.get('after', 0))
+            limit = int(request.query_params.get('limit', settings.OUTBOX_FEED_DEFAULT_LIMIT))
+        except ValueError:
+            return Response({"detail": "`after` and `limit` must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if cursor < 0 or limit < 1:
+            return Response({"detail": "`after` must not be negative and `limit` must be positive."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        events = outbox.events_after(cursor, min(limit, settings.OUTBOX_FEED_MAX_LIMIT))
+        return Response({
+            "events": event_rows_data(events),
+            "next_cursor": events[-1]['id'] if events else cursor,
+        }, status=status.HTTP_200_OK)
+
+
+class LoanBookAnalyticsView(APIView):
+    """
+    Staff loan book analytics: exposure by interest rate and due date, default rates and liquidity,
+    computed in memory from the extract rebuilt by `manage.py refresh_loan_analytics`.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT, 404: OpenApiTypes.OBJECT, 503: OpenApiTypes.OBJECT})
+    def get(self, request):
+        """Retrieve the analytics of the latest loan book extract"""
+        from core import analytics  # Imported on first use, the other endpoints never pay for NumPy
+
+        if analytics.numpy is None:
+            return Response({"detail": "The loan book analytics need NumPy."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(analytics.loan_book_analytics(), status=status.HTTP_200_OK)
+
+
+def balance_snapshot(user):
+    """Current balance and status of the user's accounts"""
+    return [
+        {
+            'account': account['id'],
+            'account_number': account['account_number'],
+            'balance': format(account['balance'], '.2f'),
+            'status': account['status'],
+        }
+        for account in BankAccount.objects.filter(user=user).order_by('id')
+        .values('id', 'account_number', 'balance', 'status')
+    ]
+
+
+def server_sent_event(event, data, event_id=None):
+    message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return f"id: {event_id}\n{message}" if event_id is not None else message
+
+
+@require_GET
+async def balance_stream(request):
+    """
+    Server-Sent Events stream of the balance events of the authenticated user's accounts.
+    Opens with a `snapshot` of the accounts, then pushes every outbox event as it is read.
+    A reconnecting client sending Last-Event-ID first receives the events it missed.
+    """
+    user = await sync_to_async(authenticate_token)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."},
+                            status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+
+    queue = await hub.subscribe(user.id)
+    try:
+        snapshot = await sync_to_async(balance_snapshot)(user)
+        missed = []
+        if last_event_id is not None:
+            missed = await sync_to_async(outbox.events_after)(
+                last_event_id, settings.STREAM_QUEUE_SIZE, user_id=user.id
+            )
+    except BaseException:
+        hub.unsubscribe(user.id, queue)
+        raise
+
+    async def events():
+        try:
+            yield f"retry: {settings.STREAM_RETRY_MS}\n\n"
+            yield server_sent_event('snapshot', snapshot)
+            delivered = 0
+            for event in event_rows_data(missed):
+                yield server_sent_event(event['event_type'], event, event['id'])
+                delivered = event['id']
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.STREAM_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:  # Fell behind, the client reconnects with Last-Event-ID
+                    return
+                if event['id'] <= delivered:
+                    continue
+                event = event_rows_data([event])[0]
+                yield server_sent_event(event['event_type'], event, event['id'])
+        finally:
+            hub.unsubscribe(user.id, queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep reverse proxies from buffering the stream
+    return response
 
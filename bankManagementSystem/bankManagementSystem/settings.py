@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -27,6 +28,10 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# Live schema generation and the Swagger/Redoc UIs. When off, the drf_spectacular
+# views are never imported and /api/schema/ serves the prebuilt OPENAPI_SCHEMA_FILE.
+API_DOCS_ENABLED = os.environ.get('API_DOCS_ENABLED', str(DEBUG)).lower() in ('1', 'true', 'yes')
+
 
 # Application definition
 
@@ -38,23 +43,30 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'core',
-    'drf_spectacular',
     'rest_framework',
     'rest_framework.authtoken',
 ]
 
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.append('drf_spectacular')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.IdentityMapMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'bankManagementSystem.urls'
 
+TEST_RUNNER = 'core.testing.QueryBudgetRunner'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -85,6 +97,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The account summaries, throttles and velocity counters live in the cache, so every worker process
+# must share it: set REDIS_URL when running more than one. The local memory fallback is per process.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -129,9 +161,151 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.DecimalJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
+if API_DOCS_ENABLED:
+    REST_FRAMEWORK['DEFAULT_SCHEMA_CLASS'] = 'drf_spectacular.openapi.AutoSchema'
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True
 }
 
+# Written at build/deploy time by `manage.py build_openapi_schema`
+OPENAPI_SCHEMA_FILE = BASE_DIR / 'openapi-schema.yml'
+OPENAPI_SCHEMA_MAX_AGE = 60 * 60
+
+# Account summaries served to the home screen
+ACCOUNT_SUMMARY_RECENT_TRANSACTIONS = 10
+ACCOUNT_SUMMARY_CACHE_TIMEOUT = 60 * 60
+
+# Throttles per '<viewset basename>.<action>': at most N requests in any sliding period
+ACTION_THROTTLE_RATES = {
+    'bankaccounts.deposit': '30/min',
+    'bankaccounts.withdraw': '30/min',
+    'bankaccounts.transfer': '30/min',
+    'loans.grant_loan': '5/min',
+    'loans.repay_loan': '10/min',
+}
+
+# Per endpoint query and time budgets, keyed '<viewset basename>.<action>' like ACTION_THROTTLE_RATES.
+# Checked by core.testing.QueryBudgetMixin in core/tests.py and reported by the test runner: a test over
+# its query budget fails, one over its time budget only warns. A full `manage.py test` run fails when a
+# budget here is not measured by any test.
+QUERY_BUDGETS = {
+    'bankaccounts.deposit': {'queries': 9, 'ms': 500},
+    'bankaccounts.withdraw': {'queries': 16, 'ms': 500},
+    'bankaccounts.transfer': {'queries': 24, 'ms': 500},
+    'bankaccounts.balance': {'queries': 1, 'ms': 250},
+    'bankaccounts.get_all_transactions': {'queries': 2, 'ms': 250},
+    'loans.grant_loan': {'queries': 16, 'ms': 500},
+    'loans.repay_loan': {'queries': 14, 'ms': 500},
+    'loans.get_customer_loans': {'queries': 2, 'ms': 250},
+}
+
+# Velocity rules screening account debits: at most `limit` debits (metric 'count') or NIS (metric 'amount')
+# within the sliding `window` seconds, counted in `buckets` time buckets
+VELOCITY_RULES = {
+    'debits_per_10_minutes': {
+        'transaction_types': ('withdrawal', 'transfer_out'),
+        'metric': 'count',
+        'limit': 10,
+        'window': 10 * 60,
+        'buckets': 10,
+    },
+    'debited_amount_per_hour': {
+        'transaction_types': ('withdrawal', 'transfer_out'),
+        'metric': 'amount',
+        'limit': 20000,
+        'window': 60 * 60,
+        'buckets': 12,
+    },
+}
+
+# Default daily debit limits in NIS, overridden per account by BankAccount.daily_withdrawal_limit / daily_transfer_limit
+DAILY_WITHDRAWAL_LIMIT = '10000.00'
+DAILY_TRANSFER_LIMIT = '20000.00'
+
+# Compare-and-swap writes of account balances and loans (core.concurrency) re-read the row
+# and try again this many times on a version conflict before answering 409 Conflict
+OPTIMISTIC_RETRY_ATTEMPTS = 5
+
+# Loans collected per database transaction by the autopay sweep (`manage.py sweep_autopay`)
+AUTOPAY_BATCH_SIZE = 500
+
+# Cursor pages of the transactions listing, requested with `?page_size=` (capped at the max) or `?cursor=`
+TRANSACTIONS_PAGE_SIZE = 50
+TRANSACTIONS_MAX_PAGE_SIZE = 500
+
+# Cursor pages of the customer loans listing, `?page_size=` is capped at the max
+LOANS_PAGE_SIZE = 50
+LOANS_MAX_PAGE_SIZE = 500
+
+# Per-request profiling, see core.middleware.ProfilingMiddleware
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))  # Share of all requests profiled
+PROFILING_HEADER = 'X-Profile'  # Staff requests carrying it are profiled
+PROFILING_DIR = BASE_DIR / 'reports' / 'profiles'
+PROFILING_MAX_PROFILES = 500
+
+# Balance the bank is created with, the starting point of the ledger reconciliation
+BANK_OPENING_BALANCE = '10000000.00'
+
+# `manage.py reconcile_ledger` reports balances further than this from the ledger
+RECONCILIATION_TOLERANCE = '0.01'  # Fees are rounded to cents separately from the balances they change
+RECONCILIATION_REPORT_DIR = BASE_DIR / 'reports' / 'reconciliation'
+
+# Seconds a process serves its compiled fee schedule before checking the FeeRule table for changes
+# made by other processes. Changes made by the process itself apply once they commit.
+FEE_SCHEDULE_RECHECK_INTERVAL = 5
+
+# Loan book analytics (core.analytics), computed from an extract rebuilt by `manage.py refresh_loan_analytics`.
+# Point ANALYTICS_DATABASE at a read replica to keep the extract off the primary.
+ANALYTICS_DATABASE = 'default'
+ANALYTICS_EXTRACT_PATH = BASE_DIR / 'reports' / 'analytics' / 'loan_book.npz'
+ANALYTICS_DUE_BUCKETS = (0, 30, 90, 180, 365)  # Days until due
+ANALYTICS_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Columnar ledger snapshots written by `manage.py export_transaction_snapshot`
+SNAPSHOT_DIR = BASE_DIR / 'reports' / 'snapshots' / 'transactions'
+SNAPSHOT_SETTLE_DELAY = 2  # Seconds, like OUTBOX_SETTLE_DELAY: rows are held back until lower ids have committed
+SNAPSHOT_GAP_TIMEOUT = 60  # Seconds, like OUTBOX_GAP_TIMEOUT: a missing lower id holds the export back
+SNAPSHOT_FLUSH_ROWS = 100000  # Rows buffered per column before writing
+
+# Transactions older than this many days are moved to the archive table by `manage.py archive_transactions`
+TRANSACTION_ARCHIVE_AFTER_DAYS = 365
+
+# Responses of at least this many bytes are compressed with brotli (when installed) or gzip
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Server allocated account numbers: prefix + zero padded body + Luhn check digit,
+# handed out from blocks reserved on the sequence row
+ACCOUNT_NUMBER_PREFIX = '8'
+ACCOUNT_NUMBER_BODY_WIDTH = 10
+ACCOUNT_NUMBER_BLOCK_SIZE = 1000
+BULK_ACCOUNT_CREATE_MAX = 10000
+
+# Background jobs run by `manage.py run_jobs`
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 30  # Seconds before the first retry, doubled on every further attempt
+JOB_VISIBILITY_TIMEOUT = 300  # Seconds before a job whose worker died is run again
+
+# Change feed of the balance outbox
+OUTBOX_SETTLE_DELAY = 2  # Seconds an event is held back so transactions committing out of id order are not skipped
+OUTBOX_GAP_TIMEOUT = 60  # Seconds a missing lower id holds the feed back, a transaction open longer is skipped
+OUTBOX_FEED_DEFAULT_LIMIT = 1000
+OUTBOX_FEED_MAX_LIMIT = 10000
+OUTBOX_RETENTION_DAYS = 30
+
+# Server-Sent Events balance stream, served by the ASGI application
+STREAM_POLL_INTERVAL = 0.5  # Seconds between outbox reads of the per-process hub
+STREAM_HEARTBEAT_INTERVAL = 15
+STREAM_QUEUE_SIZE = 100  # Events buffered per connection before it is dropped to catch up on reconnect
+STREAM_RETRY_MS = 3000
@@ -18,19 +18,33 @@ from django.contrib import admin
 from django.urls import path,include
 from django.conf import settings
 
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-    SpectacularRedocView,
-)
+from core import views as core_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
-    path('api/docs/swagger/', SpectacularSwaggerView.as_view(url_name="api-schema"), name='swagger-ui'),  # Explicit Swagger UI path
-    path('api/docs/redoc/', SpectacularRedocView.as_view(url_name="api-schema"), name='redoc'),
     path('api/user/', include('user.urls')),
     path('api/bankaccount/', include('bankAccount.urls')),
     path('api/bankoperations/', include('bankAccountOperations.urls')),
-
+    path('api/profiles/', core_views.ProfileListView.as_view(), name='profile-list'),
+    path('api/profiles/<str:profile_id>.<str:kind>', core_views.ProfileDownloadView.as_view(),
+         name='profile-download'),
 ]
+
+if settings.API_DOCS_ENABLED:
+    # The docs stack is only imported where it is served
+    from drf_spectacular.views import (
+        SpectacularAPIView,
+        SpectacularSwaggerView,
+        SpectacularRedocView,
+    )
+
+    urlpatterns += [
+        path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
+        path('api/docs/swagger/', SpectacularSwaggerView.as_view(url_name="api-schema"), name='swagger-ui'),  # Explicit Swagger UI path
+        path('api/docs/redoc/', SpectacularRedocView.as_view(url_name="api-schema"), name='redoc'),
+    ]
+else:
+    # Serve the schema prebuilt by `manage.py build_openapi_schema`
+    urlpatterns += [
+        path('api/schema/', core_views.openapi_schema, name='api-schema'),
+    ]
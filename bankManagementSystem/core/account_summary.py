@@ -0,0 +1,81 @@
+"""
+Cache of the per account summary (balance, status and recent transactions).
+
+Writes never update a cached summary in place, they replace the account's summary version on
+commit and the next read rebuilds it from the database. Concurrent writers and readers therefore
+cannot leave an older balance in the cache, as long as every process shares the cache backend.
+"""
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import serializers
+from core.models import Transaction
+
+RECENT_TRANSACTIONS = getattr(settings, 'ACCOUNT_SUMMARY_RECENT_TRANSACTIONS', 10)
+CACHE_TIMEOUT = getattr(settings, 'ACCOUNT_SUMMARY_CACHE_TIMEOUT', 60 * 60)
+
+_decimal_field = serializers.DecimalField(max_digits=12, decimal_places=2)
+_datetime_field = serializers.DateTimeField()
+
+
+def summary_key(account_id, version):
+    return f'account-summary:{account_id}:{version}'
+
+
+def transaction_entry(txn):
+    """Returns the cached representation of a transaction"""
+    return {
+        'id': txn.id,
+        'transaction_type': txn.transaction_type,
+        'amount': _decimal_field.to_representation(txn.amount),
+        'fee': _decimal_field.to_representation(txn.fee),
+        'currency': txn.currency,
+        'created_at': _datetime_field.to_representation(txn.created_at),
+    }
+
+
+def build_account_summary(account, recent=None):
+    """Builds the summary of an account, loading the recent transactions unless given"""
+    if recent is None:
+        recent = Transaction.objects.filter(account=account).order_by('-created_at', '-id')[:RECENT_TRANSACTIONS]
+    return {
+        'account_id': account.id,
+        'user_id': account.user_id,
+        'account_number': account.account_number,
+        'balance': _decimal_field.to_representation(account.balance),
+        'status': account.status,
+        'recent_transactions': [transaction_entry(txn) for txn in recent],
+    }
+
+
+def version_key(account_id):
+    return f'account-summary-version:{account_id}'
+
+
+def summary_version(account_id):
+    """
+    The version token of an account's summary. Every committed write replaces it, so a summary
+    built from rows read before the write is stored under a token nobody looks up any more.
+    """
+    key = version_key(account_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, CACHE_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def get_account_summary(account_id, version):
+    """Returns the cached summary of an account at `version` or None on a miss"""
+    return cache.get(summary_key(account_id, version))
+
+
+def store_account_summary(summary, version):
+    cache.set(summary_key(summary['account_id'], version), summary, CACHE_TIMEOUT)
+
+
+def invalidate_account_summaries(account_ids):
+    """Replaces the version of the cached summaries once the write commits"""
+    keys = [version_key(account_id) for account_id in account_ids]
+    transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in keys}, CACHE_TIMEOUT))
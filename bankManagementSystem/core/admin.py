@@ -1,5 +1,50 @@
 from django.contrib import admin
-from core.models import ForeignCurrency , Bank
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import F
+from django.utils.functional import cached_property
+from core import account_summary
+from core.models import ForeignCurrency , Bank, BankAccount, Transaction, Loan, FeeRule
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the database statistics instead of COUNT(*) for unfiltered large tables"""
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_row_count(self.object_list.model)
+            if estimate is not None and estimate > self.exact_count_threshold:
+                return estimate
+        return super().count
+
+
+def estimated_row_count(model):
+    """Returns the planner's row estimate for a table, None where the backend has none"""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Base admin for the tables that grow without limit"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Skips the second, unfiltered COUNT(*)
+    list_per_page = 50
+
 
 @admin.register(ForeignCurrency)
 class ForeignCurrencyAdmin(admin.ModelAdmin):
@@ -17,4 +62,78 @@ class BankAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         """Prevent deleting the bank instance through the admin"""
-        return False
\ No newline at end of file
+        return False
+
+
+@admin.register(FeeRule)
+class FeeRuleAdmin(admin.ModelAdmin):
+    list_display = ('operation', 'currency', 'min_amount', 'percentage', 'flat_fee', 'minimum_fee', 'maximum_fee')
+    list_filter = ('operation', 'currency')
+    ordering = ('operation', 'currency', 'min_amount')
+
+
+@admin.register(BankAccount)
+class BankAccountAdmin(LargeTableAdmin):
+    list_display = ('id', 'account_number', 'user', 'balance', 'status', 'created_at')
+    list_select_related = ('user',)
+    list_filter = ('status',)
+    search_fields = ('account_number__exact', 'user__email__exact')  # Exact matches stay on the unique indexes
+    raw_id_fields = ('user',)
+    readonly_fields = ('balance', 'version', 'closed_at')  # Written by the operations and the close action only
+    ordering = ('-id',)
+    actions = ('suspend_accounts', 'activate_accounts')
+
+    def save_model(self, request, obj, form, change):
+        """
+        Writes only the fields changed in the form and bumps the version, so a balance changed by a
+        compare-and-swap since the form was loaded is kept and operations in flight re-read the row
+        """
+        if not change:
+            return super().save_model(request, obj, form, change)
+        obj.version = F('version') + 1
+        obj.save(update_fields=[*form.changed_data, 'version'])
+        obj.refresh_from_db(fields=['version'])
+
+    @admin.action(description='Suspend selected accounts')
+    def suspend_accounts(self, request, queryset):
+        """Suspends the selected accounts in a single UPDATE"""
+        updated = queryset.exclude(status='closed').update(status='suspended')
+        account_summary.invalidate_account_summaries(queryset.values_list('id', flat=True))
+        self.message_user(request, f"{updated} account(s) suspended.")
+
+    @admin.action(description='Activate selected accounts')
+    def activate_accounts(self, request, queryset):
+        """Activates the selected suspended accounts in a single UPDATE"""
+        updated = queryset.filter(status='suspended').update(status='active')
+        account_summary.invalidate_account_summaries(queryset.values_list('id', flat=True))
+        self.message_user(request, f"{updated} account(s) activated.")
+
+
+@admin.register(Transaction)
+class TransactionAdmin(LargeTableAdmin):
+    list_display = ('id', 'account', 'transaction_type', 'amount', 'fee', 'currency', 'created_at')
+    list_select_related = ('account__user',)
+    list_filter = ('transaction_type',)
+    search_fields = ('account__account_number__exact',)
+    raw_id_fields = ('account', 'source_account', 'target_account')
+    ordering = ('-id',)
+
+    def has_add_permission(self, request):
+        """Transactions are only recorded by the bank operations"""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Loan)
+class LoanAdmin(LargeTableAdmin):
+    list_display = ('id', 'account', 'loan_amount', 'interest_rate', 'status', 'due_date', 'created_at')
+    list_select_related = ('account__user',)
+    list_filter = ('status',)
+    search_fields = ('account__account_number__exact',)
+    raw_id_fields = ('account',)
+    ordering = ('-id',)
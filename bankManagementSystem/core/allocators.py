@@ -0,0 +1,86 @@
+"""
+Server-side account number allocation
+"""
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from core.models import AccountNumberSequence
+
+
+def luhn_check_digit(number):
+    """Returns the Luhn check digit for a string of digits"""
+    total = 0
+    for i, digit in enumerate(reversed(number)):
+        value = int(digit)
+        if i % 2 == 0:  # Doubled positions, counted from the digit left of the check digit
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_account_number(account_number):
+    return account_number.isdigit() and luhn_check_digit(account_number[:-1]) == account_number[-1]
+
+
+class AccountNumberAllocator:
+    """
+    Hi-lo allocator. A single UPDATE reserves whole blocks of numbers on the sequence row,
+    which the process then hands out from memory. Numbers are formatted as
+    prefix + zero padded body + Luhn check digit.
+
+    Leftovers of a reservation only join the in-memory pool once the reserving
+    transaction commits, so a rolled back reservation is never handed out twice.
+    """
+
+    def __init__(self, name='account_number'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._pool = []  # (next, end) ranges of committed, unused numbers
+
+    @property
+    def block_size(self):
+        return settings.ACCOUNT_NUMBER_BLOCK_SIZE
+
+    def format(self, value):
+        body = f'{settings.ACCOUNT_NUMBER_PREFIX}{value:0{settings.ACCOUNT_NUMBER_BODY_WIDTH}d}'
+        return body + luhn_check_digit(body)
+
+    def allocate(self, count):
+        """Returns `count` new account numbers"""
+        values = []
+        with self._lock:
+            while self._pool and len(values) < count:
+                start, end = self._pool.pop()
+                take = min(end - start, count - len(values))
+                values.extend(range(start, start + take))
+                if start + take < end:
+                    self._pool.append((start + take, end))
+
+        missing = count - len(values)
+        if missing:
+            start, end = self._reserve(-(-missing // self.block_size))
+            values.extend(range(start, start + missing))
+            if start + missing < end:
+                leftover = (start + missing, end)
+                transaction.on_commit(lambda: self._release(leftover))
+        return [self.format(value) for value in values]
+
+    def _reserve(self, blocks):
+        """Reserves `blocks` consecutive blocks, returning the (start, end) range of numbers"""
+        AccountNumberSequence.objects.get_or_create(name=self.name)
+        with transaction.atomic():
+            sequences = AccountNumberSequence.objects.filter(name=self.name)
+            sequences.update(next_block=F('next_block') + blocks)
+            next_block = sequences.values_list('next_block', flat=True).get()
+        first_block = next_block - blocks
+        return first_block * self.block_size, next_block * self.block_size
+
+    def _release(self, number_range):
+        with self._lock:
+            self._pool.append(number_range)
+
+
+account_numbers = AccountNumberAllocator()
@@ -0,0 +1,142 @@
+"""
+Loan book analytics for risk staff, computed with NumPy over a columnar extract of Loan and BankAccount.
+`manage.py refresh_loan_analytics` rebuilds the extract, the analytics are cached until the next rebuild.
+"""
+import os
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.utils import timezone
+from core.models import Bank, BankAccount, Loan
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, only the analytics need it
+    numpy = None
+
+LOAN_STATUSES = [choice for choice, _ in Loan.LOAN_STATUS_CHOICES]
+EPOCH = date(1970, 1, 1)
+
+
+def cents(value):
+    return int(value * 100)
+
+
+def build_extract(path=None):
+    """
+    Writes the loan book extract: one array per column, money in cents, statuses as codes into
+    LOAN_STATUSES and dates as days since the epoch. Read from settings.ANALYTICS_DATABASE,
+    a replica when one is configured. Returns the path written.
+    """
+    path = path or settings.ANALYTICS_EXTRACT_PATH
+    database = settings.ANALYTICS_DATABASE
+    status_codes = {name: code for code, name in enumerate(LOAN_STATUSES)}
+
+    loans = Loan.objects.using(database).values_list('loan_amount', 'interest_rate', 'status', 'due_date')
+    loan_amount, interest_rate, loan_status, due_day = [], [], [], []
+    for amount, rate, status, due_date in loans.iterator(chunk_size=10000):
+        loan_amount.append(cents(amount))
+        interest_rate.append(rate)
+        loan_status.append(status_codes[status])
+        due_day.append((due_date - EPOCH).days)
+
+    balances = BankAccount.objects.using(database).values_list('balance', flat=True)
+    bank_balance = sum(Bank.objects.using(database).values_list('balance', flat=True))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f'{path.stem}.partial{path.suffix}')
+    with open(partial, 'wb') as out:
+        numpy.savez(
+            out,
+            loan_amount=numpy.array(loan_amount, dtype=numpy.int64),
+            interest_rate=numpy.array(interest_rate, dtype=numpy.float64),
+            loan_status=numpy.array(loan_status, dtype=numpy.int8),
+            due_day=numpy.array(due_day, dtype=numpy.int32),
+            account_balance=numpy.fromiter((cents(balance) for balance in balances.iterator(chunk_size=10000)),
+                                           dtype=numpy.int64),
+            bank_balance=numpy.int64(cents(bank_balance)),
+            refreshed_at=numpy.float64(timezone.now().timestamp()),
+        )
+    os.replace(partial, path)  # Readers never see a half written extract
+    return path
+
+
+def compute_analytics(extract, today=None):
+    """Exposure by interest rate, due date buckets, default rates and liquidity of a loaded extract"""
+    today = ((today or timezone.localdate()) - EPOCH).days
+    amount, rate, status, due_day = (
+        extract['loan_amount'], extract['interest_rate'], extract['loan_status'], extract['due_day']
+    )
+    active = status == LOAN_STATUSES.index('active')
+    defaulted = status == LOAN_STATUSES.index('defaulted')
+
+    rates, rate_index = numpy.unique(rate[active], return_inverse=True)
+    rate_exposure = numpy.bincount(rate_index, weights=amount[active], minlength=len(rates))
+    rate_count = numpy.bincount(rate_index, minlength=len(rates))
+
+    # Bucket i holds the active loans due in (edges[i-1], edges[i]] days, bucket 0 those due today or earlier
+    edges = numpy.array(settings.ANALYTICS_DUE_BUCKETS)
+    bucket = numpy.searchsorted(edges, due_day[active] - today, side='left')
+    bucket_exposure = numpy.bincount(bucket, weights=amount[active], minlength=len(edges) + 1)
+    bucket_count = numpy.bincount(bucket, minlength=len(edges) + 1)
+    labels = (['due or overdue'] + [f'{low + 1}-{high} days' for low, high in zip(edges[:-1], edges[1:])]
+              + [f'over {edges[-1]} days'])
+
+    outstanding = int(amount[active].sum())
+    deposits = int(extract['account_balance'][extract['account_balance'] > 0].sum())
+    bank_balance = int(extract['bank_balance'])
+    total_count = len(status)
+    total_amount = int(amount.sum())
+
+    return {
+        'refreshed_at': datetime.fromtimestamp(float(extract['refreshed_at']), tz=dt_timezone.utc).isoformat(),
+        'loan_count': total_count,
+        'outstanding_principal': money(outstanding),
+        'exposure_by_interest_rate': [
+            {'interest_rate': format(Decimal(str(value)), '.2f'), 'count': int(count), 'outstanding_principal': money(total)}
+            for value, count, total in zip(rates, rate_count, rate_exposure)
+        ],
+        'exposure_by_due_date': [
+            {'bucket': label, 'count': int(count), 'outstanding_principal': money(total)}
+            for label, count, total in zip(labels, bucket_count, bucket_exposure)
+        ],
+        'default_rate': {
+            'by_count': ratio(int(defaulted.sum()), total_count),
+            'by_amount': ratio(int(amount[defaulted].sum()), total_amount),
+        },
+        'liquidity': {
+            'bank_balance': money(bank_balance),
+            'customer_deposits': money(deposits),
+            'ratio': ratio(bank_balance, deposits),
+        },
+    }
+
+
+def money(value_cents):
+    return format(Decimal(int(value_cents)) / 100, '.2f')
+
+
+def ratio(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def loan_book_analytics():
+    """
+    The analytics of the current extract, computed once per extract and cached under its
+    modification time, so every process picks up a refresh on its next request
+    """
+    path = settings.ANALYTICS_EXTRACT_PATH
+    try:
+        version = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise Http404("The loan book extract has not been built, run `manage.py refresh_loan_analytics`.")
+
+    key = f'loan-book-analytics:{version}'
+    analytics = cache.get(key)
+    if analytics is None:
+        with numpy.load(path) as extract:
+            analytics = compute_analytics(extract)
+        cache.set(key, analytics, settings.ANALYTICS_CACHE_TIMEOUT)
+    return analytics
@@ -0,0 +1,63 @@
+"""
+Hot/cold archival of the Transaction table
+"""
+import heapq
+from itertools import islice
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.models import Transaction, ArchivedTransaction
+
+ARCHIVED_FIELDS = (
+    'id', 'account_id', 'transaction_type', 'amount', 'fee', 'currency',
+    'created_at', 'description', 'source_account_id', 'target_account_id',
+)
+
+
+def archive_horizon(days=None):
+    """Returns the cut-off before which transactions belong in the archive"""
+    if days is None:
+        days = settings.TRANSACTION_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_transactions(before, batch_size=1000, **filters):
+    """
+    Moves the transactions created before `before` into the archive table,
+    one bounded batch per database transaction. Returns the number of rows moved.
+    """
+    moved = 0
+    hot = Transaction.objects.filter(created_at__lt=before, **filters).order_by('id')
+    while True:
+        with transaction.atomic():
+            rows = list(hot.values(*ARCHIVED_FIELDS)[:batch_size])
+            if not rows:
+                return moved
+            ArchivedTransaction.objects.bulk_create(
+                [ArchivedTransaction(**row) for row in rows],
+                ignore_conflicts=True
+            )
+            Transaction.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
+
+
+def transaction_history(fields, limit=None, before=None, **filters):
+    """
+    Returns an iterator over the hot and archived transactions matching `filters` as
+    `.values(*fields)` rows, newest first, starting below the (created_at, id) position `before`.
+    `fields` must include 'id' and 'created_at', which order the merge. The two tables are merged
+    lazily, read for at most `limit` rows each when given and in chunks otherwise.
+    """
+    position = Q()
+    if before is not None:
+        created_at, pk = before
+        position = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+    hot = Transaction.objects.filter(position, **filters).order_by('-created_at', '-id').values(*fields)
+    cold = ArchivedTransaction.objects.filter(position, **filters).order_by('-created_at', '-id').values(*fields)
+    if limit is None:
+        return heapq.merge(hot.iterator(chunk_size=2000), cold.iterator(chunk_size=2000),
+                           key=lambda row: (row['created_at'], row['id']), reverse=True)
+    merged = heapq.merge(hot[:limit], cold[:limit], key=lambda row: (row['created_at'], row['id']), reverse=True)
+    return islice(merged, limit)
@@ -0,0 +1,17 @@
+"""
+Token authentication outside DRF views
+"""
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def authenticate_token(request):
+    """Returns the user of the `Authorization: Token <key>` header, None when it is missing or invalid"""
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword != 'Token' or not key:
+        return None
+    try:
+        user, _ = TokenAuthentication().authenticate_credentials(key.strip())
+    except AuthenticationFailed:
+        return None
+    return user
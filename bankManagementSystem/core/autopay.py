@@ -0,0 +1,111 @@
+"""
+Autopay sweep of the monthly loan installments, applied in set-based batches
+"""
+import calendar
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, Value, F, CharField, DateField, DecimalField
+from django.utils import timezone
+from core import account_summary, outbox
+from core.concurrency import adjust_bank_balance
+from core.models import Bank, BankAccount, Loan, Transaction, MonthlyAccountSummary
+
+CENTS = Decimal('0.01')
+DUE_FIELDS = ('id', 'account_id', 'loan_amount', 'interest_rate', 'installment_amount', 'next_payment_date')
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def add_month(day):
+    """The same day of the next month, the last day of that month when it is shorter"""
+    year, month = (day.year + 1, 1) if day.month == 12 else (day.year, day.month + 1)
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def due_loans(today):
+    """Autopay loans with an installment due on or before `today`"""
+    return Loan.objects.filter(autopay=True, status='active', next_payment_date__lte=today)
+
+
+def sweep_autopay(today=None, batch_size=None):
+    """
+    Collects the installments due on or before `today`, one database transaction per batch of loans.
+    Loans of inactive accounts or accounts short of funds stay due for the next sweep.
+    Returns the number of installments collected and skipped.
+    """
+    today = today or timezone.localdate()
+    batch_size = batch_size or settings.AUTOPAY_BATCH_SIZE
+    collected = skipped = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            loans = list(
+                due_loans(today).filter(id__gt=last_id).order_by('id').select_for_update().values(*DUE_FIELDS)[:batch_size]
+            )
+            if not loans:
+                return collected, skipped
+            last_id = loans[-1]['id']
+            batch_collected = collect_installments(loans)
+        collected += batch_collected
+        skipped += len(loans) - batch_collected
+
+
+def collect_installments(loans):
+    """
+    Debits one installment (principal plus interest) of each `DUE_FIELDS` loan row in a few statements:
+    one UPDATE of the accounts, one of the loans, bulk inserts of the transactions and their
+    outbox events and one UPDATE of the bank. Must run inside a transaction, returns the number collected.
+    """
+    accounts = {
+        row['id']: row for row in BankAccount.objects.select_for_update()
+        .filter(id__in={loan['account_id'] for loan in loans}).values('id', 'user_id', 'balance', 'status')
+    }
+    payments = []
+    debits = {}  # Account id -> total debited in this batch
+    for loan in loans:
+        account = accounts[loan['account_id']]
+        principal = min(loan['installment_amount'], loan['loan_amount'])
+        interest = (principal * loan['interest_rate'] / 100).quantize(CENTS)
+        if account['status'] != 'active' or account['balance'] < principal + interest:
+            continue
+        account['balance'] -= principal + interest
+        debits[account['id']] = debits.get(account['id'], 0) + principal + interest
+        payments.append((loan, principal, interest, account['balance']))
+    if not payments:
+        return 0
+
+    BankAccount.objects.filter(id__in=debits).update(
+        balance=F('balance') - Case(*[When(id=account_id, then=Value(debit)) for account_id, debit in debits.items()],
+                                    output_field=MONEY),
+        version=F('version') + 1,
+    )
+    Loan.objects.filter(id__in=[loan['id'] for loan, *_ in payments]).update(
+        loan_amount=F('loan_amount') - Case(*[When(id=loan['id'], then=Value(principal))
+                                              for loan, principal, *_ in payments], output_field=MONEY),
+        status=Case(*[When(id=loan['id'], then=Value('paid'))
+                      for loan, principal, *_ in payments if principal >= loan['loan_amount']],
+                    default=F('status'), output_field=CharField()),
+        next_payment_date=Case(*[When(id=loan['id'], then=Value(add_month(loan['next_payment_date'])))
+                                 for loan, *_ in payments], output_field=DateField()),
+        version=F('version') + 1,
+    )
+
+    # bulk_create sends no post_save, so the outbox, rollups and cache are written here
+    txns = Transaction.objects.bulk_create([
+        Transaction(
+            account=BankAccount(id=loan['account_id'], user_id=accounts[loan['account_id']]['user_id'],
+                                balance=balance),
+            transaction_type='loan_repayment',
+            amount=principal,
+            fee=interest,
+            description=f"Loan {loan['id']} autopay",
+        )
+        for loan, principal, interest, balance in payments
+    ])
+    outbox.record_transactions(txns)
+    MonthlyAccountSummary.objects.record_transactions(txns)
+    account_summary.invalidate_account_summaries(list(debits))
+
+    # The bank is credited once for the whole batch
+    adjust_bank_balance(Bank.objects.first(), sum(debits.values()))
+    return len(payments)
@@ -0,0 +1,79 @@
+"""
+Optimistic concurrency control: compare-and-swap updates on the `version` column
+"""
+from django.conf import settings
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from core import account_summary
+from core.models import Bank
+
+
+class ConcurrentUpdateError(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The record was changed by another request, please retry.'
+    default_code = 'concurrent_update'
+
+
+class AccountClosed(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The account was closed by another request.'
+    default_code = 'account_closed'
+
+
+class InsufficientFunds(Exception):
+    """The balance would drop below the allowed floor"""
+
+
+def compare_and_swap(instance, **changes):
+    """
+    Writes `changes` only if the row still has the version `instance` was read at,
+    bumping the version. Returns whether the write happened, updating `instance` if so.
+    """
+    updated = type(instance).objects.filter(pk=instance.pk, version=instance.version).update(
+        version=F('version') + 1, **changes
+    )
+    if updated:
+        for name, value in changes.items():
+            setattr(instance, name, value)
+        instance.version += 1
+    return bool(updated)
+
+
+def update_with_retry(instance, compute, fields):
+    """
+    Applies `compute(instance)`, a dict of new field values, as a compare-and-swap.
+    On a conflict re-reads `fields` and recomputes, up to settings.OPTIMISTIC_RETRY_ATTEMPTS times.
+    """
+    for _ in range(settings.OPTIMISTIC_RETRY_ATTEMPTS):
+        if compare_and_swap(instance, **compute(instance)):
+            return instance
+        instance.refresh_from_db(fields=[*fields, 'version'])
+    raise ConcurrentUpdateError()
+
+
+def adjust_balance(account, delta, floor=None):
+    """
+    Adds `delta` to the account balance, raising InsufficientFunds when the result would be
+    below `floor` and AccountClosed once the account is closed (closing bumps the version, so a
+    racing update re-reads the status). The cached summary is invalidated here, since the UPDATE
+    skips post_save.
+    """
+    def compute(account):
+        if account.status == 'closed':
+            raise AccountClosed()
+        balance = account.balance + delta
+        if floor is not None and balance < floor:
+            raise InsufficientFunds()
+        return {'balance': balance}
+
+    update_with_retry(account, compute, fields=['balance', 'status'])
+    account_summary.invalidate_account_summaries([account.id])
+    return account
+
+
+def adjust_bank_balance(bank, delta):
+    """Adds `delta` to the bank balance in a single atomic UPDATE, the Bank row sees every operation"""
+    Bank.objects.filter(pk=bank.pk).update(balance=F('balance') + delta)
+    bank.balance += delta
+    return bank
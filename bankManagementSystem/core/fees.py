@@ -0,0 +1,80 @@
+"""
+Tiered fee schedule: the FeeRule bands compiled into per (operation, currency) sorted lookups.
+
+The compiled schedule is kept per process with a fingerprint of the FeeRule table (row count and
+latest update), which is checked again every settings.FEE_SCHEDULE_RECHECK_INTERVAL seconds, so a
+change made by another process applies within that interval. A fee lookup is a bisect, the rules
+are only read again after the fingerprint moved on.
+"""
+import time
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from core.models import FeeRule
+
+CENTS = Decimal('0.01')
+
+_compiled = {'fingerprint': None, 'checked_at': None, 'schedule': None}
+
+
+class FeeSchedule:
+    """Amount bands per (operation, currency), each a sorted list of lower bounds and its rules"""
+
+    def __init__(self, rules):
+        self.bands = {}
+        for rule in sorted(rules, key=lambda rule: rule.min_amount):
+            bounds, band_rules = self.bands.setdefault((rule.operation, rule.currency), ([], []))
+            bounds.append(rule.min_amount)
+            band_rules.append(rule)
+
+    def rule_for(self, operation, currency, amount):
+        """The band covering `amount`, from the currency's own rules when it has any. None without one."""
+        bands = self.bands.get((operation, currency)) or self.bands.get((operation, ''))
+        if bands is None:
+            return None
+        bounds, rules = bands
+        index = bisect_right(bounds, amount) - 1
+        return rules[index] if index >= 0 else None
+
+
+def apply_rule(rule, amount):
+    """Percentage plus flat fee in cents, raised to the minimum and capped at the maximum"""
+    fee = (amount * (rule.percentage / 100) + rule.flat_fee).quantize(CENTS, rounding=ROUND_HALF_UP)
+    if rule.minimum_fee is not None:
+        fee = max(fee, rule.minimum_fee)
+    if rule.maximum_fee is not None:
+        fee = min(fee, rule.maximum_fee)
+    return fee
+
+
+def schedule_fingerprint():
+    """Row count and latest update of the rules, moved on by every FeeRule save and delete"""
+    totals = FeeRule.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+    return totals['count'], totals['updated_at']
+
+
+def get_schedule():
+    """The compiled schedule of this process, recompiled when the rules changed since the last check"""
+    now = time.monotonic()
+    if _compiled['schedule'] is not None and now - _compiled['checked_at'] < settings.FEE_SCHEDULE_RECHECK_INTERVAL:
+        return _compiled['schedule']
+    fingerprint = schedule_fingerprint()
+    if _compiled['schedule'] is None or _compiled['fingerprint'] != fingerprint:
+        _compiled.update(fingerprint=fingerprint, schedule=FeeSchedule(FeeRule.objects.all()))
+    _compiled['checked_at'] = now
+    return _compiled['schedule']
+
+
+def invalidate_schedule():
+    """Drops this process's compiled schedule once the FeeRule change commits, the others recheck"""
+    transaction.on_commit(lambda: _compiled.update(schedule=None))
+
+
+def compute_fee(operation, currency, amount, bank):
+    """The fee of an operation, the bank's flat percentage where no band of the schedule covers it"""
+    rule = get_schedule().rule_for(operation, currency, amount)
+    if rule is None:
+        return amount * (bank.transaction_fee_percentage / 100)
+    return apply_rule(rule, amount)
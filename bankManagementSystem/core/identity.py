@@ -0,0 +1,109 @@
+"""
+Request-scoped identity map: within one request every row is read at most once,
+and every lookup of it returns the same instance.
+Outside a request scope (commands, jobs) the helpers query the database directly.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.core.exceptions import ValidationError
+from django.db.models import Model
+
+_current = ContextVar('identity_map', default=None)
+
+
+class IdentityMap:
+    """Instances loaded during one request, keyed by model and lookup"""
+
+    def __init__(self):
+        self.instances = {}
+
+    @staticmethod
+    def pk_key(model, pk):
+        return model, (('pk', pk),)
+
+    def add(self, instance):
+        """Registers a loaded instance, keeping the one already mapped to its row"""
+        return self.instances.setdefault(self.pk_key(type(instance), instance.pk), instance)
+
+    def get(self, model, **lookup):
+        """Same as `model.objects.get(**lookup)`, served from the map when the row was loaded already"""
+        key = (model, tuple(sorted(lookup.items(), key=lambda item: item[0])))
+        instance = self.instances.get(key)
+        if instance is None:
+            instance = self.by_pk(model, lookup)
+        if instance is None:
+            instance = self.add(model.objects.get(**lookup))
+        self.instances[key] = instance
+        return instance
+
+    def by_pk(self, model, lookup):
+        """
+        The loaded instance a primary key lookup resolves to, checking any other plain field filters
+        in memory. None when it is not loaded or the filters need the database.
+        """
+        filters = dict(lookup)
+        pk = filters.pop('pk', filters.pop('id', None))
+        if pk is None or any('__' in name for name in filters):
+            return None
+        try:
+            pk = model._meta.pk.to_python(pk)
+        except ValidationError:
+            return None
+        instance = self.instances.get(self.pk_key(model, pk))
+        if instance is None:
+            return None
+
+        for name, value in filters.items():
+            field = model._meta.get_field(name)
+            if field.is_relation:
+                actual, expected = getattr(instance, field.attname), value.pk if isinstance(value, Model) else value
+            else:
+                actual, expected = getattr(instance, name), value
+            if actual != expected:
+                raise model.DoesNotExist(f"{model.__name__} matching query does not exist.")
+        return instance
+
+    def first(self, model):
+        """Same as `model.objects.first()`"""
+        key = (model, 'first')
+        instance = self.instances.get(key)
+        if instance is None:
+            instance = model.objects.first()
+            if instance is not None:
+                self.instances[key] = self.add(instance)
+        return instance
+
+
+def get(model, **lookup):
+    """`model.objects.get(**lookup)` through the identity map of the current request"""
+    identity_map = _current.get()
+    if identity_map is None:
+        return model.objects.get(**lookup)
+    return identity_map.get(model, **lookup)
+
+
+def exists(model, **lookup):
+    """Whether `get(model, **lookup)` finds a row, loading it into the identity map"""
+    try:
+        get(model, **lookup)
+    except model.DoesNotExist:
+        return False
+    return True
+
+
+def first(model):
+    """`model.objects.first()` through the identity map of the current request"""
+    identity_map = _current.get()
+    if identity_map is None:
+        return model.objects.first()
+    return identity_map.first(model)
+
+
+@contextmanager
+def request_scope():
+    """Gives the enclosed code its own identity map"""
+    token = _current.set(IdentityMap())
+    try:
+        yield
+    finally:
+        _current.reset(token)
@@ -0,0 +1,106 @@
+"""
+Background jobs stored in the project database
+"""
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from core.models import Job
+
+registry = {}
+
+
+def job(name=None):
+    """Registers the decorated function as a job, called with the job payload as keyword arguments"""
+    def register(func):
+        registry[name or func.__name__] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, priority=0, run_after=None, max_attempts=None):
+    """
+    Queues a job. Inside an atomic block the job is only visible to workers
+    once the enclosing transaction commits.
+    """
+    if name not in registry:
+        raise ValueError(f"Unknown job '{name}'.")
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=priority,
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff before the next attempt"""
+    return timedelta(seconds=settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def claim_jobs(limit, visibility_timeout=None):
+    """
+    Claims up to `limit` due jobs, highest priority first, and returns their ids.
+    A running job whose visibility timeout expired is claimed again, since its worker died.
+    Each claim is a conditional UPDATE, so concurrent workers never run the same job.
+    """
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=visibility_timeout or settings.JOB_VISIBILITY_TIMEOUT)
+
+    Job.objects.filter(status='running', locked_until__lt=now, attempts__gte=F('max_attempts')).update(
+        status='failed', locked_until=None, last_error='Visibility timeout expired.', updated_at=now
+    )
+    claimable = (
+        Q(status='queued', run_after__lte=now) |
+        Q(status='running', locked_until__lt=now, attempts__lt=F('max_attempts'))
+    )
+    candidates = Job.objects.filter(claimable).order_by('-priority', 'run_after', 'id').values_list('id', flat=True)
+
+    claimed = []
+    for job_id in candidates[:limit * 2]:
+        if Job.objects.filter(claimable, id=job_id).update(
+                status='running', locked_until=locked_until, attempts=F('attempts') + 1, updated_at=now):
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def run_job(job_id):
+    """Runs a claimed job and records the outcome, returning the final status"""
+    job = Job.objects.filter(id=job_id, status='running').first()
+    if job is None:
+        return None
+    try:
+        registry[job.name](**job.payload)
+    except Exception:
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            changes = {'status': 'failed'}
+        else:
+            changes = {'status': 'queued', 'run_after': now + retry_delay(job.attempts)}
+        Job.objects.filter(id=job_id, status='running').update(
+            locked_until=None, last_error=traceback.format_exc(), updated_at=now, **changes
+        )
+        return changes['status']
+
+    Job.objects.filter(id=job_id, status='running').update(
+        status='done', locked_until=None, last_error='', updated_at=timezone.now()
+    )
+    return 'done'
+
+
+def run_pending(limit=100):
+    """Claims and runs due jobs in the current thread, returning how many ran"""
+    ran = 0
+    while ran < limit:
+        job_ids = claim_jobs(min(10, limit - ran))
+        if not job_ids:
+            break
+        for job_id in job_ids:
+            run_job(job_id)
+        ran += len(job_ids)
+    return ran
+
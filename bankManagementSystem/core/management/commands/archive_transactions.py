@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from core.archive import archive_horizon, archive_transactions
+
+
+class Command(BaseCommand):
+    help = "Moves transactions older than the archive horizon into the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=None,
+            help="Archive horizon in days, defaults to settings.TRANSACTION_ARCHIVE_AFTER_DAYS",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows moved per database transaction")
+
+    def handle(self, *args, **options):
+        before = archive_horizon(options['older_than_days'])
+        moved = archive_transactions(before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} transaction(s) created before {before:%Y-%m-%d}."))
@@ -0,0 +1,58 @@
+import timeit
+from datetime import date
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from bankAccountOperations.serializers import TransactionSerializer, LoanSerializer, transaction_rows_data, \
+    loan_rows_data
+from core.models import Transaction, Loan
+
+
+class Command(BaseCommand):
+    help = "Compares the per row cost of the serializer and the `.values()` fast path for the listings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        now = timezone.now()
+
+        transaction_rows = [
+            {
+                'id': i, 'account_id': 1, 'transaction_type': 'transfer_out', 'amount': Decimal('125.50'),
+                'fee': Decimal('1.25'), 'currency': 'NIS', 'created_at': now,
+                'source_account_id': None, 'target_account_id': 2,
+            }
+            for i in range(rows)
+        ]
+        transactions = [Transaction(**row) for row in transaction_rows]
+        self.report(
+            'transactions', rows, repeat,
+            lambda: TransactionSerializer(transactions, many=True).data,
+            lambda: transaction_rows_data(transaction_rows),
+        )
+
+        loan_rows = [
+            {
+                'id': i, 'account_id': 1, 'loan_amount': Decimal('5000.00'), 'interest_rate': Decimal('5.00'),
+                'status': 'active', 'created_at': now, 'due_date': date(2030, 1, 1), 'autopay': True,
+                'installment_amount': Decimal('250.00'), 'next_payment_date': date(2026, 1, 1),
+            }
+            for i in range(rows)
+        ]
+        loans = [Loan(**row) for row in loan_rows]
+        self.report(
+            'customer-loans', rows, repeat,
+            lambda: LoanSerializer(loans, many=True).data,
+            lambda: loan_rows_data(loan_rows),
+        )
+
+    def report(self, name, rows, repeat, serializer_path, fast_path):
+        serializer_us = min(timeit.repeat(serializer_path, number=1, repeat=repeat)) / rows * 1e6
+        fast_us = min(timeit.repeat(fast_path, number=1, repeat=repeat)) / rows * 1e6
+        self.stdout.write(
+            f"{name}: serializer {serializer_us:.1f} us/row, fast path {fast_us:.1f} us/row "
+            f"({serializer_us / fast_us:.1f}x)"
+        )
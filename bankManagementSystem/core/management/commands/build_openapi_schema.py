@@ -0,0 +1,25 @@
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Generates the OpenAPI schema once, for /api/schema/ to serve without drf_spectacular loaded"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None, help="Output path, defaults to settings.OPENAPI_SCHEMA_FILE")
+
+    def handle(self, *args, **options):
+        if not settings.API_DOCS_ENABLED:
+            raise CommandError("The schema is generated by drf_spectacular, run with API_DOCS_ENABLED=1.")
+
+        # Imported here so workers serving the API never load the schema machinery
+        from drf_spectacular.generators import SchemaGenerator
+        from drf_spectacular.renderers import OpenApiYamlRenderer
+
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        output = OpenApiYamlRenderer().render(schema, renderer_context={})
+
+        path = Path(options['file'] or settings.OPENAPI_SCHEMA_FILE)
+        path.write_bytes(output)
+        self.stdout.write(self.style.SUCCESS(f"Wrote the API schema to {path}."))
@@ -0,0 +1,24 @@
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from core.snapshots import export_snapshot
+
+
+class Command(BaseCommand):
+    help = ("Appends the transactions created since the last export to the columnar ledger snapshot, "
+            "as binary column files listed in its manifest.json")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help="Snapshot directory, defaults to settings.SNAPSHOT_DIR")
+
+    def handle(self, *args, **options):
+        try:
+            segment = export_snapshot(options['output'] and Path(options['output']))
+        except ValueError as error:
+            raise CommandError(error)
+        if segment is None:
+            self.stdout.write("No new transactions to export.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {segment['row_count']} transaction(s), ids {segment['min_id']}-{segment['max_id']}, "
+            f"as {segment['name']}."
+        ))
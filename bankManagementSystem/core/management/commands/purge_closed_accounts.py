@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core.purge import purge_pending
+
+
+class Command(BaseCommand):
+    help = "Deletes closed accounts and deleted users, with their dependent rows in bounded chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per database transaction")
+
+    def handle(self, *args, **options):
+        accounts, users = purge_pending(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Purged {accounts} account(s) and {users} user(s)."))
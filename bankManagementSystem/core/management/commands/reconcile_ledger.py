@@ -0,0 +1,56 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from core.workers import init_worker_process
+from core.reconciliation import account_id_ranges, reconcile_range, reconcile_bank
+
+
+class Command(BaseCommand):
+    help = ("Checks every account balance against its hot and archived transactions and the bank balance "
+            "against fees and loan flows, writing the discrepancies to a JSON report")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Worker processes, 0 reconciles in this process")
+        parser.add_argument('--range-size', type=int, default=10000, help="Account ids per unit of work")
+        parser.add_argument('--output', default=None,
+                            help="Report path, defaults to a timestamped file in settings.RECONCILIATION_REPORT_DIR")
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        ranges = account_id_ranges(options['range_size'])
+
+        if options['workers']:
+            # Children must not share the parent's database sockets
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker_process) as executor:
+                results = list(executor.map(reconcile_range, *zip(*ranges))) if ranges else []
+        else:
+            results = [reconcile_range(low, high) for low, high in ranges]
+
+        totals = {key: sum((result[key] for result in results), Decimal('0.00'))
+                  for key in ('fees', 'disbursed', 'repaid')}
+        discrepancies = [discrepancy for result in results for discrepancy in result['discrepancies']]
+        report = {
+            'started_at': started_at.isoformat(),
+            'finished_at': timezone.now().isoformat(),
+            'accounts_checked': sum(result['accounts'] for result in results),
+            'account_discrepancies': discrepancies,
+            'bank': reconcile_bank(totals),
+        }
+
+        output = Path(options['output'] or settings.RECONCILIATION_REPORT_DIR / f'{started_at:%Y%m%dT%H%M%S}.json')
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+
+        style = self.style.SUCCESS if not discrepancies and report['bank']['balanced'] else self.style.WARNING
+        self.stdout.write(style(
+            f"Checked {report['accounts_checked']} account(s): {len(discrepancies)} discrepanc(ies), "
+            f"bank difference {report['bank']['difference']}. Report written to {output}."
+        ))
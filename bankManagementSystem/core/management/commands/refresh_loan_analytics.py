@@ -0,0 +1,17 @@
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from core import analytics
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the columnar loan book extract behind the staff analytics endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help="Extract path, defaults to settings.ANALYTICS_EXTRACT_PATH")
+
+    def handle(self, *args, **options):
+        if analytics.numpy is None:
+            raise CommandError("The loan book analytics need NumPy, install it with `pip install numpy`.")
+        path = analytics.build_extract(options['output'] and Path(options['output']))
+        self.stdout.write(self.style.SUCCESS(f"Wrote the loan book extract to {path}."))
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, close_old_connections
+from core.jobs import claim_jobs, run_job
+from core.workers import init_worker_process
+
+
+def run_in_worker(job_id):
+    """Runs one job in a pool worker with a healthy database connection"""
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Runs queued background jobs on a thread or process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread', help="Kind of worker pool")
+        parser.add_argument('--concurrency', type=int, default=4, help="Jobs run at the same time")
+        parser.add_argument(
+            '--visibility-timeout', type=int, default=None,
+            help="Seconds before an unfinished job is handed to another worker, "
+                 "defaults to settings.JOB_VISIBILITY_TIMEOUT",
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between polls of an idle queue")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is drained")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if options['pool'] == 'process':
+            # Children must not share the parent's database sockets
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=concurrency, initializer=init_worker_process)
+        else:
+            executor = ThreadPoolExecutor(max_workers=concurrency)
+
+        finished = {'done': 0, 'queued': 0, 'failed': 0}
+        in_flight = set()
+        with executor:
+            try:
+                while True:
+                    free = concurrency - len(in_flight)
+                    claimed = claim_jobs(free, options['visibility_timeout'] or settings.JOB_VISIBILITY_TIMEOUT) \
+                        if free else []
+                    in_flight.update(executor.submit(run_in_worker, job_id) for job_id in claimed)
+
+                    if not in_flight:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    completed, in_flight = wait(in_flight, timeout=options['poll_interval'],
+                                                return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        result = future.result()
+                        if result in finished:
+                            finished[result] += 1
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping, waiting for running jobs to finish.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Jobs done: {finished['done']}, retrying: {finished['queued']}, failed: {finished['failed']}."
+        ))
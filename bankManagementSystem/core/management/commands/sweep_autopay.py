@@ -0,0 +1,19 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from core.autopay import sweep_autopay
+
+
+class Command(BaseCommand):
+    help = "Debits the autopay loan installments due today, in set-based batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, default=None,
+                            help="Collect the installments due on or before this day (YYYY-MM-DD), defaults to today")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Loans per database transaction, defaults to settings.AUTOPAY_BATCH_SIZE")
+
+    def handle(self, *args, **options):
+        collected, skipped = sweep_autopay(options['date'], batch_size=options['batch_size'])
+        style = self.style.SUCCESS if not skipped else self.style.WARNING
+        self.stdout.write(style(f"Collected {collected} installment(s), skipped {skipped} for inactive accounts "
+                                f"or insufficient funds."))
@@ -0,0 +1,149 @@
+"""
+Project middleware
+"""
+import cProfile
+import random
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_string
+from core import identity, profiling
+from core.authentication import authenticate_token
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, responses fall back to gzip without it
+    brotli = None
+
+re_accepts_gzip = _lazy_re_compile(r"\bgzip\b")
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses responses of at least settings.COMPRESSION_MIN_SIZE bytes,
+    with brotli when the client and server support it and gzip otherwise.
+    Streaming responses are left alone so event streams are not buffered.
+    """
+    max_random_bytes = 100  # Same BREACH mitigation as Django's GZipMiddleware
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        ae = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_brotli.search(ae):
+            encoding = 'br'
+            compressed_content = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        elif re_accepts_gzip.search(ae):
+            encoding = 'gzip'
+            compressed_content = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        else:
+            return response
+
+        # Return the compressed content only if it's actually shorter
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests sent by staff with the settings.PROFILING_HEADER header, and a
+    settings.PROFILING_SAMPLE_RATE share of all requests, recording the call stacks and SQL timings.
+    Removed from the middleware chain unless settings.PROFILING_ENABLED, so it costs nothing when off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = settings.PROFILING_HEADER
+
+    def should_profile(self, request):
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return True
+        return bool(request.headers.get(self.header)) and self.sent_by_staff(request)
+
+    def sent_by_staff(self, request):
+        """Whether the session or token user of the request is staff, checked once per request"""
+        if not hasattr(request, 'profile_staff'):
+            user = getattr(request, 'user', None)
+            if user is None or not user.is_authenticated:
+                user = authenticate_token(request)
+            request.profile_staff = user is not None and user.is_staff
+        return request.profile_staff
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another request of this process is being profiled (Python 3.12+)
+            return self.get_response(request)
+        profiler.disable()
+
+        request.profile_tag = request.path
+        queries = []
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profiling.QueryTimer(connection.alias, queries)))
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - started
+
+        profile_id = profiling.save_profile(profiler, queries, request.profile_tag, request, response, duration)
+        if self.sent_by_staff(request):  # Sampled customers are not told their request was profiled
+            response['X-Profile-Id'] = profile_id
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'profile_tag'):
+            request.profile_tag = profiling.view_tag(request, view_func)
+
+
+class IdentityMapMiddleware:
+    """Gives every request its own identity map, see core.identity. Runs in the sync and async stacks alike."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with identity.request_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # The map lives in a ContextVar, which sync_to_async carries over to the sync views
+        with identity.request_scope():
+            return await self.get_response(request)
+
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:35
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_monthly_summaries(apps, schema_editor):
+    """Builds the rollups for the transactions recorded before the table existed"""
+    Transaction = apps.get_model('core', 'Transaction')
+    MonthlyAccountSummary = apps.get_model('core', 'MonthlyAccountSummary')
+    rows = (
+        Transaction.objects
+        .annotate(month=TruncMonth('created_at', output_field=models.DateField()))
+        .values('account_id', 'month', 'transaction_type')
+        .annotate(total_amount=Sum('amount'), total_fee=Sum('fee'), count=Count('id'))
+        .order_by()
+    )
+    MonthlyAccountSummary.objects.bulk_create(
+        (MonthlyAccountSummary(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_remove_bank_loan_fee_percentage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyAccountSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('transfer_in', 'Transfer In'), ('transfer_out', 'Transfer Out')], max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=15)),
+                ('total_fee', models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=15)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='core.bankaccount')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'month', 'transaction_type'), name='unique_monthly_summary')],
+            },
+        ),
+        migrations.RunPython(backfill_monthly_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:14
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankaccount',
+            name='daily_transfer_limit',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='bankaccount',
+            name='daily_withdrawal_limit',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.CreateModel(
+            name='DailyDebitTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('withdrawn', models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=15)),
+                ('transferred_out', models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=15)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_debit_totals', to='core.bankaccount')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'day'), name='unique_daily_debit_total')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_account_loan_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='autopay',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='installment_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='next_payment_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['autopay', 'status', 'next_payment_date'], name='loan_autopay_due_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_loan_autopay'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeeRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('transfer', 'Transfer')], max_length=20)),
+                ('currency', models.CharField(blank=True, max_length=10)),
+                ('min_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('flat_fee', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('minimum_fee', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('maximum_fee', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('operation', 'currency', 'min_amount'), name='unique_fee_band')],
+            },
+        ),
+    ]
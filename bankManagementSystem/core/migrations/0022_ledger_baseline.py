@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:48
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, When, F, Q, Sum
+
+CREDIT_TYPES = ('deposit', 'transfer_in', 'loan_disbursement')
+MONEY = models.DecimalField(max_digits=15, decimal_places=2)
+
+
+def record_ledger_baselines(apps, schema_editor):
+    """
+    Takes the difference between every balance and its transactions as the reconciliation baseline.
+    Loans granted and repaid before 0018 moved balances without transaction rows, and their history
+    is not known, so the balances at this point are taken as given.
+    """
+    BankAccount = apps.get_model('core', 'BankAccount')
+    Bank = apps.get_model('core', 'Bank')
+    LedgerBaseline = apps.get_model('core', 'LedgerBaseline')
+
+    expected = {}
+    totals = {'fees': Decimal('0.00'), 'disbursed': Decimal('0.00'), 'repaid': Decimal('0.00')}
+    for name in ('Transaction', 'ArchivedTransaction'):
+        rows = apps.get_model('core', name).objects.values('account_id').annotate(
+            delta=Sum(Case(When(transaction_type__in=CREDIT_TYPES, then=F('amount')),
+                           default=-(F('amount') + F('fee')), output_field=MONEY)),
+            fees=Sum('fee'),
+            disbursed=Sum('amount', filter=Q(transaction_type='loan_disbursement')),
+            repaid=Sum('amount', filter=Q(transaction_type='loan_repayment')),
+        ).order_by()
+        for row in rows.iterator():
+            expected[row['account_id']] = expected.get(row['account_id'], Decimal('0.00')) + row['delta']
+            for key in totals:
+                totals[key] += row[key] or Decimal('0.00')
+
+    baselines = [
+        LedgerBaseline(account_id=account_id, amount=balance - expected.get(account_id, Decimal('0.00')))
+        for account_id, balance in BankAccount.objects.values_list('id', 'balance').iterator()
+        if balance != expected.get(account_id, Decimal('0.00'))
+    ]
+    bank = Bank.objects.order_by('id').first()
+    if bank is not None:
+        bank_expected = Decimal(settings.BANK_OPENING_BALANCE) + totals['fees'] - totals['disbursed'] + totals['repaid']
+        if bank.balance != bank_expected:
+            baselines.append(LedgerBaseline(account_id=None, amount=bank.balance - bank_expected))
+    LedgerBaseline.objects.bulk_create(baselines, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_fee_rule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_baseline', to='core.bankaccount')),
+            ],
+        ),
+        migrations.RunPython(record_ledger_baselines, migrations.RunPython.noop),
+    ]
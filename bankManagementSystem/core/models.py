@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from bankManagementSystem import settings
 from decimal import Decimal
@@ -32,6 +34,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    deletion_requested_at = models.DateTimeField(blank=True, null=True)  # Set when the user is deleted, purged later
 
     objects = UserManager()
 
@@ -56,17 +59,35 @@ class BankAccount(models.Model):
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     status = models.CharField(max_length=10, choices=ACCOUNT_STATUS_CHOICES, default='active')
     created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(blank=True, null=True)  # Set when closed, the account is purged later
+    # Daily debit limits in NIS, settings.DAILY_WITHDRAWAL_LIMIT / DAILY_TRANSFER_LIMIT when empty
+    daily_withdrawal_limit = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    daily_transfer_limit = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    version = models.PositiveIntegerField(default=0)  # Bumped by every compare-and-swap write, see core.concurrency
 
     def __str__(self):
         return f"Account {self.account_number} - {self.user.email}"
 
+class AccountNumberSequence(models.Model):
+    """High part of the hi-lo account number allocator, one row per sequence"""
+    name = models.CharField(max_length=50, unique=True)
+    next_block = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} - next block {self.next_block}"
+
+
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
         ('deposit', 'Deposit'),
         ('withdrawal', 'Withdrawal'),
         ('transfer_in', 'Transfer In'),
         ('transfer_out', 'Transfer Out'),
+        ('loan_disbursement', 'Loan Disbursement'),
+        ('loan_repayment', 'Loan Repayment'),  # `fee` holds the interest paid
     ]
+    CREDIT_TYPES = ('deposit', 'transfer_in', 'loan_disbursement')  # Add `amount` to the balance
+    DEBIT_TYPES = ('withdrawal', 'transfer_out', 'loan_repayment')  # Take `amount` plus `fee` from it
 
     account = models.ForeignKey(
         BankAccount,
@@ -98,6 +119,116 @@ class Transaction(models.Model):
         return f"{self.transaction_type} - {self.amount} on {self.created_at} for {self.account}"
 
 
+class ArchivedTransaction(models.Model):
+    """
+    Cold copy of a Transaction older than the archive horizon.
+    Keeps the original id and the account references without FK constraints,
+    so archived history never cascades or blocks deleting an account.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    account = models.ForeignKey(
+        BankAccount,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    fee = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.0'))
+    currency = models.CharField(max_length=10, default='NIS')
+    created_at = models.DateTimeField()
+    description = models.TextField(blank=True, null=True)
+    source_account = models.ForeignKey(
+        BankAccount,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    target_account = models.ForeignKey(
+        BankAccount,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived {self.transaction_type} - {self.amount} on {self.created_at} for account {self.account_id}"
+
+
+class MonthlyAccountSummaryManager(models.Manager):
+    """Manager for the monthly account summary rollups"""
+    def record_transaction(self, txn):
+        """Adds a transaction to its (account, month, transaction_type) rollup row"""
+        self.add_totals(txn.account_id, txn.created_at.date().replace(day=1), txn.transaction_type,
+                        txn.amount, txn.fee)
+
+    def record_transactions(self, txns):
+        """Adds many transactions to their rollup rows, one write per row rather than per transaction"""
+        totals = {}
+        for txn in txns:
+            key = (txn.account_id, txn.created_at.date().replace(day=1), txn.transaction_type)
+            amount, fee, count = totals.get(key, (0, 0, 0))
+            totals[key] = (amount + txn.amount, fee + txn.fee, count + 1)
+        for (account_id, month, transaction_type), (amount, fee, count) in totals.items():
+            self.add_totals(account_id, month, transaction_type, amount, fee, count)
+
+    def add_totals(self, account_id, month, transaction_type, amount, fee, count=1):
+        """Adds the totals to a rollup row, creating it when missing"""
+        rollup = self.filter(account_id=account_id, month=month, transaction_type=transaction_type)
+        updated = rollup.update(
+            total_amount=F('total_amount') + amount,
+            total_fee=F('total_fee') + fee,
+            count=F('count') + count,
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                self.create(
+                    account_id=account_id,
+                    month=month,
+                    transaction_type=transaction_type,
+                    total_amount=amount,
+                    total_fee=fee,
+                    count=count,
+                )
+        except IntegrityError:
+            # Another writer created the row first, fold into it instead
+            rollup.update(
+                total_amount=F('total_amount') + amount,
+                total_fee=F('total_fee') + fee,
+                count=F('count') + count,
+            )
+
+
+class MonthlyAccountSummary(models.Model):
+    """Per account, month and transaction type totals, maintained on every transaction insert"""
+    account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name='monthly_summaries')
+    month = models.DateField()  # First day of the month
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.0'))
+    total_fee = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.0'))
+    count = models.PositiveIntegerField(default=0)
+
+    objects = MonthlyAccountSummaryManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'month', 'transaction_type'],
+                name='unique_monthly_summary',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} summary for account {self.account_id} in {self.month:%Y-%m}"
+
+
 class Loan(models.Model):
     LOAN_STATUS_CHOICES = [
         ('active', 'Active'),
@@ -111,6 +242,16 @@ class Loan(models.Model):
     status = models.CharField(max_length=10, choices=LOAN_STATUS_CHOICES, default='active')
     created_at = models.DateTimeField(auto_now_add=True)
     due_date = models.DateField()  # You may want to calculate this based on the loan period
+    # Monthly installments debited by the autopay sweep, see core.autopay
+    autopay = models.BooleanField(default=False)
+    installment_amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)  # Principal per installment
+    next_payment_date = models.DateField(blank=True, null=True)
+    version = models.PositiveIntegerField(default=0)  # Bumped by every compare-and-swap write, see core.concurrency
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['autopay', 'status', 'next_payment_date'], name='loan_autopay_due_idx'),
+        ]
 
     def __str__(self):
         return f"Loan of {self.loan_amount} for account {self.account.account_number}"
@@ -131,3 +272,133 @@ class Bank(models.Model):
     def __str__(self):
         return f"Bank Balance: {self.balance} NIS"
 
+
+class LedgerBaseline(models.Model):
+    """
+    Balance the ledger reconciliation takes as given at the cutover to a complete ledger (migration 0022):
+    loans granted and repaid before they were recorded as transactions left no rows to sum. Holds the
+    difference between the balance and the transactions at that point, per account and, without
+    an account, for the bank.
+    """
+    account = models.OneToOneField(BankAccount, on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='ledger_baseline')
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Ledger baseline of {f'account {self.account_id}' if self.account_id else 'the bank'}: {self.amount}"
+
+
+class FeeRule(models.Model):
+    """
+    One amount band of the fee schedule, from `min_amount` up to the next band of the same
+    operation and currency. Compiled into sorted lookups by core.fees, operations no band
+    covers pay Bank.transaction_fee_percentage.
+    """
+    OPERATION_CHOICES = [
+        ('deposit', 'Deposit'),
+        ('withdrawal', 'Withdrawal'),
+        ('transfer', 'Transfer'),
+    ]
+
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES)
+    currency = models.CharField(max_length=10, blank=True)  # Empty for any currency without rules of its own
+    min_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # NIS, transfers in their currency
+    percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    flat_fee = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    minimum_fee = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    maximum_fee = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)  # Cap
+    updated_at = models.DateTimeField(auto_now=True)  # Part of the schedule fingerprint core.fees rechecks
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['operation', 'currency', 'min_amount'], name='unique_fee_band'),
+        ]
+
+    def __str__(self):
+        return f"{self.operation} {self.currency or 'any currency'} from {self.min_amount}: {self.percentage}%"
+
+
+class Job(models.Model):
+    """Background job stored in the project database, run by `manage.py run_jobs`"""
+    JOB_STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=JOB_STATUS_CHOICES, default='queued')
+    priority = models.SmallIntegerField(default=0)  # Higher runs first
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(blank=True, null=True)  # Visibility timeout of a running job
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_after'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status}, attempt {self.attempts}/{self.max_attempts})"
+
+
+class OutboxEvent(models.Model):
+    """Balance change event, written in the same database transaction as the change it describes"""
+    event_type = models.CharField(max_length=30)
+    # Plain ids, the feed outlives the purge of accounts and users
+    account_id = models.BigIntegerField(db_index=True)
+    user_id = models.BigIntegerField()
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.event_type} on account {self.account_id}"
+
+
+class DailyDebitTotalManager(models.Manager):
+    """Manager for the per day debit totals"""
+    def debit(self, account, field, amount, limit):
+        """
+        Adds `amount` to today's `field` total of `account` unless that would exceed `limit`.
+        A single conditional UPDATE once the day's row exists, returns whether the debit fits.
+        """
+        day = timezone.localdate()
+        total = self.filter(account=account, day=day)
+        if total.filter(**{f'{field}__lte': limit - amount}).update(**{field: F(field) + amount}):
+            return True
+        if amount > limit:
+            return False
+        try:
+            with transaction.atomic():
+                self.create(account=account, day=day, **{field: amount})
+            return True
+        except IntegrityError:
+            # The row exists, so the conditional update failed on the limit, unless
+            # another writer created it in between
+            return bool(total.filter(**{f'{field}__lte': limit - amount}).update(**{field: F(field) + amount}))
+
+
+class DailyDebitTotal(models.Model):
+    """Per account and day withdrawal and outgoing transfer totals, updated with every debit"""
+    account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name='daily_debit_totals')
+    day = models.DateField()
+    withdrawn = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.0'))
+    transferred_out = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.0'))
+
+    objects = DailyDebitTotalManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'day'], name='unique_daily_debit_total'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} {self.day}: withdrawn {self.withdrawn}, transferred {self.transferred_out}"
+
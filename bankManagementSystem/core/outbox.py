@@ -0,0 +1,83 @@
+"""
+Transactional outbox of balance change events, read by downstream consumers through the change feed
+"""
+from decimal import Decimal
+from django.conf import settings
+from core.models import OutboxEvent
+from core.settling import first_unsettled_id
+
+EVENT_FIELDS = ('id', 'event_type', 'account_id', 'user_id', 'payload', 'created_at')
+
+
+def build_event(event_type, account, **payload):
+    """
+    Returns an unsaved event for `account`, to be saved inside the transaction that changed the balance.
+    Decimal payload values are stored as two-place strings, like the API renders money.
+    """
+    return OutboxEvent(
+        event_type=event_type,
+        account_id=account.id,
+        user_id=account.user_id,
+        payload={key: format(value, '.2f') if isinstance(value, Decimal) else value for key, value in payload.items()},
+    )
+
+
+def record_event(event_type, account, **payload):
+    """Writes an event for `account`, must be called inside the transaction that changed the balance"""
+    event = build_event(event_type, account, **payload)
+    event.save()
+    return event
+
+
+def transaction_event(txn):
+    """Returns the unsaved event of a new transaction, with the account balance after it"""
+    return build_event(
+        txn.transaction_type,
+        txn.account,
+        transaction_id=txn.id,
+        amount=txn.amount,
+        fee=txn.fee,
+        currency=txn.currency,
+        balance=txn.account.balance,
+        counterparty_account_id=txn.target_account_id or txn.source_account_id,
+    )
+
+
+def record_transaction(txn):
+    """Writes the event of a new transaction"""
+    event = transaction_event(txn)
+    event.save()
+    return event
+
+
+def record_transactions(txns):
+    """Writes the events of transactions created with `bulk_create`, which sends no post_save"""
+    return OutboxEvent.objects.bulk_create([transaction_event(txn) for txn in txns])
+
+
+def events_after(cursor, limit, **filters):
+    """
+    Returns up to `limit` events matching `filters` with an id above `cursor`, in id order.
+    Ids are allocated before commit, so the page ends before the first event a slower
+    transaction may still commit a lower id behind (see core.settling).
+    """
+    events = list(OutboxEvent.objects.filter(id__gt=cursor, **filters).order_by('id').values(*EVENT_FIELDS)[:limit])
+    if events:
+        frontier = unsettled_event_id(cursor, events[-1]['id'])
+        if frontier is not None:
+            events = [event for event in events if event['id'] < frontier]
+    return events
+
+
+def unsettled_event_id(after, upto=None):
+    """The lowest event id in (after, upto] a consumer must not pass yet, None when there is none"""
+    return first_unsettled_id([OutboxEvent.objects.all()], after, upto, settle_delay=settings.OUTBOX_SETTLE_DELAY,
+                              gap_timeout=settings.OUTBOX_GAP_TIMEOUT)
+
+
+def latest_settled_event_id():
+    """Returns the id up to which every event has settled, 0 when there is none"""
+    frontier = unsettled_event_id(0)
+    if frontier is not None:
+        return frontier - 1
+    return OutboxEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
@@ -0,0 +1,75 @@
+"""
+Cursor pagination of the listings
+"""
+from base64 import b64decode, b64encode
+from datetime import datetime
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from core.archive import transaction_history
+
+
+class LoanCursorPagination(CursorPagination):
+    """
+    Newest loans first. The cursor encodes the last id seen, so every page is one
+    index range scan however long the loan history is.
+    """
+    ordering = '-id'
+    page_size = settings.LOANS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.LOANS_MAX_PAGE_SIZE
+
+
+class TransactionHistoryPagination(BasePagination):
+    """
+    Newest transactions first, over the hot and archived tables together. The cursor encodes the
+    (created_at, id) of the last row seen, so a page reads at most one page of rows from each table.
+    Opt-in: only requests passing `cursor` or `page_size` are paged.
+    """
+    page_size = settings.TRANSACTIONS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TRANSACTIONS_MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_requested(self, request):
+        """Whether the request asked for pages"""
+        return self.cursor_query_param in request.query_params or self.page_size_query_param in request.query_params
+
+    def paginate_history(self, request, fields, **filters):
+        """The page of `transaction_history` rows the request's cursor points at"""
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        rows = list(transaction_history(fields, page_size + 1, before=self.decode_cursor(request), **filters))
+        self.page = rows[:page_size]
+        self.has_next = len(rows) > page_size
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            created_at, pk = b64decode(encoded.encode('ascii')).decode('ascii').rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row):
+        position = f"{row['created_at'].isoformat()}|{row['id']}"
+        return replace_query_param(self.base_url, self.cursor_query_param, b64encode(position.encode('ascii')).decode('ascii'))
+
+    def get_next_link(self):
+        return self.encode_cursor(self.page[-1]) if self.has_next else None
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
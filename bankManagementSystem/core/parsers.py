@@ -0,0 +1,28 @@
+"""
+Decimal-safe JSON parsing
+"""
+import json
+from decimal import Decimal
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json as strict_json
+from core.renderers import FastJSONRenderer
+
+
+class DecimalJSONParser(JSONParser):
+    """
+    Parses JSON numbers with a fraction as Decimal so request amounts stay exact,
+    decoding the whole body at once instead of through a stream reader.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            parse_constant = strict_json.strict_constant if self.strict else None
+            return json.loads(stream.read().decode(encoding), parse_float=Decimal, parse_constant=parse_constant)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
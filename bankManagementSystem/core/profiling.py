@@ -0,0 +1,93 @@
+"""
+Storage of the request profiles recorded by core.middleware.ProfilingMiddleware
+"""
+import json
+import re
+import time
+import uuid
+from django.conf import settings
+from django.utils import timezone
+
+PROFILE_ID = re.compile(r'^[\w.-]+$')
+UNSAFE_CHARACTERS = re.compile(r'[^\w.-]')
+PROFILE_KINDS = {'prof': 'application/octet-stream', 'json': 'application/json'}
+
+
+class QueryTimer:
+    """`connection.execute_wrapper` recording the duration of every query"""
+
+    def __init__(self, alias, queries):
+        self.alias = alias
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': self.alias,
+                'sql': sql,
+                'many': many,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+def view_tag(request, view_func):
+    """'<ViewSet>.<action>' for DRF viewsets, the view name otherwise"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'view')
+    action = (getattr(view_func, 'actions', None) or {}).get(request.method.lower())
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+def save_profile(profiler, queries, tag, request, response, duration):
+    """Writes the call-stack profile and its metadata, returns the profile id"""
+    directory = settings.PROFILING_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = f'{timezone.now():%Y%m%dT%H%M%S%f}-{UNSAFE_CHARACTERS.sub("_", tag)}-{uuid.uuid4().hex[:8]}'
+
+    profiler.dump_stats(directory / f'{profile_id}.prof')
+    (directory / f'{profile_id}.json').write_text(json.dumps({
+        'id': profile_id,
+        'tag': tag,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'sql_count': len(queries),
+        'sql_ms': round(sum(query['duration_ms'] for query in queries), 3),
+        'queries': queries,
+    }))
+    prune_profiles()
+    return profile_id
+
+
+def prune_profiles():
+    """Keeps the newest settings.PROFILING_MAX_PROFILES profiles"""
+    stale = sorted(settings.PROFILING_DIR.glob('*.json'), reverse=True)[settings.PROFILING_MAX_PROFILES:]
+    for path in stale:
+        path.with_suffix('.prof').unlink(missing_ok=True)
+        path.unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first, without the query log"""
+    profiles = []
+    for path in sorted(settings.PROFILING_DIR.glob('*.json'), reverse=True):
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):  # Pruned or still being written
+            continue
+        meta.pop('queries', None)
+        profiles.append(meta)
+    return profiles
+
+
+def profile_path(profile_id, kind):
+    """Path of a stored profile file, None for an unknown or malformed id"""
+    if kind not in PROFILE_KINDS or not PROFILE_ID.match(profile_id) or '..' in profile_id:
+        return None
+    path = settings.PROFILING_DIR / f'{profile_id}.{kind}'
+    return path if path.is_file() else None
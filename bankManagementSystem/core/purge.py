@@ -0,0 +1,51 @@
+"""
+Chunked deletion of closed accounts and deleted users
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from core.archive import archive_transactions
+from core.models import BankAccount, Loan, MonthlyAccountSummary, DailyDebitTotal
+
+
+def delete_in_chunks(queryset, batch_size=1000):
+    """Deletes the rows of `queryset` in bounded batches, one database transaction each"""
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            queryset.model.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+def purge_account(account_id, batch_size=1000):
+    """
+    Moves the transactions of a closed account to the archive and deletes its loans
+    and rollups chunk by chunk, so the final account delete has nothing left to cascade over.
+    """
+    archive_transactions(timezone.now(), batch_size=batch_size, account_id=account_id)
+    delete_in_chunks(Loan.objects.filter(account_id=account_id), batch_size)
+    delete_in_chunks(MonthlyAccountSummary.objects.filter(account_id=account_id), batch_size)
+    delete_in_chunks(DailyDebitTotal.objects.filter(account_id=account_id), batch_size)
+    BankAccount.objects.filter(id=account_id, status='closed').delete()
+
+
+def purge_user(user_id, batch_size=1000):
+    """Purges the accounts of a deleted user, then the user"""
+    for account_id in BankAccount.objects.filter(user_id=user_id).values_list('id', flat=True):
+        purge_account(account_id, batch_size)
+    get_user_model().objects.filter(id=user_id, deletion_requested_at__isnull=False).delete()
+
+
+def purge_pending(batch_size=1000):
+    """Purges every closed account and deleted user, returning the (accounts, users) counts"""
+    account_ids = list(BankAccount.objects.filter(status='closed', closed_at__isnull=False).values_list('id', flat=True))
+    for account_id in account_ids:
+        purge_account(account_id, batch_size)
+
+    user_ids = list(get_user_model().objects.filter(deletion_requested_at__isnull=False).values_list('id', flat=True))
+    for user_id in user_ids:
+        purge_user(user_id, batch_size)
+    return len(account_ids), len(user_ids)
@@ -0,0 +1,87 @@
+"""
+Ledger reconciliation: account and bank balances against the transaction history
+"""
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import Case, When, F, Q, Sum, Min, Max, DecimalField, Value
+from django.db.models.functions import Coalesce
+from core.models import BankAccount, Bank, Transaction, ArchivedTransaction, LedgerBaseline
+
+MONEY = DecimalField(max_digits=15, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=MONEY)
+
+# Per account sums of one table, aggregated by the database
+LEDGER_SUMS = {
+    'delta': Coalesce(Sum(Case(
+        When(transaction_type__in=Transaction.CREDIT_TYPES, then=F('amount')),
+        default=-(F('amount') + F('fee')),
+        output_field=MONEY,
+    )), ZERO),
+    'fees': Coalesce(Sum('fee'), ZERO),
+    'disbursed': Coalesce(Sum('amount', filter=Q(transaction_type='loan_disbursement')), ZERO),
+    'repaid': Coalesce(Sum('amount', filter=Q(transaction_type='loan_repayment')), ZERO),
+}
+
+
+def account_id_ranges(range_size):
+    """Splits the account ids of the accounts and both transaction tables into [low, high) ranges"""
+    bounds = [
+        BankAccount.objects.aggregate(low=Min('id'), high=Max('id')),
+        Transaction.objects.aggregate(low=Min('account_id'), high=Max('account_id')),
+        ArchivedTransaction.objects.aggregate(low=Min('account_id'), high=Max('account_id')),
+    ]
+    lows = [bound['low'] for bound in bounds if bound['low'] is not None]
+    if not lows:
+        return []
+    low, high = min(lows), max(bound['high'] for bound in bounds if bound['high'] is not None)
+    return [(start, min(start + range_size, high + 1)) for start in range(low, high + 1, range_size)]
+
+
+def reconcile_range(low, high):
+    """
+    Reconciles the accounts with ids in [low, high). Returns the accounts whose balance differs from
+    their LedgerBaseline plus the sum of their hot and archived transactions, and the range's share
+    of the bank's flows.
+    """
+    expected = {}
+    totals = {'fees': Decimal('0.00'), 'disbursed': Decimal('0.00'), 'repaid': Decimal('0.00')}
+    for model in (Transaction, ArchivedTransaction):
+        rows = (model.objects.filter(account_id__gte=low, account_id__lt=high)
+                .values('account_id').annotate(**LEDGER_SUMS).order_by())
+        for row in rows.iterator():
+            expected[row['account_id']] = expected.get(row['account_id'], Decimal('0.00')) + row['delta']
+            for key in totals:
+                totals[key] += row[key]
+    baselines = LedgerBaseline.objects.filter(account_id__gte=low, account_id__lt=high).values_list('account_id', 'amount')
+    for account_id, amount in baselines:
+        expected[account_id] = expected.get(account_id, Decimal('0.00')) + amount
+
+    tolerance = Decimal(settings.RECONCILIATION_TOLERANCE)
+    checked, discrepancies = 0, []
+    accounts = BankAccount.objects.filter(id__gte=low, id__lt=high).order_by('id').values_list('id', 'balance')
+    for account_id, balance in accounts.iterator(chunk_size=2000):
+        checked += 1
+        expected_balance = expected.get(account_id, Decimal('0.00'))
+        if abs(balance - expected_balance) > tolerance:
+            discrepancies.append({
+                'account': account_id,
+                'balance': format(balance, '.2f'),
+                'expected': format(expected_balance, '.2f'),
+                'difference': format(balance - expected_balance, '.2f'),
+            })
+    return {'accounts': checked, 'discrepancies': discrepancies, **totals}
+
+
+def reconcile_bank(totals):
+    """Compares the bank balance with its opening balance and baseline plus fees and interest, less net loan flows"""
+    bank = Bank.objects.first()
+    baseline = LedgerBaseline.objects.filter(account__isnull=True).aggregate(total=Sum('amount', default=Decimal('0.00')))
+    expected = (Decimal(settings.BANK_OPENING_BALANCE) + baseline['total'] + totals['fees']
+                - totals['disbursed'] + totals['repaid'])
+    balance = bank.balance if bank else Decimal('0.00')
+    return {
+        'balance': format(balance, '.2f'),
+        'expected': format(expected, '.2f'),
+        'difference': format(balance - expected, '.2f'),
+        'balanced': abs(balance - expected) <= Decimal(settings.RECONCILIATION_TOLERANCE),
+    }
@@ -0,0 +1,44 @@
+"""
+Decimal-safe JSON rendering, using orjson when it is installed
+"""
+import decimal
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is used without it
+    orjson = None
+
+
+class DecimalSafeJSONEncoder(JSONEncoder):
+    """DRF's encoder, except Decimals are written as exact strings instead of floats"""
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer that keeps Decimal amounts exact.
+    Compact responses go through orjson when available, indented ones
+    (e.g. `Accept: application/json; indent=4`) through the stdlib encoder.
+    """
+    encoder_class = DecimalSafeJSONEncoder
+    orjson_options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Datetimes are passed through to DRF's encoder so they format exactly as before
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=self.orjson_options)
+        # orjson never escapes non-ASCII, keep the \u2028 / \u2029 escaping DRF applies
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
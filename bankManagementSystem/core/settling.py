@@ -0,0 +1,39 @@
+"""
+Settled frontier of tables read incrementally in id order (the change feed, the ledger snapshots).
+
+Ids are allocated at insert, not at commit, so a reader that has passed id N can never see a
+lower id committed later. A reader therefore stops before the first id that may still be joined
+by a lower one: a row younger than the settle delay, or a row whose predecessor id is missing
+while it is younger than the gap timeout, since that id may belong to a transaction still open.
+Older gaps are ids of rolled back or deleted rows and are passed.
+"""
+from datetime import timedelta
+from django.utils import timezone
+
+
+def first_unsettled_id(querysets, after, upto=None, settle_delay=0, gap_timeout=0):
+    """
+    The lowest id in (after, upto] of the rows of `querysets` (sharing one id sequence)
+    a reader must not pass yet, None when every row there has settled.
+    """
+    now = timezone.now()
+    recent = {}
+    for queryset in querysets:
+        rows = queryset.filter(id__gt=after, created_at__gt=now - timedelta(seconds=gap_timeout))
+        if upto is not None:
+            rows = rows.filter(id__lte=upto)
+        recent.update(rows.values_list('id', 'created_at'))
+    if not recent:
+        return None
+
+    present = set(recent)
+    missing = {row_id - 1 for row_id in recent if row_id - 1 > after} - present
+    for queryset in querysets:
+        if missing:
+            present.update(queryset.filter(id__in=missing).values_list('id', flat=True))
+
+    settled_before = now - timedelta(seconds=settle_delay)
+    for row_id in sorted(recent):
+        if recent[row_id] > settled_before or (row_id - 1 > after and row_id - 1 not in present):
+            return row_id
+    return None
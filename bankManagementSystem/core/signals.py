@@ -1,9 +1,50 @@
 
-from django.db.models.signals import post_migrate
+from django.conf import settings
+from django.db.models.signals import post_migrate, post_save, post_delete
 from django.dispatch import receiver
-from core.models import Bank
+from core import account_summary, fees, outbox
+from core.models import Bank, BankAccount, Transaction, MonthlyAccountSummary, FeeRule
 
 @receiver(post_migrate)
 def create_bank(sender, **kwargs):
     if not Bank.objects.exists():
-        Bank.objects.create(balance=10000000.00)
+        Bank.objects.create(balance=settings.BANK_OPENING_BALANCE)
+
+
+@receiver(post_save, sender=Transaction)
+def update_monthly_summary(sender, instance, created, **kwargs):
+    """Keeps the monthly rollups in step with the transaction inserts"""
+    if created:
+        MonthlyAccountSummary.objects.record_transaction(instance)
+
+
+@receiver(post_save, sender=Transaction)
+def write_outbox_event(sender, instance, created, **kwargs):
+    """Writes the outbox event of a new transaction in the same database transaction"""
+    if created:
+        outbox.record_transaction(instance)
+
+
+@receiver(post_save, sender=BankAccount)
+def invalidate_account_summary(sender, instance, **kwargs):
+    """Balance and status changes make the cached account summary stale"""
+    account_summary.invalidate_account_summaries([instance.id])
+
+
+@receiver(post_save, sender=Transaction)
+def invalidate_recent_transactions(sender, instance, created, **kwargs):
+    """New transactions make the recent transactions of the cached account summary stale"""
+    if created:
+        account_summary.invalidate_account_summaries([instance.account_id])
+
+
+@receiver(post_delete, sender=BankAccount)
+def drop_account_summary(sender, instance, **kwargs):
+    account_summary.invalidate_account_summaries([instance.id])
+
+
+@receiver(post_save, sender=FeeRule)
+@receiver(post_delete, sender=FeeRule)
+def invalidate_fee_schedule(sender, **kwargs):
+    """Makes this process recompile the fee schedule after a rule changes, the others see it on their recheck"""
+    fees.invalidate_schedule()
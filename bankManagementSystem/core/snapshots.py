@@ -0,0 +1,141 @@
+"""
+Incremental columnar snapshots of the transaction ledger, hot and archived rows alike.
+
+Every export appends a segment holding the settled rows above the previous id watermark
+(see core.settling), one little-endian binary file per column. manifest.json lists the segments and the column
+types (as NumPy dtype strings), so analysis tools can memory-map the files directly.
+"""
+import heapq
+import json
+import os
+import shutil
+import sys
+from array import array
+from datetime import timedelta, datetime, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from core.models import Transaction, ArchivedTransaction
+from core.settling import first_unsettled_id
+
+MANIFEST_VERSION = 1
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+TYPE_CODES = {name: code for code, (name, _) in enumerate(Transaction.TRANSACTION_TYPES)}
+ROW_FIELDS = ('id', 'account_id', 'transaction_type', 'amount', 'fee', 'created_at')
+
+# Column name -> (array typecode, NumPy dtype of the file)
+COLUMNS = {
+    'id': ('q', '<i8'),
+    'account_id': ('q', '<i8'),
+    'type_code': ('b', '<i1'),
+    'amount_minor': ('q', '<i8'),  # Cents
+    'fee_minor': ('q', '<i8'),
+    'created_at_us': ('q', '<i8'),  # Microseconds since the Unix epoch, UTC
+}
+
+
+def read_manifest(directory):
+    """The manifest of a snapshot directory, an empty one before the first export"""
+    try:
+        return json.loads((directory / 'manifest.json').read_text())
+    except FileNotFoundError:
+        return {
+            'version': MANIFEST_VERSION,
+            'columns': {name: dtype for name, (_, dtype) in COLUMNS.items()},
+            'type_codes': TYPE_CODES,
+            'watermark': 0,
+            'row_count': 0,
+            'segments': [],
+        }
+
+
+def write_manifest(directory, manifest):
+    partial = directory / 'manifest.json.partial'
+    partial.write_text(json.dumps(manifest, indent=2))
+    os.replace(partial, directory / 'manifest.json')  # Readers never see a half written manifest
+
+
+def new_rows(watermark, before=None):
+    """Hot and archived rows above `watermark`, and below `before` when given, in id order"""
+    filters = {'id__gt': watermark} if before is None else {'id__gt': watermark, 'id__lt': before}
+    hot = Transaction.objects.filter(**filters).order_by('id').values_list(*ROW_FIELDS)
+    cold = ArchivedTransaction.objects.filter(**filters).order_by('id').values_list(*ROW_FIELDS)
+    return heapq.merge(hot.iterator(chunk_size=10000), cold.iterator(chunk_size=10000), key=lambda row: row[0])
+
+
+def empty_columns():
+    return {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+
+
+def flush(columns, files):
+    """Appends the buffered values to the column files, as little-endian"""
+    for name, values in columns.items():
+        if sys.byteorder != 'little':
+            values.byteswap()
+        values.tofile(files[name])
+        del values[:]
+
+
+def export_snapshot(directory=None, flush_rows=None):
+    """
+    Appends the transactions created since the last export as a new segment. The segment stops
+    before the first row that has not settled, since ids are allocated before commit and a lower
+    id may still appear. Raises ValueError when the snapshot was written with other type codes.
+    Returns the new segment's manifest entry, None when there are no new rows.
+    """
+    directory = directory or settings.SNAPSHOT_DIR
+    flush_rows = flush_rows or settings.SNAPSHOT_FLUSH_ROWS
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(directory)
+    if manifest['type_codes'] != TYPE_CODES:
+        raise ValueError(f"The snapshot in {directory} was written with other transaction type codes, "
+                         "start a new snapshot directory.")
+
+    name = f"part-{len(manifest['segments']) + 1:06d}"
+    partial = directory / f'{name}.partial'
+    shutil.rmtree(partial, ignore_errors=True)  # Left over by an interrupted export
+    partial.mkdir()
+
+    frontier = first_unsettled_id([Transaction.objects.all(), ArchivedTransaction.objects.all()],
+                                  manifest['watermark'], settle_delay=settings.SNAPSHOT_SETTLE_DELAY,
+                                  gap_timeout=settings.SNAPSHOT_GAP_TIMEOUT)
+    rows = new_rows(manifest['watermark'], frontier)
+    columns = empty_columns()
+    count, first_id, last_id = 0, None, None
+    files = {column: open(partial / f'{column}.bin', 'wb') for column in COLUMNS}
+    try:
+        for txn_id, account_id, transaction_type, amount, fee, created_at in rows:
+            columns['id'].append(txn_id)
+            columns['account_id'].append(account_id)
+            columns['type_code'].append(TYPE_CODES[transaction_type])
+            columns['amount_minor'].append(int(amount * 100))
+            columns['fee_minor'].append(int(fee * 100))
+            columns['created_at_us'].append((created_at - EPOCH) // timedelta(microseconds=1))
+            count += 1
+            first_id = first_id or txn_id
+            last_id = txn_id
+            if len(columns['id']) >= flush_rows:
+                flush(columns, files)
+        flush(columns, files)
+    finally:
+        for file in files.values():
+            file.close()
+
+    if not count:
+        shutil.rmtree(partial)
+        return None
+
+    shutil.rmtree(directory / name, ignore_errors=True)  # Renamed before an interrupted manifest write
+    os.replace(partial, directory / name)
+    segment = {
+        'name': name,
+        'row_count': count,
+        'min_id': first_id,
+        'max_id': last_id,
+        'files': {column: f'{name}/{column}.bin' for column in COLUMNS},
+        'exported_at': timezone.now().isoformat(),
+    }
+    manifest['segments'].append(segment)
+    manifest['watermark'] = last_id
+    manifest['row_count'] += count
+    write_manifest(directory, manifest)
+    return segment
@@ -0,0 +1,79 @@
+"""
+In-process fan-out of outbox events to the streaming connections of this process
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from core import outbox
+
+logger = logging.getLogger(__name__)
+
+
+class EventHub:
+    """
+    One poller per process reads the outbox and hands each event to the queues of its user.
+    An idle subscriber is only an entry in a dict and an empty queue.
+    """
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.cursor = None
+        self.poller = None
+
+    async def subscribe(self, user_id):
+        """Returns a queue receiving the events of `user_id` from now on"""
+        if self.cursor is None:
+            self.cursor = await sync_to_async(outbox.latest_settled_event_id)()
+
+        queue = asyncio.Queue(maxsize=settings.STREAM_QUEUE_SIZE)
+        self.subscribers[user_id].add(queue)
+
+        loop = asyncio.get_running_loop()
+        if self.poller is None or self.poller.done() or self.poller.get_loop() is not loop:
+            self.poller = loop.create_task(self.poll())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    def publish(self, events):
+        """
+        Hands the events to their subscribers. A subscriber that fell a full queue behind
+        gets `None`, ending its stream, and catches up through Last-Event-ID on reconnect.
+        """
+        for event in events:
+            for queue in self.subscribers.get(event['user_id'], ()):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+
+    async def poll(self):
+        """Reads new outbox events while anyone is subscribed"""
+        try:
+            while self.subscribers:
+                try:
+                    events = await sync_to_async(outbox.events_after)(self.cursor, settings.OUTBOX_FEED_MAX_LIMIT)
+                except Exception:
+                    logger.exception("Reading the outbox failed")
+                    events = []
+
+                if events:
+                    self.cursor = events[-1]['id']
+                    self.publish(events)
+                if len(events) < settings.OUTBOX_FEED_MAX_LIMIT:
+                    await asyncio.sleep(settings.STREAM_POLL_INTERVAL)
+        finally:
+            # Restart from the head of the outbox once someone subscribes again
+            self.cursor = None
+
+
+hub = EventHub()
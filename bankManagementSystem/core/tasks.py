@@ -0,0 +1,54 @@
+"""
+Jobs run by the `run_jobs` worker
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+from core import purge
+from core.autopay import sweep_autopay as sweep_installments
+from core.archive import archive_horizon, archive_transactions
+from core.jobs import job
+from core.models import OutboxEvent
+
+
+@job()
+def purge_account(account_id):
+    purge.purge_account(account_id)
+
+
+@job()
+def purge_user(user_id):
+    purge.purge_user(user_id)
+
+
+@job(name='archive_transactions')
+def archive_old_transactions(older_than_days=None):
+    archive_transactions(archive_horizon(older_than_days))
+
+
+@job()
+def prune_outbox(older_than_days=None):
+    days = settings.OUTBOX_RETENTION_DAYS if older_than_days is None else older_than_days
+    purge.delete_in_chunks(OutboxEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)))
+
+
+@job()
+def reconcile_ledger(workers=None):
+    call_command('reconcile_ledger', **({} if workers is None else {'workers': workers}))
+
+
+
+@job()
+def sweep_autopay():
+    sweep_installments()
+
+
+@job()
+def refresh_loan_analytics():
+    call_command('refresh_loan_analytics')
+
+
+@job()
+def export_transaction_snapshot():
+    call_command('export_transaction_snapshot')
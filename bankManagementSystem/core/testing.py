@@ -0,0 +1,125 @@
+"""
+Query and time budgets for endpoint tests, declared in settings.QUERY_BUDGETS.
+Query counts are enforced, timings only warned about since they depend on the machine.
+"""
+import json
+import os
+import tempfile
+import time
+import warnings
+from collections import Counter
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+
+# Measurements of the run, one JSON line per measured block. A file so the processes of
+# `manage.py test --parallel` all report to the runner, which sets the variable.
+MEASUREMENTS_ENV = 'QUERY_BUDGET_MEASUREMENTS'
+
+
+def record_measurement(scope, queries, elapsed_ms):
+    path = os.environ.get(MEASUREMENTS_ENV)
+    if path is not None:
+        with open(path, 'a') as out:  # Appends of a short line are atomic, the processes do not interleave
+            out.write(json.dumps([scope, queries, elapsed_ms]) + '\n')
+
+
+def read_measurements(path):
+    """Worst (queries, milliseconds) measured per budget scope"""
+    measurements = {}
+    with open(path) as lines:
+        for line in lines:
+            scope, queries, elapsed_ms = json.loads(line)
+            worst_queries, worst_ms = measurements.get(scope, (0, 0.0))
+            measurements[scope] = (max(worst_queries, queries), max(worst_ms, elapsed_ms))
+    return measurements
+
+
+def format_queries(captured_queries):
+    """Numbered SQL of a captured block, flagging statements that ran more than once"""
+    repeats = Counter(query['sql'] for query in captured_queries)
+    lines = []
+    for number, query in enumerate(captured_queries, start=1):
+        repeated = f"  [repeated {repeats[query['sql']]}x]" if repeats[query['sql']] > 1 else ''
+        lines.append(f"{number}. ({query['time']}s) {query['sql']}{repeated}")
+    return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    """TestCase mixin checking a block against its budget in settings.QUERY_BUDGETS"""
+
+    @contextmanager
+    def assertWithinBudget(self, scope):
+        budget = settings.QUERY_BUDGETS[scope]
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            yield context
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+        record_measurement(scope, len(context), elapsed_ms)
+
+        if 'ms' in budget and elapsed_ms > budget['ms']:
+            warnings.warn(f"{scope} took {elapsed_ms:.1f} ms, budget {budget['ms']} ms", RuntimeWarning)
+        if len(context) > budget['queries']:
+            self.fail(f"{scope} is over budget: {len(context)} queries, budget {budget['queries']}\n"
+                      f"{format_queries(context.captured_queries)}")
+
+
+class QueryBudgetRunner(DiscoverRunner):
+    """
+    Test runner printing the measured budgets after the suite, the parallel processes included.
+    A full run (no test labels) fails when a budget in settings.QUERY_BUDGETS was not measured by any test.
+    """
+
+    def run_tests(self, test_labels, **kwargs):
+        self.full_run = not test_labels
+        return super().run_tests(test_labels, **kwargs)
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        handle, self.measurements_path = tempfile.mkstemp(prefix='query-budgets-', suffix='.jsonl')
+        os.close(handle)
+        os.environ[MEASUREMENTS_ENV] = self.measurements_path  # Inherited by the parallel processes
+
+    def teardown_test_environment(self, **kwargs):
+        os.environ.pop(MEASUREMENTS_ENV, None)
+        os.remove(self.measurements_path)
+        super().teardown_test_environment(**kwargs)
+
+    def run_suite(self, suite, **kwargs):
+        result = super().run_suite(suite, **kwargs)
+        self.unmeasured = self.report_budgets(read_measurements(self.measurements_path))
+        return result
+
+    def suite_result(self, suite, result, **kwargs):
+        failures = super().suite_result(suite, result, **kwargs)
+        if getattr(self, 'full_run', False) and self.unmeasured:
+            self.log(f"FAILED: no test measured the budgets of {', '.join(self.unmeasured)}")
+            failures += len(self.unmeasured)
+        return failures
+
+    def report_budgets(self, measurements):
+        """Logs the budgets measured by the run, OVER a query budget and SLOW a time one, returns the unmeasured"""
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        unmeasured = sorted(set(budgets) - set(measurements))
+        lines = ["Query budgets (used / budget):"]
+        for scope in sorted(set(budgets) & set(measurements)):  # Scopes overridden by a test are left out
+            queries, elapsed_ms = measurements[scope]
+            budget = budgets[scope]
+            if queries > budget['queries']:
+                flag = 'OVER '
+            elif elapsed_ms > budget.get('ms', elapsed_ms):
+                flag = 'SLOW '
+            else:
+                flag = '     '
+            lines.append(
+                f"  {flag}{scope:<36} {queries:>3} / {budget['queries']:>3} queries"
+                f"  {elapsed_ms:8.1f} / {budget.get('ms', '-')} ms"
+            )
+        if unmeasured:
+            lines.append(f"  Not measured by this run: {', '.join(unmeasured)}")
+        if len(lines) > 1:
+            self.log('\n'.join(lines))
+        return unmeasured
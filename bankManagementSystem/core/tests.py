@@ -1,9 +1,33 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest.mock import patch
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.db import connection
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command, CommandError
+from django.http import Http404, HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from core import models
+from django.urls import reverse
+from django.utils import timezone
+from core import models, jobs, identity, concurrency, fees
+from core.admin import BankAccountAdmin
+from core.middleware import IdentityMapMiddleware, ProfilingMiddleware
+from core.testing import QueryBudgetMixin
+from core import views as core_views
 from decimal import Decimal
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 from core.models import ForeignCurrency
+from core.parsers import DecimalJSONParser
+from core.renderers import FastJSONRenderer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
 
 # Create your tests here.
@@ -302,3 +326,563 @@ class ModelTests(TestCase):
         self.assertEqual(retrieved_currency.exchange_rate, Decimal('3.67'))
         self.assertIsNotNone(retrieved_currency.updated_at)  # Ensure the timestamp is set
 
+
+
+class AdminTests(TestCase):
+    """Test the admin pages for the large tables"""
+
+    def setUp(self):
+        self.admin_user = get_user_model().objects.create_superuser('admin@example.com', 'password123')
+        self.client.force_login(self.admin_user)
+        for i in range(5):
+            user = get_user_model().objects.create_user(email=f'user{i}@example.com', password='password123')
+            account = models.BankAccount.objects.create(user=user, account_number=f'10000{i}')
+            models.Transaction.objects.create(account=account, transaction_type='deposit', amount=Decimal('10.00'))
+
+    def test_changelists_do_not_query_per_row(self):
+        """Test the changelists select the related users instead of one query per row"""
+        for model in ('bankaccount', 'transaction', 'loan'):
+            url = reverse(f'admin:core_{model}_changelist')
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            self.assertLess(len(queries), 10)
+
+    def test_search_by_account_number(self):
+        """Test searching accounts by exact account number"""
+        res = self.client.get(reverse('admin:core_bankaccount_changelist'), {'q': '100003'})
+
+        self.assertContains(res, '100003')
+        self.assertNotContains(res, '100004')
+
+    def test_bulk_suspend_and_activate(self):
+        """Test the bulk actions update the selected accounts"""
+        url = reverse('admin:core_bankaccount_changelist')
+        ids = list(models.BankAccount.objects.values_list('id', flat=True)[:3])
+
+        self.client.post(url, {'action': 'suspend_accounts', '_selected_action': ids})
+        self.assertEqual(models.BankAccount.objects.filter(status='suspended').count(), 3)
+
+        self.client.post(url, {'action': 'activate_accounts', '_selected_action': ids})
+        self.assertFalse(models.BankAccount.objects.filter(status='suspended').exists())
+
+    def test_change_form_keeps_concurrent_balance_update(self):
+        """Test saving an account in the admin writes only the edited fields, keeping a racing balance update"""
+        account = models.BankAccount.objects.order_by('id').first()
+        save_form = BankAccountAdmin.save_form
+
+        def racing_save_form(admin, request, form, change):
+            obj = save_form(admin, request, form, change)
+            concurrency.adjust_balance(models.BankAccount.objects.get(pk=obj.pk), Decimal('50.00'))
+            return obj
+
+        with patch.object(BankAccountAdmin, 'save_form', racing_save_form):
+            res = self.client.post(reverse('admin:core_bankaccount_change', args=[account.id]), {
+                'user': account.user_id,
+                'account_number': account.account_number,
+                'status': 'active',
+                'daily_withdrawal_limit': '250.00',
+                'daily_transfer_limit': '',
+            })
+
+        self.assertEqual(res.status_code, 302)
+        account.refresh_from_db()
+        self.assertEqual(account.balance, Decimal('50.00'))
+        self.assertEqual(account.daily_withdrawal_limit, Decimal('250.00'))
+        self.assertEqual(account.version, 2)
+
+
+class JSONRenderingTests(TestCase):
+    """Test the Decimal-safe renderer, parser and response compression"""
+
+    def test_renderer_keeps_decimals_exact(self):
+        """Test Decimals are rendered as exact strings"""
+        created_at = datetime(2024, 10, 26, 8, 19, 0, 123456, tzinfo=dt_timezone.utc)
+
+        rendered = json.loads(FastJSONRenderer().render({'amount': Decimal('0.10'), 'created_at': created_at}))
+
+        self.assertEqual(rendered['amount'], '0.10')
+        self.assertEqual(rendered['created_at'], json.loads(JSONRenderer().render(created_at)))
+
+    def test_parser_reads_decimals(self):
+        """Test JSON numbers with a fraction are parsed as Decimal"""
+        parsed = DecimalJSONParser().parse(BytesIO(b'{"repayment_amount": 0.1, "loan_id": 3}'))
+
+        self.assertEqual(parsed['repayment_amount'], Decimal('0.1'))
+        self.assertEqual(parsed['loan_id'], 3)
+
+    def test_large_responses_compressed(self):
+        """Test large responses are compressed and small ones left alone"""
+        user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        account = models.BankAccount.objects.create(user=user, account_number='1234567890')
+        for _ in range(30):
+            models.Transaction.objects.create(account=account, transaction_type='deposit', amount=Decimal('10.00'))
+        client = APIClient()
+        client.force_authenticate(user=user)
+        url = reverse('bankAccountOperations:bankaccounts-get-all-transactions')
+
+        res = client.get(url, HTTP_ACCEPT='application/json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(res.content))), 30)
+
+        res = client.get(url, {'account_id': 0}, HTTP_ACCEPT='application/json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+
+class OpenAPISchemaViewTests(TestCase):
+    """Test serving the prebuilt OpenAPI schema"""
+
+    def setUp(self):
+        self.schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.schema_dir.cleanup)
+        self.schema_file = Path(self.schema_dir.name) / 'openapi-schema.yml'
+        self.factory = RequestFactory()
+
+    def test_schema_served_with_caching_headers(self):
+        """Test the schema is served with an ETag and answered with 304 when unchanged"""
+        self.schema_file.write_text('openapi: 3.0.3\n')
+
+        with override_settings(OPENAPI_SCHEMA_FILE=self.schema_file):
+            res = core_views.openapi_schema(self.factory.get('/api/schema/'))
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.content, b'openapi: 3.0.3\n')
+            self.assertIn('max-age', res['Cache-Control'])
+
+            res = core_views.openapi_schema(self.factory.get('/api/schema/', HTTP_IF_NONE_MATCH=res['ETag']))
+            self.assertEqual(res.status_code, 304)
+
+    def test_missing_schema_is_not_found(self):
+        """Test a missing schema file is a 404"""
+        with override_settings(OPENAPI_SCHEMA_FILE=self.schema_file):
+            with self.assertRaises(Http404):
+                core_views.openapi_schema(self.factory.get('/api/schema/'))
+
+    @override_settings(API_DOCS_ENABLED=False)
+    def test_build_requires_api_docs(self):
+        """Test building the schema is refused while drf_spectacular is not configured"""
+        with self.assertRaises(CommandError):
+            call_command('build_openapi_schema', file=str(self.schema_file), stdout=StringIO())
+        self.assertFalse(self.schema_file.exists())
+
+
+class BenchmarkListingsCommandTests(TestCase):
+    """Test the listings benchmark command"""
+
+    def test_benchmark_runs(self):
+        """Test both listings are benchmarked, so their sample rows keep up with the listed fields"""
+        out = StringIO()
+
+        call_command('benchmark_listings', rows=10, repeat=1, stdout=out)
+
+        self.assertIn('transactions: serializer', out.getvalue())
+        self.assertIn('customer-loans: serializer', out.getvalue())
+
+
+@jobs.job(name='test_record')
+def record_job(fail=False):
+    """Job used by the queue tests"""
+    if fail:
+        raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    """Test the database backed job queue"""
+
+    def test_enqueue_unknown_job(self):
+        """Test enqueuing a job that is not registered fails"""
+        with self.assertRaises(ValueError):
+            jobs.enqueue('missing')
+
+    def test_claim_by_priority(self):
+        """Test higher priority jobs are claimed first and only once"""
+        low = jobs.enqueue('test_record')
+        high = jobs.enqueue('test_record', priority=5)
+
+        self.assertEqual(jobs.claim_jobs(1), [high.id])
+        self.assertEqual(jobs.claim_jobs(5), [low.id])
+        self.assertEqual(jobs.claim_jobs(5), [])
+
+    def test_run_job(self):
+        """Test a successful job is marked done"""
+        job = jobs.enqueue('test_record')
+
+        self.assertEqual(jobs.run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.attempts, 1)
+
+    def test_failed_job_retried_with_backoff(self):
+        """Test a failing job is rescheduled, then marked failed after its last attempt"""
+        job = jobs.enqueue('test_record', {'fail': True}, max_attempts=2)
+
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        models.Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+
+    def test_expired_visibility_timeout(self):
+        """Test a job whose worker died is claimed again"""
+        job = jobs.enqueue('test_record')
+        jobs.claim_jobs(1)
+        self.assertEqual(jobs.claim_jobs(1), [])
+
+        models.Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(jobs.claim_jobs(1), [job.id])
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+
+
+class ProfilingTests(TestCase):
+    """Test the per-request profiling"""
+
+    def setUp(self):
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(PROFILING_ENABLED=True, PROFILING_DIR=Path(self.profile_dir.name))
+        self.settings_override.enable()
+        self.staff = get_user_model().objects.create_user(email='staff@example.com', password='pass123',
+                                                          is_staff=True)
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='pass123')
+        self.account = models.BankAccount.objects.create(user=self.user, account_number='1234567890')
+        self.client = APIClient()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.profile_dir.cleanup()
+
+    def get_balance(self, user, **headers):
+        token = Token.objects.get_or_create(user=user)[0]
+        return self.client.get(reverse('bankAccountOperations:bankaccounts-balance'),
+                               {'account_id': self.account.id},
+                               headers={'Authorization': f'Token {token.key}', **headers})
+
+    def test_disabled_middleware_not_used(self):
+        """Test the middleware drops out of the chain when profiling is off"""
+        with override_settings(PROFILING_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(lambda request: HttpResponse())
+
+    def test_staff_header_profiles_request(self):
+        """Test a staff request with the profiling header is profiled and tagged with the action"""
+        res = self.get_balance(self.staff, **{'X-Profile': '1'})
+
+        profile_id = res['X-Profile-Id']
+        meta = json.loads((Path(self.profile_dir.name) / f'{profile_id}.json').read_text())
+        self.assertEqual(meta['tag'], 'BankAccountViewSet.balance')
+        self.assertGreater(meta['sql_count'], 0)
+        self.assertTrue((Path(self.profile_dir.name) / f'{profile_id}.prof').exists())
+
+    def test_customer_header_ignored(self):
+        """Test the profiling header of a customer is ignored"""
+        res = self.get_balance(self.user, **{'X-Profile': '1'})
+
+        self.assertFalse(res.has_header('X-Profile-Id'))
+
+    def test_sampled_request_profiled(self):
+        """Test sampling profiles requests without the header, only telling staff the profile id"""
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            res = self.get_balance(self.user)
+            staff_res = self.get_balance(self.staff)
+            anonymous_res = self.client.get(reverse('bankAccountOperations:bankaccounts-balance'))
+
+        self.assertFalse(res.has_header('X-Profile-Id'))
+        self.assertFalse(anonymous_res.has_header('X-Profile-Id'))
+        self.assertEqual(len(list(Path(self.profile_dir.name).glob('*.json'))), 3)
+        self.assertTrue((Path(self.profile_dir.name) / f"{staff_res['X-Profile-Id']}.json").exists())
+
+    def test_list_and_download_profiles(self):
+        """Test staff list and download the profiles, customers cannot"""
+        profile_id = self.get_balance(self.staff, **{'X-Profile': '1'})['X-Profile-Id']
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(reverse('profile-list')).status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        res = self.client.get(reverse('profile-list'))
+        self.assertEqual([profile['id'] for profile in res.data], [profile_id])
+        self.assertNotIn('queries', res.data[0])
+
+        res = self.client.get(reverse('profile-download', args=[profile_id, 'prof']))
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(b''.join(res.streaming_content))
+
+        res = self.client.get(reverse('profile-download', args=['..', 'json']))
+        self.assertEqual(res.status_code, 404)
+
+
+@override_settings(QUERY_BUDGETS={'test.scope': {'queries': 1}})
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the query budget helper"""
+
+    def test_within_budget(self):
+        """Test a block within its budget passes"""
+        with self.assertWithinBudget('test.scope'):
+            list(models.Bank.objects.all())
+
+    def test_over_budget_shows_sql(self):
+        """Test a block over its budget fails listing the SQL, with repeats flagged"""
+        with self.assertRaises(AssertionError) as cm:
+            with self.assertWithinBudget('test.scope'):
+                list(models.Bank.objects.all())
+                list(models.Bank.objects.all())
+
+        self.assertIn('2 queries, budget 1', str(cm.exception))
+        self.assertIn('[repeated 2x]', str(cm.exception))
+
+    @override_settings(QUERY_BUDGETS={'test.scope': {'queries': 1, 'ms': 0}})
+    def test_over_time_budget_only_warns(self):
+        """Test a block over its time budget warns without failing, timings depend on the machine"""
+        with self.assertWarnsRegex(RuntimeWarning, 'test.scope took'):
+            with self.assertWithinBudget('test.scope'):
+                list(models.Bank.objects.all())
+
+
+class EndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the endpoints stay within their query and time budgets"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+        models.Bank.objects.update(transaction_fee_percentage=Decimal('1.0'), interest_rate=Decimal('5.0'))
+        self.account = models.BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                         balance=Decimal('5000.00'))
+        self.other = models.BankAccount.objects.create(user=self.user, account_number='0987654321')
+        for _ in range(5):
+            models.Transaction.objects.create(account=self.account, transaction_type='deposit',
+                                              amount=Decimal('10.00'))
+        self.loan = models.Loan.objects.create(account=self.account, loan_amount=Decimal('1000.00'),
+                                               interest_rate=Decimal('5.0'),
+                                               due_date=date.today() + timedelta(days=365))
+        fees.get_schedule()  # Compiled once per process, the budgets cover the warm path
+
+    def operations_url(self, name):
+        return reverse(f'bankAccountOperations:{name}')
+
+    def test_deposit_budget(self):
+        """Test the deposit stays within its budget"""
+        with self.assertWithinBudget('bankaccounts.deposit'):
+            res = self.client.post(self.operations_url('bankaccounts-deposit'),
+                                   {'account_id': self.account.id, 'amount': '100.00'})
+        self.assertEqual(res.status_code, 200)
+
+    def test_withdraw_budget(self):
+        """Test the withdrawal stays within its budget"""
+        with self.assertWithinBudget('bankaccounts.withdraw'):
+            res = self.client.post(self.operations_url('bankaccounts-withdraw'),
+                                   {'account_id': self.account.id, 'amount': '100.00'})
+        self.assertEqual(res.status_code, 200)
+
+    def test_transfer_budget(self):
+        """Test the transfer stays within its budget"""
+        with self.assertWithinBudget('bankaccounts.transfer'):
+            res = self.client.post(self.operations_url('bankaccounts-transfer'),
+                                   {'source_account_id': self.account.id, 'target_account_id': self.other.id,
+                                    'amount': '100.00'})
+        self.assertEqual(res.status_code, 200)
+
+    def test_balance_budget(self):
+        """Test the balance lookup stays within its budget"""
+        with self.assertWithinBudget('bankaccounts.balance'):
+            res = self.client.get(self.operations_url('bankaccounts-balance'), {'account_id': self.account.id})
+        self.assertEqual(res.status_code, 200)
+
+    def test_transactions_budget(self):
+        """Test the transaction history stays within its budget"""
+        with self.assertWithinBudget('bankaccounts.get_all_transactions'):
+            res = self.client.get(self.operations_url('bankaccounts-get-all-transactions'))
+        self.assertEqual(res.status_code, 200)
+
+    def test_grant_loan_budget(self):
+        """Test granting a loan stays within its budget"""
+        with self.assertWithinBudget('loans.grant_loan'):
+            res = self.client.post(self.operations_url('loans-grant-loan'),
+                                   {'account': self.account.id, 'loan_amount': '1000.00',
+                                    'due_date': date.today() + timedelta(days=365)})
+        self.assertEqual(res.status_code, 200)
+
+    def test_repay_loan_budget(self):
+        """Test repaying a loan stays within its budget"""
+        with self.assertWithinBudget('loans.repay_loan'):
+            res = self.client.post(self.operations_url('loans-repay-loan'),
+                                   {'loan_id': self.loan.id, 'repayment_amount': '100.00'})
+        self.assertEqual(res.status_code, 200)
+
+    def test_customer_loans_budget(self):
+        """Test the customer's loan listing stays within its budget"""
+        with self.assertWithinBudget('loans.get_customer_loans'):
+            res = self.client.get(self.operations_url('loans-get-customer-loans'))
+        self.assertEqual(res.status_code, 200)
+
+
+class IdentityMapTests(TestCase):
+    """Test the request-scoped identity map"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='pass123')
+        self.account = models.BankAccount.objects.create(user=self.user, account_number='1234567890')
+
+    def test_row_read_once_per_scope(self):
+        """Test repeated lookups of a row return the same instance without querying again"""
+        with identity.request_scope():
+            with self.assertNumQueries(1):
+                first = identity.get(models.BankAccount, pk=self.account.id, user=self.user)
+                second = identity.get(models.BankAccount, pk=str(self.account.id))
+
+        self.assertIs(first, second)
+
+    def test_filters_checked_in_memory(self):
+        """Test a loaded row not matching the other filters is not returned"""
+        other = get_user_model().objects.create_user(email='other@example.com', password='pass123')
+        with identity.request_scope():
+            identity.get(models.BankAccount, pk=self.account.id)
+            with self.assertNumQueries(0), self.assertRaises(models.BankAccount.DoesNotExist):
+                identity.get(models.BankAccount, pk=self.account.id, user=other)
+
+    def test_no_scope_queries_database(self):
+        """Test lookups outside a request scope always read the database"""
+        with self.assertNumQueries(2):
+            first = identity.get(models.BankAccount, pk=self.account.id)
+            second = identity.get(models.BankAccount, pk=self.account.id)
+
+        self.assertIsNot(first, second)
+
+    def test_async_request_scope(self):
+        """Test the middleware runs async and its identity map reaches the sync code of the request"""
+        def load_twice():
+            return [identity.get(models.BankAccount, pk=self.account.id) for _ in range(2)]
+
+        async def get_response(request):
+            first, second = await sync_to_async(load_twice)()
+            return HttpResponse(str(first is second))
+
+        middleware = IdentityMapMiddleware(get_response)
+        res = async_to_sync(middleware)(RequestFactory().get('/'))
+
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(res.content, b'True')
+
+
+
+class OptimisticConcurrencyTests(TestCase):
+    """Test the compare-and-swap writes of core.concurrency"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='pass123')
+        self.account = models.BankAccount.objects.create(user=self.user, account_number='1234567890',
+                                                         balance=Decimal('100.00'))
+
+    def test_stale_version_not_written(self):
+        """Test a compare-and-swap from an outdated read changes nothing"""
+        stale = models.BankAccount.objects.get(pk=self.account.id)
+        self.assertTrue(concurrency.compare_and_swap(self.account, balance=Decimal('150.00')))
+
+        self.assertFalse(concurrency.compare_and_swap(stale, balance=Decimal('0.00')))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('150.00'))
+        self.assertEqual(self.account.version, 1)
+
+    def test_conflict_retried_without_lost_update(self):
+        """Test a write from an outdated read is recomputed from the latest balance"""
+        stale = models.BankAccount.objects.get(pk=self.account.id)
+        concurrency.adjust_balance(self.account, Decimal('50.00'))
+
+        concurrency.adjust_balance(stale, Decimal('-30.00'), floor=0)
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('120.00'))
+        self.assertEqual(self.account.version, 2)
+
+    def test_floor_checked_against_latest_balance(self):
+        """Test the floor is enforced on the re-read balance after a conflict"""
+        stale = models.BankAccount.objects.get(pk=self.account.id)
+        concurrency.adjust_balance(self.account, Decimal('-80.00'))
+
+        with self.assertRaises(concurrency.InsufficientFunds):
+            concurrency.adjust_balance(stale, Decimal('-50.00'), floor=0)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('20.00'))
+
+    @override_settings(OPTIMISTIC_RETRY_ATTEMPTS=3)
+    def test_retries_bounded(self):
+        """Test persistent conflicts give up after the configured attempts"""
+        with patch.object(concurrency, 'compare_and_swap', return_value=False) as cas:
+            with self.assertRaises(concurrency.ConcurrentUpdateError):
+                concurrency.adjust_balance(self.account, Decimal('10.00'))
+
+        self.assertEqual(cas.call_count, 3)
+
+
+class FeeScheduleTests(TestCase):
+    """Test the compiled fee schedule"""
+
+    def setUp(self):
+        self.bank = models.Bank(transaction_fee_percentage=Decimal('1.0'))
+        with self.captureOnCommitCallbacks(execute=True):
+            models.FeeRule.objects.create(operation='withdrawal', min_amount=Decimal('0'), percentage=Decimal('2.0'),
+                                          minimum_fee=Decimal('5.00'))
+            models.FeeRule.objects.create(operation='withdrawal', min_amount=Decimal('1000'),
+                                          percentage=Decimal('1.0'), maximum_fee=Decimal('25.00'))
+            models.FeeRule.objects.create(operation='withdrawal', currency='USD', min_amount=Decimal('100'),
+                                          percentage=Decimal('0.0'), flat_fee=Decimal('3.00'))
+
+    def tearDown(self):
+        # The compiled schedule of this process outlives the rules rolled back with the test
+        with self.captureOnCommitCallbacks(execute=True):
+            fees.invalidate_schedule()
+
+    def fee(self, operation, amount, currency='NIS'):
+        return fees.compute_fee(operation, currency, Decimal(amount), self.bank)
+
+    def test_amount_bands(self):
+        """Test the band below an amount applies, with its minimum and cap"""
+        self.assertEqual(self.fee('withdrawal', '100.00'), Decimal('5.00'))  # 2% raised to the minimum
+        self.assertEqual(self.fee('withdrawal', '500.00'), Decimal('10.00'))
+        self.assertEqual(self.fee('withdrawal', '1000.00'), Decimal('10.00'))
+        self.assertEqual(self.fee('withdrawal', '5000.00'), Decimal('25.00'))  # 1% capped
+
+    def test_currency_rules(self):
+        """Test a currency with rules of its own does not use the any-currency bands"""
+        self.assertEqual(self.fee('withdrawal', '500.00', 'USD'), Decimal('3.00'))
+        self.assertEqual(self.fee('withdrawal', '50.00', 'USD'), Decimal('0.50'))  # Below its bands, bank rate
+        self.assertEqual(self.fee('withdrawal', '500.00', 'EUR'), Decimal('10.00'))
+
+    def test_bank_percentage_fallback(self):
+        """Test operations without rules pay the bank's percentage"""
+        self.assertEqual(self.fee('deposit', '500.00'), Decimal('5.00'))
+
+    def test_lookups_without_queries(self):
+        """Test a compiled schedule answers without reading the database"""
+        fees.get_schedule()
+        with self.assertNumQueries(0):
+            for amount in ('1.00', '999.99', '1000.00', '1000000.00'):
+                self.fee('withdrawal', amount)
+
+    def test_rule_change_recompiles(self):
+        """Test committed rule changes are picked up on the next lookup"""
+        fees.get_schedule()
+        with self.captureOnCommitCallbacks(execute=True):
+            models.FeeRule.objects.filter(currency='').delete()
+        # QuerySet.delete sends post_delete per row, so the schedule was dropped
+        self.assertEqual(self.fee('withdrawal', '500.00'), Decimal('5.00'))
+
+    def test_other_process_change_seen_on_recheck(self):
+        """Test a rule changed by another process applies once the recheck interval has passed"""
+        fees.get_schedule()
+        rule = models.FeeRule.objects.get(operation='withdrawal', currency='', min_amount=Decimal('0'))
+        rule.percentage = Decimal('3.0')
+        with patch.object(fees, 'invalidate_schedule'):  # The change was committed elsewhere
+            rule.save()
+
+        self.assertEqual(self.fee('withdrawal', '500.00'), Decimal('10.00'))  # Served until the recheck
+        with override_settings(FEE_SCHEDULE_RECHECK_INTERVAL=0):
+            self.assertEqual(self.fee('withdrawal', '500.00'), Decimal('15.00'))
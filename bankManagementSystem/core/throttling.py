@@ -0,0 +1,84 @@
+"""
+Sliding window throttling for the write endpoints
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from rest_framework.throttling import BaseThrottle
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Per user, per action sliding window counter kept in the shared cache.
+
+    Limits are configured in settings.ACTION_THROTTLE_RATES keyed by
+    '<viewset basename>.<action>', e.g. {'bankaccounts.deposit': '30/min'}.
+    A rate of 'N/period' counts the requests of each fixed window of one period and allows
+    a request while the current count plus the previous window's count, weighted by its share
+    still inside the sliding period, stays within N.
+
+    The current window is only ever changed with the cache's atomic add and incr, so concurrent
+    requests, in this process or another one sharing the cache, cannot both take the last slot.
+    """
+    cache = default_cache
+    timer = time.time
+    cache_format = 'throttle_window_%(scope)s_%(ident)s_%(window)s'
+    periods = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_scope(self, view):
+        return f'{getattr(view, "basename", view.__class__.__name__)}.{getattr(view, "action", None)}'
+
+    def parse_rate(self, rate):
+        """Returns the (limit, period in seconds) of a 'N/period' rate"""
+        num, period = rate.split('/')
+        return int(num), self.periods[period[0]]
+
+    def get_cache_key(self, request, view, scope, window):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': scope, 'ident': ident, 'window': window}
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        rate = getattr(settings, 'ACTION_THROTTLE_RATES', {}).get(scope)
+        if rate is None:
+            return True
+
+        limit, period = self.parse_rate(rate)
+        window, elapsed = divmod(self.timer(), period)
+        key = self.get_cache_key(request, view, scope, int(window))
+
+        # The window is read again as the previous one during the next period
+        self.cache.add(key, 0, period * 2)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:  # Evicted between the add and the incr
+            self.cache.add(key, 1, period * 2)
+            count = 1
+        previous = self.cache.get(self.get_cache_key(request, view, scope, int(window) - 1), 0)
+        weight = 1 - elapsed / period
+        if count + previous * weight <= limit:
+            return True
+
+        try:
+            self.cache.decr(key)  # A rejected request takes no slot
+        except ValueError:  # Evicted since the incr, there is no slot to give back
+            pass
+        self.wait_seconds = self.wait_time(limit, period, elapsed, count - 1, previous)
+        return False
+
+    def wait_time(self, limit, period, elapsed, count, previous):
+        """Seconds until one more request fits, given the counts without the rejected one"""
+        if count < limit:
+            # The previous window has to slide out far enough
+            return period * (1 - (limit - 1 - count) / previous) - elapsed
+        # Only once the current window is the previous one, weighted down far enough
+        return (period - elapsed) + period * (1 - (limit - 1) / count)
+
+    def wait(self):
+        return self.wait_seconds
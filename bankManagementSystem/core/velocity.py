@@ -0,0 +1,102 @@
+"""
+Sliding-window velocity checks on account debits, kept in the shared cache
+"""
+import logging
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class VelocityLimitExceeded(Exception):
+    """The debit would break the velocity rule named in the first argument"""
+
+
+class SlidingWindow:
+    """
+    `buckets` time buckets covering the last `window` seconds. Every bucket is a counter of its own
+    in the cache, expiring once it slid out of the window, so adding to one is a single atomic incr.
+    """
+
+    def __init__(self, window, buckets):
+        self.buckets = buckets
+        self.width = window / buckets
+        self.timeout = int(window + self.width) + 1
+
+    def bucket(self, now):
+        return int(now // self.width)
+
+    def bucket_indexes(self, now):
+        """The buckets still inside the window, the current one last"""
+        current = self.bucket(now)
+        return range(current - self.buckets + 1, current + 1)
+
+
+def rules_for(transaction_type):
+    """The (name, rule, window) of the settings.VELOCITY_RULES applying to `transaction_type`"""
+    return [
+        (name, rule, SlidingWindow(rule['window'], rule['buckets']))
+        for name, rule in settings.VELOCITY_RULES.items()
+        if transaction_type in rule['transaction_types']
+    ]
+
+
+def counter_key(name, account_id, bucket):
+    return f'velocity_{name}_{account_id}_{bucket}'
+
+
+def rule_value(rule, amount):
+    """The debit's value in the rule's counters, amounts in cents since cache counters are integers"""
+    return 1 if rule['metric'] == 'count' else int(amount * 100)
+
+
+def rule_limit(rule):
+    return rule['limit'] if rule['metric'] == 'count' else int(rule['limit'] * 100)
+
+
+def reserve(account_id, transaction_type, amount, now=None):
+    """
+    Counts a debit in the windows of its rules before it is made, returning the reservation to
+    give back with `release` should the debit not happen. Raises VelocityLimitExceeded, with nothing
+    counted, when the debit would break a rule. The current bucket is raised with an atomic incr before
+    the window is summed, so of concurrent debits only as many pass as fit under the limit.
+    """
+    now = time.time() if now is None else now
+    reservation = []
+    for name, rule, window in rules_for(transaction_type):
+        keys = [counter_key(name, account_id, bucket) for bucket in window.bucket_indexes(now)]
+        value = rule_value(rule, amount)
+        cache.add(keys[-1], 0, window.timeout)
+        try:
+            current = cache.incr(keys[-1], value)
+        except ValueError:  # Evicted between the add and the incr
+            cache.add(keys[-1], value, window.timeout)
+            current = value
+        reservation.append((keys[-1], value))
+
+        if current + sum(cache.get_many(keys[:-1]).values()) > rule_limit(rule):
+            release(reservation)
+            logger.warning("Velocity rule %s blocked a %s on account %s", name, transaction_type, account_id)
+            raise VelocityLimitExceeded(name)
+    return reservation
+
+
+def release(reservation):
+    """Takes a reserved debit out of its windows again"""
+    for key, value in reservation:
+        try:
+            cache.decr(key, value)
+        except ValueError:  # The bucket expired meanwhile
+            pass
+
+
+@contextmanager
+def held(reservation):
+    """Releases the reservation when the block raises, since the debit it stands for did not happen"""
+    try:
+        yield
+    except BaseException:
+        release(reservation)
+        raise
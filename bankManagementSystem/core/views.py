@@ -1,3 +1,61 @@
-from django.shortcuts import render
+import hashlib
+from django.conf import settings
+from django.http import HttpResponse, Http404, FileResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from core import profiling
 
 # Create your views here.
+
+_schema_cache = {}
+
+
+def _load_schema():
+    """Returns the prebuilt schema and its ETag, re-reading the file only when it changes"""
+    path = settings.OPENAPI_SCHEMA_FILE
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        raise Http404("The API schema has not been built, run `manage.py build_openapi_schema`.")
+    if _schema_cache.get('mtime') != mtime:
+        content = path.read_bytes()
+        _schema_cache.update(mtime=mtime, content=content, etag=hashlib.sha256(content).hexdigest())
+    return _schema_cache['content'], _schema_cache['etag']
+
+
+@require_GET
+@condition(etag_func=lambda request: _load_schema()[1])
+def openapi_schema(request):
+    """Serves the OpenAPI schema generated at build time"""
+    content, _ = _load_schema()
+    response = HttpResponse(content, content_type='application/vnd.oai.openapi; charset=utf-8')
+    patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+    return response
+
+
+class ProfileListView(APIView):
+    """Staff listing of the recorded request profiles, newest first"""
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(profiling.list_profiles(), status=status.HTTP_200_OK)
+
+
+class ProfileDownloadView(APIView):
+    """Staff download of a recorded profile, `prof` for the pstats dump or `json` for the SQL timings"""
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, profile_id, kind):
+        path = profiling.profile_path(profile_id, kind)
+        if path is None:
+            return Response({"detail": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(path.open('rb'), as_attachment=True, filename=path.name,
+                            content_type=profiling.PROFILE_KINDS[kind])
+
@@ -0,0 +1,14 @@
+"""
+Process pool initializer. Kept free of model imports: a spawned worker unpickles the
+initializer, importing its module, before Django is set up in that process.
+"""
+import django
+from django.apps import apps
+from django.db import connections
+
+
+def init_worker_process():
+    """Sets up Django in a spawned worker and drops the connections a forked one inherited from the parent"""
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
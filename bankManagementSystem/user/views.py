@@ -5,10 +5,16 @@ from django.shortcuts import render
 Views for the user API
 """
 
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import generics, authentication, permissions
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 
 from rest_framework.settings import api_settings
+from core import account_summary, jobs
+from core.models import BankAccount
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -24,7 +30,7 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
     authentication_classes = (authentication.TokenAuthentication,)
@@ -32,4 +38,17 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
 
     def get_object(self):
         """Retrieve and return the authenticated user"""
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        """Deactivate the user and close their accounts, the rows are deleted by a background purge job"""
+        now = timezone.now()
+        accounts = BankAccount.objects.filter(user=instance)
+        account_summary.invalidate_account_summaries(accounts.values_list('id', flat=True))
+        accounts.exclude(status='closed').update(status='closed', closed_at=now, version=F('version') + 1)
+        instance.is_active = False
+        instance.deletion_requested_at = now
+        instance.save(update_fields=['is_active', 'deletion_requested_at'])
+        Token.objects.filter(user=instance).delete()
+        transaction.on_commit(lambda: jobs.enqueue('purge_user', {'user_id': instance.id}))